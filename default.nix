@@ -1,4 +1,4 @@
-{ writeShellScriptBin, python310, runCommand }:
+{ writeShellScriptBin, symlinkJoin, python310, runCommand }:
 
 let
   python = (python310.override { x11Support = true; }); # for Tkinter
@@ -13,13 +13,32 @@ let
       tkinter
     ]);
 
-  starfish = runCommand "ir.py" { } ''
-    cp ${./ir.py} $out
-    ${python}/bin/2to3 --write $out
-    substituteInPlace $out --replace '"air_gamma.csv"' '"${./air_gamma.csv}"'
+  # ir.py, the starfish/ engine package and the data files they read, all run through 2to3
+  starfish = runCommand "starfish-src" { } ''
+    mkdir -p $out
+    cp ${./ir.py} $out/ir.py
+    cp ${./air_gamma.csv} $out/air_gamma.csv
+    cp ${./lead_gamma.csv} $out/lead_gamma.csv
+    cp ${./iron_gamma.csv} $out/iron_gamma.csv
+    cp ${./water_gamma.csv} $out/water_gamma.csv
+    cp ${./buildup.csv} $out/buildup.csv
+    cp -r ${./FluxProfiles} $out/FluxProfiles
+    cp -r ${./starfish} $out/starfish
+    chmod -R u+w $out
+    ${python}/bin/2to3 --write --nobackups $out
   '';
 
 in
-writeShellScriptBin "starfish" ''
-  exec ${pythonWithPackages}/bin/python ${starfish}
-''
+symlinkJoin {
+  name = "starfish";
+  paths = [
+    (writeShellScriptBin "starfish" ''
+      exec ${pythonWithPackages}/bin/python ${starfish}/ir.py "$@"
+    '')
+    (writeShellScriptBin "starfish-cli" ''
+      export PYTHONPATH=${starfish}''${PYTHONPATH:+:$PYTHONPATH}
+      exec ${pythonWithPackages}/bin/python -m starfish "$@"
+    '')
+  ];
+  meta.mainProgram = "starfish";
+}
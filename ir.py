@@ -6,25 +6,106 @@
 # |_____/ \__\__,_|_|  |_| |_|___/_| |_|
 #                                       
 
+import time
+STARTED = time.time() # For the startup time in the status bar
+
+import sys
 import Tkinter as tk
 import tkFileDialog
+import ttk
 
-import csv
 import numpy as np
-from scipy.interpolate import interp1d
-
-from pyne.material import Material
-from pyne.xs.data_source import EAFDataSource
-from pyne.bins import pointwise_collapse
-from pyne.transmute.chainsolve import Transmuter
-from pyne import nucname
-from pyne.data import decay_const, atomic_mass, gamma_photon_intensity, gamma_energy, beta_intensity, beta_average_energy
 
-import parsedatetime as pdt
-import datetime
+from starfish import engine
+from starfish.pipeline import Pipeline
+from starfish.worker import Worker
+from starfish import trace
+from starfish import startup
+# Nothing above loads SciPy or PyNE - they're slow to import, so they get loaded by the worker once the window's up (see startup.py)
 
 # Created summer 2017 by Benjamin Morrison '17 (benmorrison@unm.edu or geek@geekanddad.com)
 
+class VirtualTable(tk.Frame):
+	# A sortable table that can hold any number of rows without making a widget (or even a Treeview item) per row.
+	# The data lives in one array per column; the Treeview only has as many items as fit on screen, and scrolling just
+	# changes which rows of the arrays those items show. Click a column heading to sort by it (click again to reverse).
+	def __init__(self, master, headings, pinned = 0):
+		tk.Frame.__init__(self, master)
+		self.headings = headings
+		self.pinned = pinned # Rows at the top that stay put when sorting, like TOTAL
+		self.columns = [[] for heading in headings]
+		self.order = np.arange(0)
+		self.sortColumn = None
+		self.descending = False
+		self.top = 0 # Which row (in sorted order) is at the top of the screen
+		self.tree = ttk.Treeview(self, columns = range(len(headings)), show = "headings", selectmode = "none")
+		for idx, heading in enumerate(headings):
+			self.tree.heading(idx, text = heading, command = lambda idx=idx: self.sortBy(idx))
+		self.tree.grid(row = 0, column = 0, sticky = tk.N + tk.S+tk.E+tk.W)
+		self.scrollY = tk.Scrollbar(self, orient = tk.VERTICAL, command = self.yview)
+		self.scrollY.grid(row = 0, column = 1, sticky = tk.N+tk.S)
+		self.rowconfigure(0, weight = 1)
+		self.columnconfigure(0, weight = 1)
+		self.items = [] # The Treeview items we reuse for whichever rows are on screen
+		self.tree.bind("<Configure>", lambda event: self.render())
+		self.tree.bind("<MouseWheel>", lambda event: self.yview("scroll", -event.delta // 120 or (-1 if event.delta > 0 else 1), "units"))
+		self.tree.bind("<Button-4>", lambda event: self.yview("scroll", -3, "units")) # X11 sends scrolling as button presses
+		self.tree.bind("<Button-5>", lambda event: self.yview("scroll", 3, "units"))
+
+	def setData(self, columns):
+		# One list/array per column, all the same length. Numbers are shown with str(), same as always.
+		self.columns = [np.asarray(column, dtype = object if not len(column) or isinstance(column[0], str) else float) for column in columns]
+		self.order = np.arange(len(self.columns[0]))
+		if self.sortColumn is not None:
+			self.sort()
+		self.top = 0
+		self.render()
+
+	def sortBy(self, idx):
+		self.descending = not self.descending if self.sortColumn == idx else False
+		self.sortColumn = idx
+		self.sort()
+		self.render()
+
+	def sort(self):
+		keys = self.columns[self.sortColumn][self.pinned:]
+		order = np.argsort(keys, kind = "mergesort") + self.pinned
+		if self.descending:
+			order = order[::-1]
+		self.order = np.concatenate([np.arange(min(self.pinned, len(self.columns[0]))), order]).astype(int)
+
+	def visibleRows(self):
+		rowHeight = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+		return max(1, (self.tree.winfo_height() - rowHeight) // rowHeight) # One row's worth of space goes to the headings
+
+	def render(self):
+		count = len(self.order)
+		visible = self.visibleRows()
+		self.top = max(0, min(self.top, count - visible))
+		while len(self.items) < visible:
+			self.items.append(self.tree.insert("", "end"))
+		for slot, item in enumerate(self.items):
+			row = self.top + slot
+			if slot < visible and row < count:
+				idx = self.order[row]
+				self.tree.item(item, values = [str(column[idx]) for column in self.columns])
+				self.tree.move(item, "", slot)
+			else:
+				self.tree.detach(item)
+		if count:
+			self.scrollY.set(float(self.top) / count, float(min(count, self.top + visible)) / count)
+		else:
+			self.scrollY.set(0, 1)
+
+	def yview(self, *args):
+		# Scrollbar and mouse wheel commands, in the same form Tk sends to widgets that scroll themselves
+		visible = self.visibleRows()
+		if args[0] == "moveto":
+			self.top = int(round(float(args[1]) * len(self.order)))
+		elif args[0] == "scroll":
+			self.top += int(args[1]) * (visible if args[2] == "pages" else 1)
+		self.render()
+
 class IRApplication(tk.Frame):
 	def __init__(self, master=None):
 		# Set up the window object - see http://infohost.nmt.edu/tcc/help/pubs/tkinter/web/index.html for a good explanation of how all the Tk widgets we use work
@@ -32,7 +113,9 @@ class IRApplication(tk.Frame):
 		# Set up window-resizing
 		top=self.winfo_toplevel()
 		top.rowconfigure(0, weight=1)
+		top.columnconfigure(0, weight=1)
 		self.rowconfigure(1, weight = 1)
+		self.columnconfigure(0, weight = 1)
 		self.grid(sticky=tk.N+tk.S+tk.E+tk.W)
 		# Create all our UI objects
 		self.createWidgets()
@@ -40,7 +123,16 @@ class IRApplication(tk.Frame):
 		self.material = None
 		self.flux = None
 		self.product = None
+		self.productSample = None # What self.product was made from, for the inventory
+		self.productResults = None # Everything worked out for self.product, unthresholded, for exporting
 		self.bq = True
+		self.pipeline = Pipeline() # Remembers each stage of the calculation, so switching tabs doesn't redo the transmutation
+		self.rendered = None # What's currently in the result tables, so we don't rebuild them for nothing
+		self.worker = Worker() # Does the actual calculating, so the window doesn't freeze while it happens
+		self.job = None # Which of the worker's jobs we're waiting on, and what to do with its answer
+		self.jobDone = None
+		self.after_idle(self.warmUp) # Once the window's up, load everything the calculations need in the background
+		self.after(50, self.pollWorker)
 	def createWidgets(self):
 		# Tab Bar
 		self.tabBar = tk.Frame(self)
@@ -56,8 +148,16 @@ class IRApplication(tk.Frame):
 		self.gammasButton.grid(row=0, column=4)
 		self.betasButton = tk.Button(self.tabBar, text="Beta Energies", command=self.switchPanelBetas)
 		self.betasButton.grid(row=0, column=5)
+		self.positionsButton = tk.Button(self.tabBar, text="Compare Positions", command=self.switchPanelPositions)
+		self.positionsButton.grid(row=0, column=6)
+		self.uncertaintyButton = tk.Button(self.tabBar, text="Uncertainty", command=self.switchPanelUncertainty)
+		self.uncertaintyButton.grid(row=0, column=7)
+		self.shieldingButton = tk.Button(self.tabBar, text="Shielding", command=self.switchPanelShielding)
+		self.shieldingButton.grid(row=0, column=8)
+		self.spectrumButton = tk.Button(self.tabBar, text="Spectrum", command=self.switchPanelSpectrum)
+		self.spectrumButton.grid(row=0, column=9)
 		self.quitButton = tk.Button(self.tabBar, text="Quit", command=self.quit)
-		self.quitButton.grid(row=0, column=6)
+		self.quitButton.grid(row=0, column=10)
 		self.tabBar.grid(row=0, column=0)
 		
 		# Setup Panel
@@ -83,6 +183,11 @@ class IRApplication(tk.Frame):
 		self.massVar = tk.StringVar()
 		self.massBox = tk.Entry(self.panelSetup, textvariable=self.massVar)
 		self.massBox.grid(row=1, column=3)
+		self.scheduleLabel = tk.Label(self.panelSetup, text="Schedule (instead of power and time)")
+		self.scheduleLabel.grid(row=2, column=0)
+		self.scheduleVar = tk.StringVar() # e.g. "(250 8h, 0 16h) x 5" for a week of 8-hour days - see starfish/schedule.py
+		self.scheduleBox = tk.Entry(self.panelSetup, textvariable=self.scheduleVar)
+		self.scheduleBox.grid(row=2, column=1, columnspan=3, sticky=tk.E+tk.W)
 		self.elementTable = tk.Frame(self.panelSetup)
 		self.elementLabel = tk.Label(self.elementTable, text="Element/Isotope")
 		self.elementLabel.grid(row=0, column=0)
@@ -90,171 +195,246 @@ class IRApplication(tk.Frame):
 		self.ratioTypeVar.set('Mass Ratio')
 		self.ratioMenu = tk.OptionMenu(self.elementTable, self.ratioTypeVar, 'Mass Ratio', 'Number Ratio')
 		self.ratioMenu.grid(row=0, column=1)
-		self.elementTable.grid(row=2, column=0, columnspan=4)
+		self.elementTable.grid(row=3, column=0, columnspan=4)
 		self.elementRows = [] # Will eventually be filled with UI widgets, in addElementRow
 		self.addElementRow() # And by eventually, I mean immediately, as we set up the first blank row here
 		self.addElementButton = tk.Button(self.panelSetup, text = "Add Element", command = self.addElementRow)
-		self.addElementButton.grid(row=3, column=0, columnspan = 4)
+		self.addElementButton.grid(row=4, column=0, columnspan = 4)
+		self.limitPane = tk.Frame(self.panelSetup) # Work backwards from a dose or activity limit to a time or power
+		self.limitLabel = tk.Label(self.limitPane, text="Limit")
+		self.limitLabel.grid(row=0, column=0)
+		self.limitVar = tk.StringVar()
+		self.limitBox = tk.Entry(self.limitPane, textvariable=self.limitVar)
+		self.limitBox.grid(row=0, column=1)
+		self.limitTypeVar = tk.StringVar()
+		self.limitTypeVar.set('Dose (mR/h)')
+		self.limitTypeMenu = tk.OptionMenu(self.limitPane, self.limitTypeVar, 'Dose (mR/h)', 'Activity (mCi)')
+		self.limitTypeMenu.grid(row=0, column=2)
+		self.distanceLabel = tk.Label(self.limitPane, text="At (cm)")
+		self.distanceLabel.grid(row=0, column=3)
+		self.distanceVar = tk.StringVar()
+		self.distanceVar.set("30")
+		self.distanceBox = tk.Entry(self.limitPane, textvariable=self.distanceVar, width=6)
+		self.distanceBox.grid(row=0, column=4)
+		self.solveForVar = tk.StringVar()
+		self.solveForVar.set('Time')
+		self.solveForMenu = tk.OptionMenu(self.limitPane, self.solveForVar, 'Time', 'Power')
+		self.solveForMenu.grid(row=0, column=5)
+		self.limitButton = tk.Button(self.limitPane, text="Find Maximum", command=self.findLimit)
+		self.limitButton.grid(row=0, column=6)
+		self.limitResultVar = tk.StringVar()
+		self.limitResultLabel = tk.Label(self.limitPane, textvariable=self.limitResultVar)
+		self.limitResultLabel.grid(row=1, column=0, columnspan=7)
+		self.limitPane.grid(row=5, column=0, columnspan=4)
+		self.tierLabel = tk.Label(self.panelSetup, text="Fidelity")
+		self.tierLabel.grid(row=6, column=0)
+		self.tierVar = tk.StringVar() # How much of the transmutation chains to follow - see TIERS in starfish/engine.py
+		self.tierVar.set(engine.TIER.capitalize())
+		self.tierMenu = tk.OptionMenu(self.panelSetup, self.tierVar, 'Screening', 'Standard', 'Full')
+		self.tierMenu.grid(row=6, column=1)
 		self.panelSetup.grid(row=1, column=0)
 		
 		# Dose Panel
+		# The result tables are VirtualTables (below): one Treeview that only ever shows the rows that fit on screen, however many results there are.
 		self.panelDose = tk.Frame(self)
-		self.canvasDose = tk.Canvas(self.panelDose) # These next several lines set up scrolling for the Dose panel.
-		self.canvasDose.grid(row = 0, column = 0, sticky = tk.N + tk.S+tk.E+tk.W)
-		self.dScrollY = tk.Scrollbar(self.panelDose, orient=tk.VERTICAL, command=self.canvasDose.yview)
-		self.dScrollY.grid(row=0, column=1, sticky=tk.N+tk.S)
-
-		self.dScrollX = tk.Scrollbar(self.panelDose, orient=tk.HORIZONTAL, command=self.canvasDose.xview)
-		self.dScrollX.grid(row=1, column=0, sticky=tk.E+tk.W)
-
-		self.canvasDose['xscrollcommand'] = self.dScrollX.set
-		self.canvasDose['yscrollcommand'] = self.dScrollY.set
-		self.winDose = tk.Frame(self)
-		self.winDoseID = self.canvasDose.create_window(0, 0, anchor = tk.NW, window = self.winDose) # End scrolling setup
-		self.dEOBLabel = tk.Label(self.winDose, text = "Gamma - End of Bombardment - Beta") # Create the various UI objects in the actual panal
-		self.dEOBLabel.grid(row = 0, column = 0, columnspan = 3)
-		self.dDelayPane = tk.Frame(self.winDose)
-		self.dDelayLabel = tk.Label(self.dDelayPane, text = "Gamma - After - Beta")
-		self.dDelayLabel.grid(row = 0, column = 0)
 		self.delayVar = tk.StringVar()
+		self.dDelayPane = tk.Frame(self.panelDose)
+		self.dDelayLabel = tk.Label(self.dDelayPane, text = "After")
+		self.dDelayLabel.grid(row = 0, column = 0)
 		self.dDelayBox = tk.Entry(self.dDelayPane, textvariable = self.delayVar)
 		self.dDelayBox.grid(row = 0, column = 1)
-		self.dDelayPane.grid(row = 0, column = 3, columnspan = 2)
-		self.productRows = [] # Will eventually be filled with UI widgets, in addProductRow
-		self.winDose.update_idletasks() # Tell Tk to recalculate layout
-		self.canvasDose['width'] = self.canvasDose.bbox(self.winDoseID)[2] # and adjust the scrolling appropriately
-		self.canvasDose['scrollregion'] = self.canvasDose.bbox(self.winDoseID)
-		self.panelDose.rowconfigure(0, weight = 1)
+		self.sampleNameLabel = tk.Label(self.dDelayPane, text = "Name")
+		self.sampleNameLabel.grid(row = 0, column = 2)
+		self.sampleNameVar = tk.StringVar()
+		self.sampleNameBox = tk.Entry(self.dDelayPane, textvariable = self.sampleNameVar)
+		self.sampleNameBox.grid(row = 0, column = 3)
+		self.inventoryButton = tk.Button(self.dDelayPane, text = "Add to Inventory", command = self.addToInventory) # Keep this product on record, with the time it came out (now)
+		self.inventoryButton.grid(row = 0, column = 4)
+		self.exportButton = tk.Button(self.dDelayPane, text = "Export...", command = self.exportResults) # Every product and every line, not just what's shown
+		self.exportButton.grid(row = 0, column = 5)
+		self.dDelayPane.grid(row = 0, column = 0)
+		self.doseTable = VirtualTable(self.panelDose, ["Isotope", "Gamma - End of Bombardment", "Beta - End of Bombardment", "Gamma - After", "Beta - After"], pinned = 1)
+		self.doseTable.grid(row = 1, column = 0, sticky = tk.N + tk.S+tk.E+tk.W)
+		self.panelDose.rowconfigure(1, weight = 1)
 		self.panelDose.columnconfigure(0, weight = 1)
 		
 		# Activity Panel
 		self.panelActivity = tk.Frame(self)
-		self.canvasActivity = tk.Canvas(self.panelActivity) # These next several lines set up scrolling for the Dose panel.
-		self.canvasActivity.grid(row = 0, column = 0, sticky = tk.N + tk.S+tk.E+tk.W) # The structure of the Dose/Activity/Gammas panels are essentially identical.
-		self.aScrollY = tk.Scrollbar(self.panelActivity, orient=tk.VERTICAL, command=self.canvasActivity.yview)
-		self.aScrollY.grid(row=0, column=1, sticky=tk.N+tk.S)
-
-		self.aScrollX = tk.Scrollbar(self.panelActivity, orient=tk.HORIZONTAL, command=self.canvasActivity.xview)
-		self.aScrollX.grid(row=1, column=0, sticky=tk.E+tk.W)
-
-		self.canvasActivity['xscrollcommand'] = self.aScrollX.set
-		self.canvasActivity['yscrollcommand'] = self.aScrollY.set
-		self.winActivity = tk.Frame(self)
-		self.winActivityID = self.canvasActivity.create_window(0, 0, anchor = tk.NW, window = self.winActivity)
-		self.aEOBLabel = tk.Label(self.winActivity, text = "End of Bombardment")
-		self.aEOBLabel.grid(row = 0, column = 0, columnspan = 2)
-		self.aDelayPane = tk.Frame(self.winActivity)
+		self.aDelayPane = tk.Frame(self.panelActivity)
 		self.aDelayLabel = tk.Label(self.aDelayPane, text = "After")
 		self.aDelayLabel.grid(row = 0, column = 0)
 		self.aDelayBox = tk.Entry(self.aDelayPane, textvariable = self.delayVar)
 		self.aDelayBox.grid(row = 0, column = 1)
-		self.aDelayPane.grid(row = 0, column = 2)
-		self.canvasActivity['width'] = self.canvasActivity.bbox(self.winActivityID)[2]
-		self.canvasActivity['scrollregion'] = self.canvasActivity.bbox(self.winActivityID)
-		self.panelActivity.rowconfigure(0, weight = 1)
+		self.aDelayPane.grid(row = 0, column = 0)
+		self.activityTable = VirtualTable(self.panelActivity, ["Isotope", "End of Bombardment", "After"], pinned = 1)
+		self.activityTable.grid(row = 1, column = 0, sticky = tk.N + tk.S+tk.E+tk.W)
+		self.panelActivity.rowconfigure(1, weight = 1)
 		self.panelActivity.columnconfigure(0, weight = 1)
 		
 		# Gammas Panel
 		self.panelGammas = tk.Frame(self)
-		self.canvasGammas = tk.Canvas(self.panelGammas)
-		self.canvasGammas.grid(row = 0, column = 0, sticky = tk.N + tk.S+tk.E+tk.W)
-		self.gScrollY = tk.Scrollbar(self.panelGammas, orient=tk.VERTICAL, command=self.canvasGammas.yview)
-		self.gScrollY.grid(row=0, column=1, sticky=tk.N+tk.S)
-
-		self.gScrollX = tk.Scrollbar(self.panelGammas, orient=tk.HORIZONTAL, command=self.canvasGammas.xview)
-		self.gScrollX.grid(row=1, column=0, sticky=tk.E+tk.W)
-
-		self.canvasGammas['xscrollcommand'] = self.gScrollX.set
-		self.canvasGammas['yscrollcommand'] = self.gScrollY.set
-		self.winGammas = tk.Frame(self)
-		self.winGammasID = self.canvasGammas.create_window(0, 0, anchor = tk.NW, window = self.winGammas)
-		self.thresholdLabel = tk.Label(self.winGammas, text = "Threshold")
-		self.thresholdLabel.grid(row = 0, column = 0, columnspan = 2)
 		self.thresholdVar = tk.StringVar()
-		self.thresholdBox = tk.Entry(self.winGammas, textvariable = self.thresholdVar)
-		self.thresholdBox.grid(row = 0, column = 2)
-		self.isotopeLabel = tk.Label(self.winGammas, text = "Isotope")
-		self.isotopeLabel.grid(row = 1, column = 0)
-		self.gammaLabel = tk.Label(self.winGammas, text = "Gamma Energy (keV)")
-		self.gammaLabel.grid(row = 1, column = 1)
-		self.branchLabel = tk.Label(self.winGammas, text = "Branching Ratio")
-		self.branchLabel.grid(row = 1, column = 2)
-		self.gammaRows = [] # Will eventually be filled with UI widgets, in addGammaRow
-		self.canvasGammas['width'] = self.canvasGammas.bbox(self.winGammasID)[2]
-		self.canvasGammas['scrollregion'] = self.canvasGammas.bbox(self.winGammasID)
-		self.panelGammas.rowconfigure(0, weight = 1)
+		self.gThresholdPane = tk.Frame(self.panelGammas)
+		self.thresholdLabel = tk.Label(self.gThresholdPane, text = "Threshold")
+		self.thresholdLabel.grid(row = 0, column = 0)
+		self.thresholdBox = tk.Entry(self.gThresholdPane, textvariable = self.thresholdVar)
+		self.thresholdBox.grid(row = 0, column = 1)
+		self.gThresholdPane.grid(row = 0, column = 0)
+		self.gammaTable = VirtualTable(self.panelGammas, ["Isotope", "Gamma Energy (keV)", "Branching Ratio"])
+		self.gammaTable.grid(row = 1, column = 0, sticky = tk.N + tk.S+tk.E+tk.W)
+		self.panelGammas.rowconfigure(1, weight = 1)
 		self.panelGammas.columnconfigure(0, weight = 1)
 
 		# Betas Panel
 		self.panelBetas = tk.Frame(self)
-		self.canvasBetas = tk.Canvas(self.panelBetas)
-		self.canvasBetas.grid(row = 0, column = 0, sticky = tk.N + tk.S+tk.E+tk.W)
-		self.bScrollY = tk.Scrollbar(self.panelBetas, orient=tk.VERTICAL, command=self.canvasBetas.yview)
-		self.bScrollY.grid(row=0, column=1, sticky=tk.N+tk.S)
-
-		self.bScrollX = tk.Scrollbar(self.panelBetas, orient=tk.HORIZONTAL, command=self.canvasBetas.xview)
-		self.bScrollX.grid(row=1, column=0, sticky=tk.E+tk.W)
-
-		self.canvasBetas['xscrollcommand'] = self.bScrollX.set
-		self.canvasBetas['yscrollcommand'] = self.bScrollY.set
-		self.winBetas = tk.Frame(self)
-		self.winBetasID = self.canvasBetas.create_window(0, 0, anchor = tk.NW, window = self.winBetas)
-		self.bThresholdLabel = tk.Label(self.winBetas, text = "Threshold")
-		self.bThresholdLabel.grid(row = 0, column = 0, columnspan = 2)
-		self.bThresholdBox = tk.Entry(self.winBetas, textvariable = self.thresholdVar)
-		self.bThresholdBox.grid(row = 0, column = 2)
-		self.bIsotopeLabel = tk.Label(self.winBetas, text = "Isotope")
-		self.bIsotopeLabel.grid(row = 1, column = 0)
-		self.betaLabel = tk.Label(self.winBetas, text = "Beta Energy (keV)")
-		self.betaLabel.grid(row = 1, column = 1)
-		self.bBranchLabel = tk.Label(self.winBetas, text = "Branching Ratio")
-		self.bBranchLabel.grid(row = 1, column = 2)
-		self.betaRows = [] # Will eventually be filled with UI widgets, in addBetaRow
-		self.canvasBetas['width'] = self.canvasBetas.bbox(self.winBetasID)[2]
-		self.canvasBetas['scrollregion'] = self.canvasBetas.bbox(self.winBetasID)
-		self.panelBetas.rowconfigure(0, weight = 1)
+		self.bThresholdPane = tk.Frame(self.panelBetas)
+		self.bThresholdLabel = tk.Label(self.bThresholdPane, text = "Threshold")
+		self.bThresholdLabel.grid(row = 0, column = 0)
+		self.bThresholdBox = tk.Entry(self.bThresholdPane, textvariable = self.thresholdVar)
+		self.bThresholdBox.grid(row = 0, column = 1)
+		self.bThresholdPane.grid(row = 0, column = 0)
+		self.betaTable = VirtualTable(self.panelBetas, ["Isotope", "Beta Energy (keV)", "Branching Ratio"])
+		self.betaTable.grid(row = 1, column = 0, sticky = tk.N + tk.S+tk.E+tk.W)
+		self.panelBetas.rowconfigure(1, weight = 1)
 		self.panelBetas.columnconfigure(0, weight = 1)
 
+		# Positions Panel
+		# The sample irradiated in every profile in FluxProfiles/ at once (see starfish/positions.py), for picking where to put it
+		self.panelPositions = tk.Frame(self)
+		self.pDelayPane = tk.Frame(self.panelPositions)
+		self.pDelayLabel = tk.Label(self.pDelayPane, text = "After")
+		self.pDelayLabel.grid(row = 0, column = 0)
+		self.pDelayBox = tk.Entry(self.pDelayPane, textvariable = self.delayVar)
+		self.pDelayBox.grid(row = 0, column = 1)
+		self.pDelayPane.grid(row = 0, column = 0)
+		self.positionsTable = VirtualTable(self.panelPositions, ["Flux Profile", "Activity (Bq) - End of Bombardment", "Dose (mR/h) - End of Bombardment", "Activity (Bq) - After", "Dose (mR/h) - After", "Most Active"])
+		self.positionsTable.grid(row = 1, column = 0, sticky = tk.N + tk.S+tk.E+tk.W)
+		self.panelPositions.rowconfigure(1, weight = 1)
+		self.panelPositions.columnconfigure(0, weight = 1)
+
+		# Uncertainty Panel
+		# Percentiles of activity and dose over many perturbed runs (see starfish/uncertainty.py)
+		self.panelUncertainty = tk.Frame(self)
+		self.uDelayPane = tk.Frame(self.panelUncertainty)
+		self.uDelayLabel = tk.Label(self.uDelayPane, text = "After")
+		self.uDelayLabel.grid(row = 0, column = 0)
+		self.uDelayBox = tk.Entry(self.uDelayPane, textvariable = self.delayVar)
+		self.uDelayBox.grid(row = 0, column = 1)
+		self.samplesLabel = tk.Label(self.uDelayPane, text = "Samples")
+		self.samplesLabel.grid(row = 0, column = 2)
+		self.samplesVar = tk.StringVar()
+		self.samplesVar.set("1000")
+		self.samplesBox = tk.Entry(self.uDelayPane, textvariable = self.samplesVar, width = 6)
+		self.samplesBox.grid(row = 0, column = 3)
+		self.uDelayPane.grid(row = 0, column = 0)
+		self.uncertaintyTable = VirtualTable(self.panelUncertainty, ["Isotope", "Activity (Bq) - Median", "Activity - 5%", "Activity - 95%", "Dose (mR/h) - Median", "Dose - 5%", "Dose - 95%"], pinned = 1)
+		self.uncertaintyTable.grid(row = 1, column = 0, sticky = tk.N + tk.S+tk.E+tk.W)
+		self.panelUncertainty.rowconfigure(1, weight = 1)
+		self.panelUncertainty.columnconfigure(0, weight = 1)
+
+		# Shielding Panel
+		# Dose at several distances behind several thicknesses of shielding (see starfish/shielding.py)
+		self.panelShielding = tk.Frame(self)
+		self.sGeometryPane = tk.Frame(self.panelShielding)
+		self.sDelayLabel = tk.Label(self.sGeometryPane, text = "After")
+		self.sDelayLabel.grid(row = 0, column = 0)
+		self.sDelayBox = tk.Entry(self.sGeometryPane, textvariable = self.delayVar)
+		self.sDelayBox.grid(row = 0, column = 1)
+		self.distancesLabel = tk.Label(self.sGeometryPane, text = "Distances (cm)")
+		self.distancesLabel.grid(row = 0, column = 2)
+		self.distancesVar = tk.StringVar()
+		self.distancesVar.set("30 100 300")
+		self.distancesBox = tk.Entry(self.sGeometryPane, textvariable = self.distancesVar)
+		self.distancesBox.grid(row = 0, column = 3)
+		self.thicknessesLabel = tk.Label(self.sGeometryPane, text = "Thicknesses (cm)")
+		self.thicknessesLabel.grid(row = 1, column = 0)
+		self.thicknessesVar = tk.StringVar()
+		self.thicknessesVar.set("0 1 2 5 10")
+		self.thicknessesBox = tk.Entry(self.sGeometryPane, textvariable = self.thicknessesVar)
+		self.thicknessesBox.grid(row = 1, column = 1)
+		self.shieldsLabel = tk.Label(self.sGeometryPane, text = "Shields")
+		self.shieldsLabel.grid(row = 1, column = 2)
+		self.shieldsVar = tk.StringVar()
+		self.shieldsVar.set("lead steel water")
+		self.shieldsBox = tk.Entry(self.sGeometryPane, textvariable = self.shieldsVar)
+		self.shieldsBox.grid(row = 1, column = 3)
+		self.shieldingUpdateButton = tk.Button(self.sGeometryPane, text = "Update", command = self.findShielding)
+		self.shieldingUpdateButton.grid(row = 0, column = 4, rowspan = 2)
+		self.sGeometryPane.grid(row = 0, column = 0)
+		self.shieldingTable = VirtualTable(self.panelShielding, ["Shield", "Thickness (cm)", "Distance (cm)", "Gamma (mR/h)", "Beta (mR/h)", "Total (mR/h)"])
+		self.shieldingTable.grid(row = 1, column = 0, sticky = tk.N + tk.S+tk.E+tk.W)
+		self.panelShielding.rowconfigure(1, weight = 1)
+		self.panelShielding.columnconfigure(0, weight = 1)
+
+		# Spectrum Panel
+		# Every gamma line of the product, binned into photons/s per energy bin at several times (see starfish/spectrum.py)
+		self.panelSpectrum = tk.Frame(self)
+		self.spectrum = None # (bin edges, times, photons/s), for saving
+		self.sBinsPane = tk.Frame(self.panelSpectrum)
+		self.spectrumTimesLabel = tk.Label(self.sBinsPane, text = "At")
+		self.spectrumTimesLabel.grid(row = 0, column = 0)
+		self.spectrumTimesVar = tk.StringVar()
+		self.spectrumTimesVar.set("0 1h 1d")
+		self.spectrumTimesBox = tk.Entry(self.sBinsPane, textvariable = self.spectrumTimesVar)
+		self.spectrumTimesBox.grid(row = 0, column = 1)
+		self.binWidthLabel = tk.Label(self.sBinsPane, text = "Bin Width (keV)")
+		self.binWidthLabel.grid(row = 0, column = 2)
+		self.binWidthVar = tk.StringVar()
+		self.binWidthVar.set("2")
+		self.binWidthBox = tk.Entry(self.sBinsPane, textvariable = self.binWidthVar, width = 6)
+		self.binWidthBox.grid(row = 0, column = 3)
+		self.maxEnergyLabel = tk.Label(self.sBinsPane, text = "Up to (keV)")
+		self.maxEnergyLabel.grid(row = 0, column = 4)
+		self.maxEnergyVar = tk.StringVar()
+		self.maxEnergyVar.set("3000")
+		self.maxEnergyBox = tk.Entry(self.sBinsPane, textvariable = self.maxEnergyVar, width = 6)
+		self.maxEnergyBox.grid(row = 0, column = 5)
+		self.spectrumUpdateButton = tk.Button(self.sBinsPane, text = "Update", command = self.findSpectrum)
+		self.spectrumUpdateButton.grid(row = 0, column = 6)
+		self.spectrumSaveButton = tk.Button(self.sBinsPane, text = "Save...", command = self.saveSpectrum)
+		self.spectrumSaveButton.grid(row = 0, column = 7)
+		self.sBinsPane.grid(row = 0, column = 0)
+		self.spectrumCanvas = tk.Canvas(self.panelSpectrum, width = 760, height = 380, background = "white")
+		self.spectrumCanvas.grid(row = 1, column = 0)
+
+		# Status Bar
+		self.statusBar = tk.Frame(self)
+		self.progressVar = tk.DoubleVar()
+		self.progressBar = ttk.Progressbar(self.statusBar, variable = self.progressVar, maximum = 1.0, length = 150)
+		self.progressBar.grid(row = 0, column = 0)
+		self.statusVar = tk.StringVar()
+		self.statusLabel = tk.Label(self.statusBar, textvariable = self.statusVar, anchor = tk.W)
+		self.statusLabel.grid(row = 0, column = 1, sticky = tk.E+tk.W)
+		self.cancelButton = tk.Button(self.statusBar, text = "Cancel", command = self.cancelJob, state = tk.DISABLED)
+		self.cancelButton.grid(row = 0, column = 2)
+		self.statusBar.columnconfigure(1, weight = 1)
+		self.statusBar.grid(row = 2, column = 0, sticky = tk.E+tk.W)
+
 	def switchPanelSetup(self):
 		# Hide any other panel that's visible, then show the setup panel
 		self.panelDose.grid_forget()
 		self.panelActivity.grid_forget()
 		self.panelGammas.grid_forget()
 		self.panelBetas.grid_forget()
+		self.panelPositions.grid_forget()
+		self.panelUncertainty.grid_forget()
+		self.panelShielding.grid_forget()
+		self.panelSpectrum.grid_forget()
 		self.panelSetup.grid(row=1, column=0)
 
 	def switchPanelDose(self):
-		# Run the calculations before showing the results
-		self.constructMaterial()
+		# Start the calculations before showing the results - the tables fill in when they're done
 		self.bombardMaterial()
 		# Hide any other panel that's visible, then show the dose panel
 		self.panelSetup.grid_forget()
 		self.panelActivity.grid_forget()
 		self.panelGammas.grid_forget()
 		self.panelBetas.grid_forget()
-		# In order to minimize glitches in the scrolling, we destroy and recreate the scrollbars every time we switch panels instead of just hiding and re-showing them.
-		# Yes, this is magic. It also works.
-		# It does mean we need to re-setup the scrolling each time, though. That happens here.
-		self.canvasDose.grid_forget()
-		self.dScrollY.grid_forget()
-		self.dScrollX.grid_forget()
+		self.panelPositions.grid_forget()
+		self.panelUncertainty.grid_forget()
+		self.panelShielding.grid_forget()
+		self.panelSpectrum.grid_forget()
 		self.panelDose.grid(row=1, column=0, sticky=tk.N+tk.S+tk.E+tk.W)
-		self.canvasDose = tk.Canvas(self.panelDose)
-		self.canvasDose.grid(row = 0, column = 0, sticky = tk.N + tk.S+tk.E+tk.W)
-		self.dScrollY = tk.Scrollbar(self.panelDose, orient=tk.VERTICAL, command=self.canvasDose.yview)
-		self.dScrollY.grid(row=0, column=1, sticky=tk.N+tk.S)
-
-		self.dScrollX = tk.Scrollbar(self.panelDose, orient=tk.HORIZONTAL, command=self.canvasDose.xview)
-		self.dScrollX.grid(row=1, column=0, sticky=tk.E+tk.W)
-
-		self.winDoseID = self.canvasDose.create_window(0, 0, anchor = tk.NW, window = self.winDose)
-		self.winDose.update_idletasks()
-		self.canvasDose['width'] = self.canvasDose.bbox(self.winDoseID)[2]
-		self.canvasDose['scrollregion'] = self.canvasDose.bbox(self.winDoseID)
-		self.canvasDose['xscrollcommand'] = self.dScrollX.set
-		self.canvasDose['yscrollcommand'] = self.dScrollY.set
-		self.dScrollY['command'] = self.canvasDose.yview
-		self.canvasDose.yview_moveto(0) # Scroll back to the top, in case we're anywhere else
 
 	def switchPanelActivityBq(self):
 		self.bq = True # Set a flag for bombardMaterial to check
@@ -266,86 +446,55 @@ class IRApplication(tk.Frame):
 
 	def switchPanelActivity(self):
 		# See switchPanelDose for an explanation of the separate pieces of this.
-		self.constructMaterial()
 		self.bombardMaterial()
 		self.panelSetup.grid_forget()
 		self.panelDose.grid_forget()
 		self.panelGammas.grid_forget()
 		self.panelBetas.grid_forget()
-		self.canvasActivity.grid_forget()
-		self.aScrollY.grid_forget()
-		self.aScrollX.grid_forget()
+		self.panelPositions.grid_forget()
+		self.panelUncertainty.grid_forget()
+		self.panelShielding.grid_forget()
+		self.panelSpectrum.grid_forget()
 		self.panelActivity.grid(row=1, column=0, sticky=tk.N+tk.S+tk.E+tk.W)
-		self.canvasActivity = tk.Canvas(self.panelActivity)
-		self.canvasActivity.grid(row = 0, column = 0, sticky = tk.N + tk.S+tk.E+tk.W)
-		self.aScrollY = tk.Scrollbar(self.panelActivity, orient=tk.VERTICAL, command=self.canvasActivity.yview)
-		self.aScrollY.grid(row=0, column=1, sticky=tk.N+tk.S)
-
-		self.aScrollX = tk.Scrollbar(self.panelActivity, orient=tk.HORIZONTAL, command=self.canvasActivity.xview)
-		self.aScrollX.grid(row=1, column=0, sticky=tk.E+tk.W)
-
-		self.canvasActivity['xscrollcommand'] = self.aScrollX.set
-		self.canvasActivity['yscrollcommand'] = self.aScrollY.set
-		self.winActivityID = self.canvasActivity.create_window(0, 0, anchor = tk.NW, window = self.winActivity)
-		self.winActivity.update_idletasks()
-		self.canvasActivity['width'] = self.canvasActivity.bbox(self.winActivityID)[2]
-		self.canvasActivity['scrollregion'] = self.canvasActivity.bbox(self.winActivityID)
-		self.aScrollY['command'] = self.canvasActivity.yview
-		self.canvasActivity.yview_moveto(0)
 	
 	def switchPanelGammas(self):
 		# See switchPanelDose for an explanation of the separate pieces of this.
-		self.constructMaterial()
 		self.bombardMaterial()
 		self.panelSetup.grid_forget()
 		self.panelDose.grid_forget()
-		self.panelGammas.grid_forget()
+		self.panelActivity.grid_forget()
 		self.panelBetas.grid_forget()
-		self.canvasGammas.grid_forget()
-		self.gScrollY.grid_forget()
-		self.gScrollX.grid_forget()
+		self.panelPositions.grid_forget()
+		self.panelUncertainty.grid_forget()
+		self.panelShielding.grid_forget()
+		self.panelSpectrum.grid_forget()
 		self.panelGammas.grid(row=1, column=0, sticky=tk.N+tk.S+tk.E+tk.W)
-		self.canvasGammas = tk.Canvas(self.panelGammas)
-		self.canvasGammas.grid(row = 0, column = 0, sticky = tk.N + tk.S+tk.E+tk.W)
-		self.gScrollY = tk.Scrollbar(self.panelGammas, orient=tk.VERTICAL, command=self.canvasGammas.yview)
-		self.gScrollY.grid(row=0, column=1, sticky=tk.N+tk.S)
-
-		self.gScrollX = tk.Scrollbar(self.panelGammas, orient=tk.HORIZONTAL, command=self.canvasGammas.xview)
-		self.gScrollX.grid(row=1, column=0, sticky=tk.E+tk.W)
-
-		self.canvasGammas['xscrollcommand'] = self.gScrollX.set
-		self.canvasGammas['yscrollcommand'] = self.gScrollY.set
-		self.winGammasID = self.canvasGammas.create_window(0, 0, anchor = tk.NW, window = self.winGammas)
-		self.winGammas.update_idletasks()
-		self.canvasGammas['width'] = self.canvasGammas.bbox(self.winGammasID)[2]
-		self.canvasGammas['scrollregion'] = self.canvasGammas.bbox(self.winGammasID)
 
 	def switchPanelBetas(self):
 		# See switchPanelDose for an explanation of the separate pieces of this.
-		self.constructMaterial()
 		self.bombardMaterial()
 		self.panelSetup.grid_forget()
 		self.panelDose.grid_forget()
+		self.panelActivity.grid_forget()
 		self.panelGammas.grid_forget()
-		self.panelBetas.grid_forget()
-		self.canvasBetas.grid_forget()
-		self.bScrollY.grid_forget()
-		self.bScrollX.grid_forget()
+		self.panelPositions.grid_forget()
+		self.panelUncertainty.grid_forget()
+		self.panelShielding.grid_forget()
+		self.panelSpectrum.grid_forget()
 		self.panelBetas.grid(row=1, column=0, sticky=tk.N+tk.S+tk.E+tk.W)
-		self.canvasBetas = tk.Canvas(self.panelBetas)
-		self.canvasBetas.grid(row = 0, column = 0, sticky = tk.N + tk.S+tk.E+tk.W)
-		self.bScrollY = tk.Scrollbar(self.panelBetas, orient=tk.VERTICAL, command=self.canvasBetas.yview)
-		self.bScrollY.grid(row=0, column=1, sticky=tk.N+tk.S)
-
-		self.bScrollX = tk.Scrollbar(self.panelBetas, orient=tk.HORIZONTAL, command=self.canvasBetas.xview)
-		self.bScrollX.grid(row=1, column=0, sticky=tk.E+tk.W)
 
-		self.canvasBetas['xscrollcommand'] = self.bScrollX.set
-		self.canvasBetas['yscrollcommand'] = self.bScrollY.set
-		self.winBetasID = self.canvasBetas.create_window(0, 0, anchor = tk.NW, window = self.winBetas)
-		self.winBetas.update_idletasks()
-		self.canvasBetas['width'] = self.canvasBetas.bbox(self.winBetasID)[2]
-		self.canvasBetas['scrollregion'] = self.canvasBetas.bbox(self.winBetasID)
+	def switchPanelPositions(self):
+		# See switchPanelDose for an explanation of the separate pieces of this.
+		self.comparePositions()
+		self.panelSetup.grid_forget()
+		self.panelDose.grid_forget()
+		self.panelActivity.grid_forget()
+		self.panelGammas.grid_forget()
+		self.panelBetas.grid_forget()
+		self.panelUncertainty.grid_forget()
+		self.panelShielding.grid_forget()
+		self.panelSpectrum.grid_forget()
+		self.panelPositions.grid(row=1, column=0, sticky=tk.N+tk.S+tk.E+tk.W)
 
 	def addElementRow(self):
 		# Create a new row on the Setup tab
@@ -358,222 +507,358 @@ class IRApplication(tk.Frame):
 		newRatioBox.grid(row = rowNum, column = 1)
 		self.elementRows.append({"nameVar": newNameVar, "ratioVar": newRatioVar, "nameBox": newNameBox, "ratioBox": newRatioBox}) # Save all the control-variables and UI objects in our data structure
 
-	def addGammaRow(self):
-		# Create a new row on the Gammas tab
-		rowNum = len(self.gammaRows) + 2 # One extra row for the headers, one more for threshold.
-		newNameVar = tk.StringVar()
-		newEnergyVar = tk.StringVar()
-		newRatioVar = tk.StringVar()
-		newNameLabel = tk.Label(self.winGammas, textvariable = newNameVar)
-		newNameLabel.grid(row = rowNum, column = 0)
-		newEnergyLabel = tk.Label(self.winGammas, textvariable = newEnergyVar)
-		newEnergyLabel.grid(row = rowNum, column = 1)
-		newRatioLabel = tk.Label(self.winGammas, textvariable = newRatioVar)
-		newRatioLabel.grid(row = rowNum, column = 2)
-		self.gammaRows.append({"nameVar": newNameVar, "energyVar": newEnergyVar, "ratioVar": newRatioVar, "nameLabel": newNameLabel, "energyLabel": newEnergyLabel, "ratioLabel": newRatioLabel}) # Save all the control-variables and UI objects in our data structure
-
-	def addBetaRow(self):
-		# Create a new row on the Betas tab
-		rowNum = len(self.betaRows) + 2 # One extra row for the headers, one more for threshold.
-		newNameVar = tk.StringVar()
-		newEnergyVar = tk.StringVar()
-		newRatioVar = tk.StringVar()
-		newNameLabel = tk.Label(self.winBetas, textvariable = newNameVar)
-		newNameLabel.grid(row = rowNum, column = 0)
-		newEnergyLabel = tk.Label(self.winBetas, textvariable = newEnergyVar)
-		newEnergyLabel.grid(row = rowNum, column = 1)
-		newRatioLabel = tk.Label(self.winBetas, textvariable = newRatioVar)
-		newRatioLabel.grid(row = rowNum, column = 2)
-		self.betaRows.append({"nameVar": newNameVar, "energyVar": newEnergyVar, "ratioVar": newRatioVar, "nameLabel": newNameLabel, "energyLabel": newEnergyLabel, "ratioLabel": newRatioLabel}) # Save all the control-variables and UI objects in our data structure
-
-	def addProductRow(self):
-		# Create a new row on the Dose and Activity tabs - these are always one-to-one
-		rowNum = len(self.productRows) + 1 # One extra row for the headers.
-		newNameVar = tk.StringVar()
-		newDoseVarG = tk.StringVar()
-		newDoseVarB = tk.StringVar()
-		newActivityVar = tk.StringVar()
-		newDoseVarABG = tk.StringVar()
-		newDoseVarABB = tk.StringVar()
-		newActivityVarAB = tk.StringVar()
-		newNameLabelD = tk.Label(self.winDose, textvariable = newNameVar)
-		newNameLabelD.grid(row = rowNum, column = 0)
-		newNameLabelA = tk.Label(self.winActivity, textvariable = newNameVar)
-		newNameLabelA.grid(row = rowNum, column = 0)
-		newDoseLabelG = tk.Label(self.winDose, textvariable = newDoseVarG)
-		newDoseLabelG.grid(row = rowNum, column = 1)
-		newDoseLabelB = tk.Label(self.winDose, textvariable = newDoseVarB)
-		newDoseLabelB.grid(row = rowNum, column = 2)
-		newDoseLabelABG = tk.Label(self.winDose, textvariable = newDoseVarABG)
-		newDoseLabelABG.grid(row = rowNum, column = 3)
-		newDoseLabelABB = tk.Label(self.winDose, textvariable = newDoseVarABB)
-		newDoseLabelABB.grid(row = rowNum, column = 4)
-		newActivityLabel = tk.Label(self.winActivity, textvariable = newActivityVar)
-		newActivityLabel.grid(row = rowNum, column = 1)
-		newActivityLabelAB = tk.Label(self.winActivity, textvariable = newActivityVarAB)
-		newActivityLabelAB.grid(row = rowNum, column = 2)
-		 # Save all the control-variables and UI objects in our data structure
-		self.productRows.append({"nameVar": newNameVar, "doseVarG": newDoseVarG, "doseVarB": newDoseVarB, "activityVar": newActivityVar, "doseVarABG": newDoseVarABG, "doseVarABB": newDoseVarABB, "activityVarAB": newActivityVarAB, "nameLabelA": newNameLabelA, "nameLabelD": newNameLabelD, "doseLabelB": newDoseLabelB, "doseLabelG": newDoseLabelG, "activityLabel": newActivityLabel, "doseLabelABG": newDoseLabelABG, "doseLabelABB": newDoseLabelABB, "activityLabelAB": newActivityLabelAB})
-	
-	def destroyGammaRows(self):
-		# Empty the Gammas table so that we can fill it with new data
-		for row in self.gammaRows:
-			row["nameLabel"].grid_forget()
-			row["energyLabel"].grid_forget()
-			row["ratioLabel"].grid_forget()
-		self.gammaRows = []
-	
-	def destroyBetaRows(self):
-		# Empty the Gammas table so that we can fill it with new data
-		for row in self.betaRows:
-			row["nameLabel"].grid_forget()
-			row["energyLabel"].grid_forget()
-			row["ratioLabel"].grid_forget()
-		self.betaRows = []
-	
-	def destroyProductRows(self):
-		# Empty the Dose/Activity table so we can refill it
-		for row in self.productRows:
-			row["nameLabelA"].grid_forget()
-			row["nameLabelD"].grid_forget()
-			row["doseLabelB"].grid_forget()
-			row["doseLabelG"].grid_forget()
-			row["activityLabel"].grid_forget()
-			row["doseLabelABB"].grid_forget()
-			row["doseLabelABG"].grid_forget()
-			row["activityLabelAB"].grid_forget()
-		self.productRows = []
-	
 	def locateFluxProfile(self, event):
 		# Ask the user for a flux profile file
-		self.profileVar.set(tkFileDialog.askopenfilename(title="Select Flux Profile") or self.profileVar.get())
-		path = self.profileVar.get()
-		if path: # Check to see if they gave us one
-			reader = csv.reader(open(path)) # And if they did, load it in
-			iFlux = [(float(r[0]), float(r[1])) for r in reader]
-			tFlux = np.transpose(iFlux)
-			edsSrc = EAFDataSource()._src_group_struct # Get the EAF group structure
-			self.flux = pointwise_collapse(edsSrc, np.flipud(tFlux[0]), np.flipud(tFlux[1] * 1.738e16 / 230)) # Scale the flux from flux per source neutron to flux at 1 kW, then interpolate to fit EAF group structure
-
-	def constructMaterial(self):
-		# Take all the isotopes mentioned in the Setup tab, combine them into a PyNE material
-		ratioType = self.ratioTypeVar.get()
+		self.profileVar.set(tkFileDialog.askopenfilename(title="Select Flux Profile", initialdir=engine.FLUX_PROFILE_DIR) or self.profileVar.get())
+		# The profile itself gets loaded by the worker, the next time we calculate anything
+
+	def readIsotopes(self):
+		# Take all the isotopes mentioned in the Setup tab (the pipeline combines them into a PyNE material)
 		isotopes = {}
 		for row in self.elementRows:
 			eltName = row["nameVar"].get()
 			ratio = row["ratioVar"].get()
 			if eltName and ratio:
 				isotopes[eltName] = float(ratio)
-		if ratioType == 'Mass Ratio':
-			self.material = Material(isotopes, mass=float(self.massVar.get()))
-		else:
-			self.material = Material(mass=float(self.massVar.get()))
-			self.material.from_atom_frac(isotopes) # Automatically switches from atom ratios to mass ratios
-		# Manually replace "Natural Tantalum" with correct natural distribution of isotopes. PyNE incorrectly lists natural Tantalum as 0.012% Ta-180 and 99.988% Ta-181, when in actuality it is 0.012% Ta-180M and 99.988% Ta-181.
-		if 730000000 in self.material:
-			self.material[731800001] = self.material[730000000] * 0.00011943600030691943
-			self.material[731810000] = self.material[730000000] * 0.999880563999693
-			del self.material[730000000]
-		self.material = self.material.expand_elements() # Replaces elements with the natural distribution of isotopes; this will fail if you ask for "Natural Plutonium" or similar. Don't try to irradiate natural Plutonium. It doesn't exist.
+		return isotopes
+
+	def warmUp(self):
+		shown = time.time() - STARTED
+		def done(times):
+			return "Ready - window shown in %.2f s, everything loaded in %.2f s" % (shown, time.time() - STARTED)
+		self.startJob(startup.warmUpTask, done)
+
+	def startJob(self, task, done):
+		# Hand task(job) to the worker, and call done(answer) back here on the Tk thread when it's finished.
+		# done() can return a message for the status bar; otherwise it shows how long each stage took.
+		# Anything still running is superseded - its answer will never be shown.
+		def traced(job): # Keep the timings of every stage, for the status bar
+			with trace.collect() as spans:
+				answer = task(job)
+			return answer, spans
+		self.job = self.worker.submit(traced)
+		self.jobDone = done
+		self.progressVar.set(0.0)
+		self.statusVar.set("Starting...")
+		self.cancelButton.config(state = tk.NORMAL)
+
+	def cancelJob(self):
+		self.worker.cancel()
+		self.job = None
+		self.progressVar.set(0.0)
+		self.statusVar.set("Cancelled")
+		self.cancelButton.config(state = tk.DISABLED)
+
+	def pollWorker(self):
+		# Pick up whatever the worker has sent back since last time (Tk widgets can only be touched from this thread)
+		self.after(50, self.pollWorker)
+		if self.job is not None:
+			for kind, value in self.worker.poll():
+				if kind == "progress":
+					stage, fraction = value
+					self.statusVar.set(stage + "...")
+					self.progressVar.set(fraction)
+				elif kind == "done":
+					answer, spans = value
+					done = self.jobDone
+					self.job = None
+					self.statusVar.set("Showing results...")
+					self.progressVar.set(0.9)
+					self.update_idletasks()
+					with trace.collect() as rendering:
+						message = done(answer)
+						with trace.span("tk.layout"):
+							self.update_idletasks()
+					spans.records.extend(rendering.records)
+					self.statusVar.set(message or "Done: " + spans.summary())
+					self.progressVar.set(1.0)
+				else:
+					error, details = value
+					self.job = None
+					self.statusVar.set("Error: %s" % error)
+					self.progressVar.set(0.0)
+					sys.stderr.write(details)
+				if self.job is None:
+					self.cancelButton.config(state = tk.DISABLED)
+					break
+
+	def findLimit(self):
+		# Find the longest time (or highest power) that keeps the sample under the limit - after the delay on the Dose/Activity tabs, if there is one - and put it in the Setup tab
+		isotopes, mass, ratioType, profile = self.readIsotopes(), self.massVar.get(), self.ratioTypeVar.get(), self.profileVar.get()
+		power, time, delay = self.powerVar.get(), self.timeVar.get(), self.delayVar.get()
+		limit = float(self.limitVar.get())
+		quantity = "dose"
+		if self.limitTypeVar.get() == 'Activity (mCi)':
+			quantity = "activity"
+			limit *= engine.BQ_PER_MCI # Bq/mCi conversion
+		distance = float(self.distanceVar.get() or 30)
+		solveFor = self.solveForVar.get()
+		def task(job): # Runs on the worker thread - no Tk in here
+			from starfish import inverse
+			job.progress("Loading flux profile", 0.0)
+			material = self.pipeline.material(isotopes, mass, ratioType)
+			flux = self.pipeline.flux(profile)
+			job.progress("Searching for the limit", 0.1)
+			after = engine.parseTime(delay) if delay else 0.0
+			if solveFor == 'Time':
+				return inverse.maxTime(material, flux, float(power), limit, quantity, after, distance)
+			return inverse.maxPower(material, flux, engine.parseTime(time), limit, quantity, after, distance)
+		def done(answer):
+			if "time" in answer:
+				self.timeVar.set(engine.formatTime(answer["time"]))
+				found = "at most " + engine.formatTime(answer["time"])
+			else:
+				self.powerVar.set("%.4g" % answer["power"])
+				found = "at most %.4g kW" % answer["power"]
+			if quantity == "activity":
+				self.limitResultVar.set("%s (%.4g mCi)" % (found, answer["value"] / engine.BQ_PER_MCI))
+			else:
+				self.limitResultVar.set("%s (%.4g mR/h)" % (found, answer["value"]))
+		self.startJob(task, done)
 
 	def bombardMaterial(self):
-		# This is where everything happens.
-		t = Transmuter()
-		reader = csv.reader(open("air_gamma.csv")) # This file is from NIST: http://physics.nist.gov/PhysRefData/XrayMassCoef/ComTab/air.html
-		air_gamma = np.transpose([[float(x) for x in row] for row in reader])
-		gammaf = interp1d(air_gamma[0], air_gamma[1]) # Interpolate mu/rho data from NIST. This could be upgraded to a cubic interpolation for a slight improvement in accuracy.
-		cal = pdt.Calendar()
-		deltaT = (cal.parseDT(self.timeVar.get(), sourceTime=datetime.datetime.min)[0] - datetime.datetime.min).total_seconds() # Parse the irradiation time
-		self.product = t.transmute(self.material, float(deltaT), self.flux * float(self.powerVar.get())) # Get PyNE to do the transmutation for us.
-		for iso in self.product:			# These three lines fix a bug involving the irradiation of W-186.
-			if np.isnan(decay_const(iso)):	# PyNE claims it produces a negligible amount of Ta-187, and the half-life of Ta-187 is unknown.
-				del self.product[iso]		# This removes all isotopes with unknown half-lives from the output.
-		if self.delayVar.get():				# If we don't have a Time After Bombardment, don't calculate dose after decaying
-			decayT = (cal.parseDT(self.delayVar.get(), sourceTime=datetime.datetime.min)[0] - datetime.datetime.min).total_seconds() # Parse decay time
-			self.product_after = t.transmute(self.product, decayT, 0) # PyNE's decay() function is broken, so we just irradiate with 0 flux, which is equivalent to allowing it to decay.
+		# The physics is all in starfish/engine.py; the pipeline only re-runs the stages whose inputs have changed since last time.
+		# It all happens on the worker thread, so read everything we need out of the Tk variables first.
+		inputs = (self.readIsotopes(), self.massVar.get(), self.ratioTypeVar.get(), self.profileVar.get(), self.powerVar.get(), self.timeVar.get(), self.delayVar.get())
+		threshold = float(self.thresholdVar.get()) if self.thresholdVar.get() else None
+		schedule = self.scheduleVar.get().strip()
+		tier = self.tierVar.get().lower()
+		sample = {"composition": inputs[0], "mass": float(inputs[1] or 0), "ratioType": inputs[2], "profile": inputs[3]}
+		if schedule:
+			sample["schedule"] = schedule
 		else:
-			self.product_after = {}
-		self.destroyProductRows() # Wipe the tables, fresh start.
-		self.destroyGammaRows()
-		self.destroyBetaRows()
-		totalDoseG = 0 # Set up accumulators...
-		totalDoseABG = 0
-		totalDoseB = 0 # Set up accumulators...
-		totalDoseABB = 0
-		totalAct = 0
-		totalActAB = 0
-		self.addProductRow() # ... to put in a row at the top...
-		self.productRows[0]["nameVar"].set("TOTAL") # ... with the total dose and activity.
-		for iso, mass in sorted(self.product.mult_by_mass().items(), key=lambda x: -x[1]*decay_const(x[0])): # Sort isotopes by the activity in the initial product.
-			if decay_const(iso) == 0.0: # If they're stable, don't show them.
-				continue
-			self.addProductRow() # Create a new table row
-			self.productRows[-1]["nameVar"].set(nucname.name(iso))
-			act = mass * decay_const(iso) * 6.022e23 / atomic_mass(iso) # Convert from mass to number, then to activity.
-			if self.bq: # Check if we want output in Becquerels or Curies
-				self.productRows[-1]["activityVar"].set(str(act))
-			else:
-				self.productRows[-1]["activityVar"].set(str(act/37000000)) # Bq/mCi conversion
-			if iso in self.product_after: # If there's any left after allowing it to decay...
-				actAB = self.product_after.mult_by_mass()[iso] * decay_const(iso) * 6.022e23 / atomic_mass(iso) # ... then note down the activity there.
-				if self.bq:
-					self.productRows[-1]["activityVarAB"].set(str(actAB))
-				else:
-					self.productRows[-1]["activityVarAB"].set(str(actAB/37000000)) # Bq/mCi conversion
-			else: # Otherwise, leave it at 0.
-				actAB = 0
-				self.productRows[-1]["activityVarAB"].set("0")
-			doseG = 0 # Accumulators to sum the dose over all the gammas
-			doseABG = 0
-			doseB = 0 # Accumulators to sum the dose over all the betas
-			doseABB = 0
-			gammas = np.array(gamma_photon_intensity(iso)) * np.array(gamma_energy(iso)) / 100
-			for idx in range(len(gamma_photon_intensity(iso))):
-				if not (np.isnan(gamma_energy(iso)[idx][0]) or np.isnan(gamma_photon_intensity(iso)[idx][0])): # Ignore gammas with unknown energy or branch-ratio
-					if self.thresholdVar.get() and gamma_photon_intensity(iso)[idx][0] >= float(self.thresholdVar.get()): # If below threshold energy, don't put in the table, but still use in dose calculation
-						self.addGammaRow()
-						self.gammaRows[-1]["nameVar"].set(nucname.name(iso))
-						self.gammaRows[-1]["energyVar"].set(gamma_energy(iso)[idx][0])
-						self.gammaRows[-1]["ratioVar"].set(gamma_photon_intensity(iso)[idx][0])
-
-					mev = gamma_energy(iso)[idx][0] / 1000 # Default energy is specified in keV. Convert.
-					gf = gammaf(mev) # Get interpolated mu/rho for that energy of gammas in air
-					dpa = gamma_photon_intensity(iso)[idx][0] * 5.263e-6 * mev * gf / 90000 # Get the dose per Becquerel
-					doseG += dpa * act # And then the actual dose (in R/hr)
-					doseABG += dpa * actAB # So we can update our accumulators accordingly
-			for idx in range(len(beta_intensity(iso))): # Same as above, for betas
-				if not np.isnan(beta_intensity(iso)[idx]):
-					if self.thresholdVar.get() and beta_intensity(iso)[idx] >= float(self.thresholdVar.get()):
-						self.addBetaRow()
-						self.betaRows[-1]["nameVar"].set(nucname.name(iso))
-						self.betaRows[-1]["energyVar"].set(beta_average_energy(iso)[idx])
-						self.betaRows[-1]["ratioVar"].set(beta_intensity(iso)[idx])
-
-					dpa = 8e-12 * 100 * beta_intensity(iso)[idx] / (0.3 * 0.3) # Approximate formula for beta dose per Becquerel from the Handbook of Health Physics and Radiological Health - yes, this does not depend on beta energy. An improvement that could be made here is to find a better formula, or a data table like the one we use for gammas, and take into account the beta energy.
-					doseB += dpa * act
-					doseABB = dpa * actAB
-			self.productRows[-1]["doseVarB"].set(str(doseB * 1000)) # 1 R/hr = 1000 mR/hr
-			self.productRows[-1]["doseVarABB"].set(str(doseABB * 1000))
-			self.productRows[-1]["doseVarG"].set(str(doseG * 1000)) # 1 R/hr = 1000 mR/hr
-			self.productRows[-1]["doseVarABG"].set(str(doseABG * 1000))
-			totalDoseB += doseB # Update our accumulators
-			totalDoseG += doseG # Update our accumulators
-			totalDoseABB += doseABB
-			totalDoseABG += doseABG
-			totalAct += act
-			totalActAB += actAB
-		# These are all for the TOTAL row
-		if self.bq:
-			self.productRows[0]["activityVar"].set(str(totalAct))
-			self.productRows[0]["activityVarAB"].set(str(totalActAB))
-		else:
-			self.productRows[0]["activityVar"].set(str(totalAct/37000000)) # Bq/mCi conversion
-			self.productRows[0]["activityVarAB"].set(str(totalActAB/37000000))
-		self.productRows[0]["doseVarB"].set(str(totalDoseB * 1000)) # 1 R/hr = 1000 mR/hr
-		self.productRows[0]["doseVarABB"].set(str(totalDoseABB * 1000))
-		self.productRows[0]["doseVarG"].set(str(totalDoseG * 1000)) # 1 R/hr = 1000 mR/hr
-		self.productRows[0]["doseVarABG"].set(str(totalDoseABG * 1000))
+			sample.update(power = float(inputs[4] or 0), time = inputs[5])
+		def task(job):
+			engine.TIER = tier # Everything else (positions, uncertainty, shielding) follows the Setup tab's tier too
+			return self.pipeline.calculate(*inputs, threshold = threshold, progress = job.progress, schedule = schedule)
+		def done(answer):
+			self.material, self.flux, self.product, self.product_after = answer["material"], answer["flux"], answer["product"], answer["after"]
+			self.productSample = sample
+			results = answer["results"]
+			self.productResults = (results, inputs[6])
+			if self.rendered != (results["key"], threshold, self.bq): # Nothing's changed since we last filled the tables in
+				self.renderResults(results, answer["lines"])
+				self.rendered = (results["key"], threshold, self.bq)
+			dropped = answer["dropped"]
+			if dropped["tier"] != "standard": # Say what the faster (or slower) tier did differently
+				return "%s: %.3g atoms (%.2g of the sample) left out%s%s" % (dropped["tier"].capitalize(), dropped["atoms"], dropped["fraction"],
+					", %.3g Bq (%.2g of the activity) cut" % (dropped["activity"], dropped["activityFraction"]) if dropped["activity"] else "",
+					"; no depth limit with the chain solver" if dropped["depthSkipped"] else "")
+		self.startJob(task, done)
+
+	def switchPanelUncertainty(self):
+		# See switchPanelDose for an explanation of the separate pieces of this.
+		self.findUncertainty()
+		self.panelSetup.grid_forget()
+		self.panelDose.grid_forget()
+		self.panelActivity.grid_forget()
+		self.panelGammas.grid_forget()
+		self.panelBetas.grid_forget()
+		self.panelPositions.grid_forget()
+		self.panelShielding.grid_forget()
+		self.panelSpectrum.grid_forget()
+		self.panelUncertainty.grid(row=1, column=0, sticky=tk.N+tk.S+tk.E+tk.W)
+
+	def switchPanelShielding(self):
+		# See switchPanelDose for an explanation of the separate pieces of this.
+		self.findShielding()
+		self.panelSetup.grid_forget()
+		self.panelDose.grid_forget()
+		self.panelActivity.grid_forget()
+		self.panelGammas.grid_forget()
+		self.panelBetas.grid_forget()
+		self.panelPositions.grid_forget()
+		self.panelUncertainty.grid_forget()
+		self.panelSpectrum.grid_forget()
+		self.panelShielding.grid(row=1, column=0, sticky=tk.N+tk.S+tk.E+tk.W)
 
+	def switchPanelSpectrum(self):
+		# See switchPanelDose for an explanation of the separate pieces of this.
+		self.findSpectrum()
+		self.panelSetup.grid_forget()
+		self.panelDose.grid_forget()
+		self.panelActivity.grid_forget()
+		self.panelGammas.grid_forget()
+		self.panelBetas.grid_forget()
+		self.panelPositions.grid_forget()
+		self.panelUncertainty.grid_forget()
+		self.panelShielding.grid_forget()
+		self.panelSpectrum.grid(row=1, column=0, sticky=tk.N+tk.S+tk.E+tk.W)
+
+	def comparePositions(self):
+		# The Setup tab's sample in every flux profile, side by side; the profile picked on the Setup tab doesn't matter here
+		isotopes, mass, ratioType = self.readIsotopes(), self.massVar.get(), self.ratioTypeVar.get()
+		power, time, delay = self.powerVar.get(), self.timeVar.get(), self.delayVar.get()
+		def task(job):
+			from starfish import positions
+			job.progress("Irradiating in every position", 0.1)
+			material = self.pipeline.material(isotopes, mass, ratioType)
+			return positions.comparePositions(material, float(power), engine.parseTime(time), engine.parseTime(delay) if delay else None)
+		def done(rows):
+			column = lambda key: np.array([row[key] for row in rows])
+			self.positionsTable.setData([[row["profile"] for row in rows], column("activity"), column("doseG") + column("doseB"),
+				column("activityAfter"), column("doseGAfter") + column("doseBAfter"), [row["top"] for row in rows]])
+			if engine.SOLVER != "sparse": # All the positions are solved together, which only the sparse solver can do
+				return "Positions are worked out with the sparse solver, so they can differ slightly from the Setup tab's results"
+		self.startJob(task, done)
+
+	def findUncertainty(self):
+		# The Setup tab's sample, many times over with everything uncertain perturbed; after the delay, if there is one
+		isotopes, mass, ratioType, profile = self.readIsotopes(), self.massVar.get(), self.ratioTypeVar.get(), self.profileVar.get()
+		power, time, delay, samples = self.powerVar.get(), self.timeVar.get(), self.delayVar.get(), int(self.samplesVar.get() or 1000)
+		def task(job):
+			from starfish import uncertainty
+			material = self.pipeline.material(isotopes, mass, ratioType)
+			flux = self.pipeline.flux(profile)
+			return uncertainty.uncertainty(material, flux, float(power), engine.parseTime(time), engine.parseTime(delay) if delay else None, samples, progress = job.progress)
+		def done(answer):
+			rows = [answer["total"]] + answer["products"]
+			column = lambda key, i: np.array([row[key][i] for row in rows])
+			self.uncertaintyTable.setData([[row["name"] for row in rows], column("activity", 1), column("activity", 0), column("activity", 2),
+				column("dose", 1), column("dose", 0), column("dose", 2)])
+		self.startJob(task, done)
+
+	def addToInventory(self):
+		# Put the sample on the Dose tab into the inventory (see starfish/inventory.py), as coming out of the reactor now
+		if self.product is None:
+			self.statusVar.set("Nothing to add - calculate a sample first")
+			return
+		product, sample = self.product, dict(self.productSample, name = self.sampleNameVar.get() or None)
+		def task(job):
+			from starfish.inventory import Inventory
+			inventory = Inventory()
+			try:
+				return inventory.add(product, sample)
+			finally:
+				inventory.close()
+		def done(sampleId):
+			return "Added to the inventory as sample %d" % sampleId
+		self.startJob(task, done)
+
+	def exportResults(self):
+		# Write everything on the Dose, Activity, Gammas and Betas tabs - below the threshold too - as a columnar file (.sfc)
+		# or CSV tables (see starfish/export.py)
+		if self.productResults is None:
+			self.statusVar.set("Nothing to export - calculate a sample first")
+			return
+		path = tkFileDialog.asksaveasfilename(title = "Export Results", defaultextension = ".sfc", filetypes = [("Columnar results", "*.sfc"), ("CSV tables (name-products.csv...)", "*.csv")])
+		if not path:
+			return
+		results, delay = self.productResults
+		name = self.sampleNameVar.get() or "sample"
+		def task(job):
+			from starfish import export
+			record = {"index": 0, "name": name, "status": "ok", "total": results["total"], "products": results["products"], "gammas": results["gammas"], "betas": results["betas"]}
+			if delay:
+				record["delays"] = [{"delay": delay, "seconds": engine.parseTime(delay), "total": results["total"], "products": results["products"]}]
+			writer = export.openWriter(path[:-len(".csv")] if path.endswith(".csv") else path)
+			try:
+				for record in export.writeRecords([record], writer):
+					pass
+			finally:
+				writer.close()
+			return path
+		def done(path):
+			return "Exported to %s" % path
+		self.startJob(task, done)
+
+	def findShielding(self):
+		# The dose from the Setup tab's sample (after the delay, if there is one) over the whole grid of shields, thicknesses and distances
+		inputs = (self.readIsotopes(), self.massVar.get(), self.ratioTypeVar.get(), self.profileVar.get(), self.powerVar.get(), self.timeVar.get(), self.delayVar.get())
+		schedule = self.scheduleVar.get().strip()
+		distances = [float(x) for x in self.distancesVar.get().split()]
+		thicknesses = [float(x) for x in self.thicknessesVar.get().split()]
+		shields = self.shieldsVar.get().split()
+		def task(job):
+			from starfish import shielding
+			answer = self.pipeline.calculate(*inputs, progress = job.progress, schedule = schedule)
+			nuclides, activity = shielding.productActivity(answer["after"] if inputs[6] else answer["product"])
+			return shielding.doseGrid(nuclides, activity, distances, thicknesses, shields)
+		def done(grid):
+			cells = [(k, i, j) for k in range(len(shields)) for i in range(len(thicknesses)) for j in range(len(distances))]
+			column = lambda key: np.array([grid[key][cell] for cell in cells])
+			self.shieldingTable.setData([[shields[k] for k, i, j in cells], np.array([thicknesses[i] for k, i, j in cells]), np.array([distances[j] for k, i, j in cells]),
+				column("gamma"), column("beta"), column("gamma") + column("beta")])
+		self.startJob(task, done)
+
+	def findSpectrum(self):
+		# The Setup tab's sample's gamma spectrum at each of the times on the Spectrum tab
+		inputs = (self.readIsotopes(), self.massVar.get(), self.ratioTypeVar.get(), self.profileVar.get(), self.powerVar.get(), self.timeVar.get())
+		schedule = self.scheduleVar.get().strip()
+		times, width, high = self.spectrumTimesVar.get().split() or ["0"], self.binWidthVar.get(), self.maxEnergyVar.get()
+		def task(job):
+			from starfish import spectrum
+			answer = self.pipeline.calculate(*inputs, progress = job.progress, schedule = schedule)
+			job.progress("Binning gamma lines", 0.8)
+			seconds = [engine.parseTime(t) for t in times]
+			edges = spectrum.binEdges(0.0, float(high), float(width))
+			return edges, seconds, spectrum.productSpectrum(answer["product"], seconds, edges)
+		def done(answer):
+			self.spectrum = answer
+			self.plotSpectrum(*answer)
+		self.startJob(task, done)
+
+	def plotSpectrum(self, edges, times, rates):
+		# Photons/s per bin against energy, log scale, one line per time
+		canvas = self.spectrumCanvas
+		canvas.delete("all")
+		width, height = int(canvas["width"]), int(canvas["height"])
+		left, right, top, bottom = 70, width - 10, 10, height - 30
+		positive = rates[rates > 0]
+		if not len(positive):
+			canvas.create_text(width / 2, height / 2, text = "No gamma lines in this range")
+			return
+		high = np.ceil(np.log10(positive.max()))
+		low = max(np.floor(np.log10(positive.min())), high - 8) # Eight decades is plenty
+		x = lambda kev: left + (kev - edges[0]) / (edges[-1] - edges[0]) * (right - left)
+		y = lambda rate: bottom - (np.log10(np.maximum(rate, 10 ** low)) - low) / max(high - low, 1) * (bottom - top)
+		canvas.create_rectangle(left, top, right, bottom)
+		for decade in np.arange(low, high + 1):
+			canvas.create_line(left - 4, y(10 ** decade), left, y(10 ** decade))
+			canvas.create_text(left - 6, y(10 ** decade), text = "1e%d" % decade, anchor = tk.E)
+		for kev in np.linspace(edges[0], edges[-1], 7):
+			canvas.create_line(x(kev), bottom, x(kev), bottom + 4)
+			canvas.create_text(x(kev), bottom + 6, text = "%g" % kev, anchor = tk.N)
+		canvas.create_text(left - 6, top, text = "photons/s", anchor = tk.SE)
+		canvas.create_text(right, bottom + 18, text = "keV", anchor = tk.E)
+		colours = ["blue", "red", "dark green", "purple", "orange", "black"]
+		for k, (t, row) in enumerate(zip(times, rates)):
+			xs, ys = x(edges), y(row)
+			points = np.column_stack([xs[:-1], ys, xs[1:], ys]).ravel() # Flat across each bin
+			canvas.create_line(*points.tolist(), fill = colours[k % len(colours)])
+			canvas.create_text(right - 5, top + 5 + 15 * k, text = "%s after (%.3g photons/s)" % (engine.formatTime(t), row.sum()), fill = colours[k % len(colours)], anchor = tk.NE)
+
+	def saveSpectrum(self):
+		# Every bin at every time, as CSV or a columnar .sfc file (see starfish/spectrum.py)
+		if self.spectrum is None:
+			self.statusVar.set("Nothing to save - show a spectrum first")
+			return
+		path = tkFileDialog.asksaveasfilename(title = "Save Spectrum", defaultextension = ".csv", filetypes = [("CSV", "*.csv"), ("Columnar results", "*.sfc")])
+		if not path:
+			return
+		edges, times, rates = self.spectrum
+		name = self.sampleNameVar.get() or "sample"
+		def task(job):
+			from starfish import spectrum
+			spectrum.writeSpectrum(path, edges, times, rates, name)
+			return path
+		def done(path):
+			return "Saved the spectrum to %s" % path
+		self.startJob(task, done)
+
+	def renderResults(self, results, lines):
+		with trace.span("render", rows=len(results["products"]) + len(lines["gammas"]) + len(lines["betas"])):
+			self.fillTables(results, lines)
+
+	def fillTables(self, results, lines):
+		rows = [results["total"]] + results["products"] # TOTAL goes at the top
+		names = [row["name"] for row in rows]
+		column = lambda key: np.array([row[key] for row in rows])
+		scale = 1.0 if self.bq else 1.0 / engine.BQ_PER_MCI # Check if we want output in Becquerels or Curies
+		self.doseTable.setData([names, column("doseG"), column("doseB"), column("doseGAfter"), column("doseBAfter")])
+		self.activityTable.setData([names, column("activity") * scale, column("activityAfter") * scale])
+		for table, kind in ((self.gammaTable, "gammas"), (self.betaTable, "betas")):
+			table.setData([[line["name"] for line in lines[kind]], np.array([line["energy"] for line in lines[kind]]), np.array([line["intensity"] for line in lines[kind]])])
 
 
 app = IRApplication() # Create an instance of the application object defined above
@@ -0,0 +1,2 @@
+# Starfish compute engine - everything the irradiation planning tool does, without the Tk window.
+# ir.py is the GUI; `python -m starfish` is the command-line front end.
@@ -0,0 +1,247 @@
+# Command-line front end: python -m starfish <command> ...
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+
+def batchCommand(args):
+	from starfish import batch
+	samples = batch.readManifest(args.manifest)
+	tables = args.format in ("columnar", "tables")
+	if tables and not args.output:
+		print("-f %s needs -o: a .sfc file for columnar, or a prefix for the CSV tables" % args.format, file=sys.stderr)
+		return 2
+	out = open(args.output, "w") if args.output and not tables else sys.stdout
+	failed = [0]
+	def report(records):
+		for record in records:
+			if record["status"] != "ok":
+				failed[0] += 1
+				print("Sample %s (%s) failed:\n%s" % (record["index"], record["name"], record.get("traceback", record.get("error"))), file=sys.stderr)
+			yield record
+	if tables:
+		batch.writeTables(report(batch.runBatch(samples, args.jobs, lines=True)), args.output, args.format)
+	else:
+		batch.writeResults(report(batch.runBatch(samples, args.jobs)), out, args.format)
+	if out is not sys.stdout:
+		out.close()
+	return 1 if failed[0] else 0
+
+def benchCommand(args):
+	from starfish import bench
+	return bench.benchCommand(args)
+
+def compareCommand(args):
+	from starfish import bench
+	return bench.compareCommand(args)
+
+def nucdataCommand(args):
+	import shutil
+	from starfish import nucdata
+	directory = nucdata.snapshotDir()
+	if os.path.isdir(directory):
+		shutil.rmtree(directory)
+	nucdata.build(directory)
+	print("%d nuclides saved in %s" % (len(nucdata.NuclearData(directory).nuclides), directory))
+	return 0
+
+def startupCommand(args):
+	from starfish import startup
+	return startup.reportCommand(args)
+
+def crosscheckCommand(args):
+	from starfish import batch, engine, sparse
+	from pyne import nucname
+	material = engine.constructMaterial(batch.parseComposition(args.composition), args.mass, args.ratio_type)
+	flux = engine.loadFluxProfile(args.profile)
+	rows = sparse.crossCheck(material, flux, args.power, engine.parseTime(args.time), args.tol)
+	print("%-10s %14s %14s %10s" % ("Nuclide", "chain (g)", "sparse (g)", "rel. diff"))
+	worst = 0.0
+	for nuc, chain, matrix in rows[:args.top]:
+		diff = abs(matrix - chain) / max(chain, matrix)
+		worst = max(worst, diff)
+		print("%-10s %14.6g %14.6g %10.2e" % (nucname.name(nuc), chain, matrix, diff))
+	print("Largest relative difference in the top %d: %.2e" % (min(args.top, len(rows)), worst))
+	return 0
+
+def verifyCommand(args):
+	from starfish import verify
+	return verify.verifyCommand(args)
+
+def positionsCommand(args):
+	from starfish import positions
+	return positions.positionsCommand(args)
+
+def uncertaintyCommand(args):
+	from starfish import uncertainty
+	return uncertainty.uncertaintyCommand(args)
+
+def inventoryCommand(args):
+	from starfish import inventory
+	return inventory.inventoryCommand(args)
+
+def shieldingCommand(args):
+	from starfish import shielding
+	return shielding.shieldingCommand(args)
+
+def spectrumCommand(args):
+	from starfish import spectrum
+	return spectrum.spectrumCommand(args)
+
+def dumpCommand(args):
+	from starfish import export
+	return export.dumpCommand(args)
+
+def serveCommand(args):
+	from starfish import service
+	return service.serveCommand(args)
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(prog="starfish", description="Irradiation planning without the GUI.")
+	parser.add_argument("--solver", choices=["chain", "sparse"], help="Transmutation solver: PyNE's chain Transmuter (the default) or the sparse burnup matrix (same as setting STARFISH_SOLVER)")
+	parser.add_argument("--tier", choices=["screening", "standard", "full"], help="How much of the transmutation chains to follow: a quick screening, the standard, or full fidelity (same as setting STARFISH_TIER; see TIERS in starfish/engine.py)")
+	parser.add_argument("--trace", metavar="FILE", help="Append a JSON-lines record of how long each stage took to FILE (same as setting STARFISH_TRACE)")
+	commands = parser.add_subparsers(dest="command")
+	batchParser = commands.add_parser("batch", help="Irradiate every sample in a CSV/JSON manifest")
+	batchParser.add_argument("manifest", help="CSV or JSON manifest of samples (see starfish/batch.py for the columns)")
+	batchParser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes (default: one per CPU)")
+	batchParser.add_argument("-o", "--output", help="Write results here instead of standard output")
+	batchParser.add_argument("-f", "--format", choices=["jsonl", "csv", "columnar", "tables"], default="jsonl",
+		help="One JSON record per sample, a flat CSV summary, or every product and line as one columnar file or CSV tables (see starfish/export.py)")
+	batchParser.set_defaults(func=batchCommand)
+	benchParser = commands.add_parser("bench", help="Time each stage of the engine on a fixed set of samples")
+	benchParser.add_argument("-k", "--match", help="Only run cases whose id (\"sample / profile / power / time\") contains this")
+	benchParser.add_argument("-r", "--repeat", type=int, default=3, help="Runs of each case; the best is reported alongside the first (default: 3)")
+	benchParser.add_argument("--fresh-cache", action="store_true", help="Start from an empty cache directory instead of the usual one")
+	benchParser.add_argument("--tiers", nargs="+", choices=["screening", "standard", "full"], help="Run every case at each of these tiers (default: --tier), and report how much faster each is than standard")
+	benchParser.add_argument("-o", "--output", help="Write the JSON results here instead of standard output")
+	benchParser.set_defaults(func=benchCommand)
+	compareParser = commands.add_parser("compare", help="Compare two sets of benchmark results")
+	compareParser.add_argument("baseline", help="JSON results from starfish bench, e.g. from the previous commit")
+	compareParser.add_argument("current", help="JSON results to check against the baseline")
+	compareParser.add_argument("-t", "--threshold", type=float, default=0.1, help="Flag stages more than this fraction slower (default: 0.1)")
+	compareParser.add_argument("--which", choices=["best", "first"], default="best", help="Compare the best runs, or the first run in each process")
+	compareParser.add_argument("-a", "--all", action="store_true", help="Show every stage, not just totals and regressions")
+	compareParser.set_defaults(func=compareCommand)
+	nucdataParser = commands.add_parser("nucdata", help="Rebuild the snapshot of PyNE's nuclear data in the cache directory (otherwise done the first time it's needed)")
+	nucdataParser.set_defaults(func=nucdataCommand)
+	startupParser = commands.add_parser("startup", help="Measure how long the GUI takes to start, from a cold start")
+	startupParser.add_argument("--json", action="store_true", help="Print the times as JSON, for keeping track of them")
+	startupParser.set_defaults(func=startupCommand)
+	crosscheckParser = commands.add_parser("crosscheck", help="Irradiate one sample with both solvers and compare the products")
+	crosscheckParser.add_argument("composition", help="Space-separated element:ratio list, e.g. \"W:1\"")
+	crosscheckParser.add_argument("mass", type=float, help="Grams")
+	crosscheckParser.add_argument("profile", help="Flux profile CSV, a path or a file in FluxProfiles/")
+	crosscheckParser.add_argument("power", type=float, help="kW")
+	crosscheckParser.add_argument("time", help="Irradiation time, e.g. 2h")
+	crosscheckParser.add_argument("--ratio-type", default="Mass Ratio", choices=["Mass Ratio", "Number Ratio"])
+	crosscheckParser.add_argument("--tol", type=float, default=1e-10, help="Smallest fraction of a target the sparse solver follows (default: 1e-10)")
+	crosscheckParser.add_argument("--top", type=int, default=30, help="How many of the biggest products to show (default: 30)")
+	crosscheckParser.set_defaults(func=crosscheckCommand)
+	verifyParser = commands.add_parser("verify", help="Check the decay engine and the sparse solver's CRAM against SciPy's expm on awkward made-up chains")
+	verifyParser.set_defaults(func=verifyCommand)
+	positionsParser = commands.add_parser("positions", help="Irradiate one sample in every flux profile and compare activity and dose side by side")
+	positionsParser.add_argument("composition", help="Space-separated element:ratio list, e.g. \"Au:1\"")
+	positionsParser.add_argument("mass", type=float, help="Grams")
+	positionsParser.add_argument("power", type=float, help="kW")
+	positionsParser.add_argument("time", help="Irradiation time, e.g. 2h")
+	positionsParser.add_argument("--delay", help="Also show activity and dose this long after bombardment, e.g. 1h")
+	positionsParser.add_argument("--ratio-type", default="Mass Ratio", choices=["Mass Ratio", "Number Ratio"])
+	positionsParser.add_argument("--directory", help="Compare the profiles in this directory instead of FluxProfiles/")
+	positionsParser.set_defaults(func=positionsCommand)
+	uncertaintyParser = commands.add_parser("uncertainty", help="Monte Carlo percentiles of a sample's activity and dose (see starfish/uncertainty.py)")
+	uncertaintyParser.add_argument("composition", help="Space-separated element:ratio list, e.g. \"Au:1\"")
+	uncertaintyParser.add_argument("mass", type=float, help="Grams")
+	uncertaintyParser.add_argument("profile", help="Flux profile CSV, a path or a file in FluxProfiles/")
+	uncertaintyParser.add_argument("power", type=float, help="kW")
+	uncertaintyParser.add_argument("time", help="Irradiation time, e.g. 2h")
+	uncertaintyParser.add_argument("--delay", help="Report this long after bombardment instead of at the end of it, e.g. 1h")
+	uncertaintyParser.add_argument("--ratio-type", default="Mass Ratio", choices=["Mass Ratio", "Number Ratio"])
+	uncertaintyParser.add_argument("-n", "--samples", type=int, default=1000, help="How many samples (default: 1000)")
+	uncertaintyParser.add_argument("--seed", type=int, default=None, help="Random seed, for the same answer every time")
+	uncertaintyParser.add_argument("--top", type=int, default=15, help="How many products to show (default: 15)")
+	uncertaintyParser.set_defaults(func=uncertaintyCommand)
+	inventoryParser = commands.add_parser("inventory", help="The shelf of irradiated samples: add, remove, list, and check against release limits (see starfish/inventory.py)")
+	inventoryParser.add_argument("--database", help="SQLite file (default: $STARFISH_INVENTORY or ~/.local/share/starfish/inventory.sqlite)")
+	inventoryActions = inventoryParser.add_subparsers(dest="action")
+	inventoryActions.required = True
+	addParser = inventoryActions.add_parser("add", help="Irradiate a sample and put it on the shelf")
+	addParser.add_argument("composition", help="Space-separated element:ratio list, e.g. \"Au:1\"")
+	addParser.add_argument("mass", type=float, help="Grams")
+	addParser.add_argument("profile", help="Flux profile CSV, a path or a file in FluxProfiles/")
+	addParser.add_argument("power", type=float, nargs="?", help="kW")
+	addParser.add_argument("time", nargs="?", help="Irradiation time, e.g. 2h")
+	addParser.add_argument("--schedule", help="Instead of power and time, e.g. \"(250 8h, 0 16h) x 5\"")
+	addParser.add_argument("--name", help="What to call it")
+	addParser.add_argument("--ratio-type", default="Mass Ratio", choices=["Mass Ratio", "Number Ratio"])
+	addParser.add_argument("--eob", help="When it came out of the reactor (default: now)")
+	removeParser = inventoryActions.add_parser("remove", help="Take samples off the shelf (released or disposed of)")
+	removeParser.add_argument("ids", type=int, nargs="+")
+	removeParser.add_argument("--at", help="When (default: now)")
+	listParser = inventoryActions.add_parser("list", help="Activity and dose of everything on the shelf")
+	listParser.add_argument("--at", help="When, e.g. \"friday 5pm\" (default: now)")
+	listParser.add_argument("--all", action="store_true", help="Include samples that have been removed")
+	belowParser = inventoryActions.add_parser("below", help="Which samples are below a release limit by a given date")
+	belowParser.add_argument("limit", type=float, help="mR/h at 30 cm (or Bq, with --activity)")
+	belowParser.add_argument("--by", help="When, e.g. friday (default: now)")
+	belowParser.add_argument("--activity", action="store_true", help="The limit is an activity, in Bq")
+	inventoryParser.set_defaults(func=inventoryCommand)
+	shieldingParser = commands.add_parser("shielding", help="Dose from one sample at several distances behind several thicknesses of shielding")
+	shieldingParser.add_argument("composition", help="Space-separated element:ratio list, e.g. \"Au:1\"")
+	shieldingParser.add_argument("mass", type=float, help="Grams")
+	shieldingParser.add_argument("profile", help="Flux profile CSV, a path or a file in FluxProfiles/")
+	shieldingParser.add_argument("power", type=float, nargs="?", help="kW")
+	shieldingParser.add_argument("time", nargs="?", help="Irradiation time, e.g. 2h")
+	shieldingParser.add_argument("--schedule", help="Instead of power and time, e.g. \"(250 8h, 0 16h) x 5\"")
+	shieldingParser.add_argument("--delay", help="Dose this long after bombardment, e.g. 1h (default: at end of bombardment)")
+	shieldingParser.add_argument("--ratio-type", default="Mass Ratio", choices=["Mass Ratio", "Number Ratio"])
+	shieldingParser.add_argument("-d", "--distance", type=float, nargs="+", default=[30.0], help="Distances from the sample, cm (default: 30)")
+	shieldingParser.add_argument("-t", "--thickness", type=float, nargs="+", default=[0.0, 1.0, 2.0, 5.0, 10.0], help="Shield thicknesses, cm (default: 0 1 2 5 10)")
+	shieldingParser.add_argument("-s", "--shield", nargs="+", default=["lead"], choices=["lead", "steel", "water"], help="Shield materials (default: lead)")
+	shieldingParser.set_defaults(func=shieldingCommand)
+	spectrumParser = commands.add_parser("spectrum", help="Binned gamma emission spectrum of one sample at end of bombardment and after")
+	spectrumParser.add_argument("composition", help="Space-separated element:ratio list, e.g. \"Au:1\"")
+	spectrumParser.add_argument("mass", type=float, help="Grams")
+	spectrumParser.add_argument("profile", help="Flux profile CSV, a path or a file in FluxProfiles/")
+	spectrumParser.add_argument("power", type=float, nargs="?", help="kW")
+	spectrumParser.add_argument("time", nargs="?", help="Irradiation time, e.g. 2h")
+	spectrumParser.add_argument("--schedule", help="Instead of power and time, e.g. \"(250 8h, 0 16h) x 5\"")
+	spectrumParser.add_argument("--ratio-type", default="Mass Ratio", choices=["Mass Ratio", "Number Ratio"])
+	spectrumParser.add_argument("--at", nargs="+", default=["0"], help="Times after bombardment, e.g. 0 1h 1d (default: 0)")
+	spectrumParser.add_argument("--low", type=float, default=0.0, help="Lowest energy, keV (default: 0)")
+	spectrumParser.add_argument("--high", type=float, default=3000.0, help="Highest energy, keV (default: 3000)")
+	spectrumParser.add_argument("--width", type=float, default=1.0, help="Bin width, keV (default: 1)")
+	spectrumParser.add_argument("--top", type=int, default=10, help="How many of the brightest bins to show (default: 10)")
+	spectrumParser.add_argument("-o", "--output", help="Write every bin to this file: CSV, or a columnar .sfc file")
+	spectrumParser.set_defaults(func=spectrumCommand)
+	dumpParser = commands.add_parser("dump", help="Print a table from a columnar results file as CSV")
+	dumpParser.add_argument("path", help="Columnar file, from starfish batch -f columnar")
+	dumpParser.add_argument("table", choices=["samples", "totals", "products", "gammas", "betas", "curves", "spectra"])
+	dumpParser.add_argument("-c", "--columns", nargs="+", help="Just these columns")
+	dumpParser.set_defaults(func=dumpCommand)
+	serveParser = commands.add_parser("serve", help="Keep the engine warm and take irradiation requests over HTTP/JSON (see starfish/service.py)")
+	serveParser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1; 0.0.0.0 for other machines)")
+	serveParser.add_argument("--port", type=int, default=8642, help="Port to listen on (default: 8642)")
+	serveParser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes (default: one per CPU)")
+	serveParser.add_argument("--queue", type=int, default=64, help="Most requests waiting or running at once before turning new ones away (default: 64)")
+	serveParser.add_argument("--timeout", type=int, default=600, help="Seconds to wait for a result before giving up (default: 600)")
+	serveParser.set_defaults(func=serveCommand)
+	args = parser.parse_args(argv)
+	if args.solver:
+		from starfish import engine
+		engine.SOLVER = os.environ["STARFISH_SOLVER"] = args.solver
+	if args.tier:
+		from starfish import engine
+		engine.TIER = os.environ["STARFISH_TIER"] = args.tier
+	if args.trace:
+		from starfish import trace
+		trace.enable(args.trace)
+	if not hasattr(args, "func"):
+		parser.print_help()
+		return 2
+	return args.func(args)
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,127 @@
+# Run a whole manifest of samples through the engine in parallel, one result record per sample.
+#
+# A manifest is either a JSON list of sample objects or a CSV file with a header row. Columns/keys:
+#   name        - anything you like, copied into the output
+#   composition - {"Fe": 0.7, "Cr": 0.2} in JSON, or "Fe:0.7 Cr:0.2" in CSV
+#   ratioType   - "Mass Ratio" (default) or "Number Ratio"
+#   mass        - grams
+#   profile     - flux profile CSV, either a path or a file name in FluxProfiles/
+#   power       - kW
+#   time        - irradiation time, same format as the Setup tab ("2h", "1d 4h") or seconds
+#   schedule    - optional, instead of power and time: "(250 8h, 0 16h) x 5" (see schedule.py), or a list of [power, time] in JSON
+#   delays      - times after bombardment to report, a list in JSON or "1h;1d" in CSV
+#   doseLimit   - optional, mR/h at 30 cm; reports timeBelowLimit, the seconds after bombardment until the dose stays below it
+#   curve       - optional, a time after bombardment; reports the total activity and dose from 1 s to then (see engine.runSample)
+#   spectrum    - optional, times after bombardment like delays; reports the binned gamma spectrum at each (see spectrum.py)
+#
+# Results go out as JSON lines, a flat CSV summary, or the complete per-nuclide tables - every product, gamma and beta
+# line, decay curve and spectrum - as CSV files or one columnar file (see export.py).
+
+import csv
+import json
+import multiprocessing
+import traceback
+
+from starfish import engine
+from starfish.fluxstore import getFluxStore
+
+SUMMARY_FIELDS = ["index", "name", "status", "delay", "seconds", "activity", "doseG", "doseB", "error"]
+
+def parseComposition(text):
+	isotopes = {}
+	for part in text.replace(";", " ").split():
+		name, ratio = part.split(":")
+		isotopes[name] = float(ratio)
+	return isotopes
+
+def readManifest(path):
+	# Returns a list of sample dicts in the format engine.runSample expects
+	if path.endswith(".json"):
+		samples = json.load(open(path))
+	else:
+		samples = []
+		for row in csv.DictReader(open(path)):
+			sample = dict((k.strip(), v.strip()) for k, v in row.items() if k and v and v.strip())
+			sample["composition"] = parseComposition(sample["composition"])
+			sample["delays"] = [d.strip() for d in sample.get("delays", "").split(";") if d.strip()]
+			sample["spectrum"] = [t.strip() for t in sample.get("spectrum", "").split(";") if t.strip()]
+			samples.append(sample)
+	for idx, sample in enumerate(samples):
+		sample.setdefault("name", str(idx))
+		sample["mass"] = float(sample["mass"])
+		if "power" in sample:
+			sample["power"] = float(sample["power"])
+	return samples
+
+def runOne(args):
+	# Worker entry point. Never raises - a bad sample shouldn't take down the rest of the batch.
+	idx, sample, lines = args
+	record = {"index": idx, "name": sample.get("name")}
+	try:
+		results = engine.runSample(sample, getFluxStore().get(sample["profile"]))
+		record.update(status="ok", total=results["total"], products=results["products"], delays=results["delays"])
+		for key in ("timeBelowLimit", "curve", "spectrum", "dropped"):
+			if key in results:
+				record[key] = results[key]
+		if lines: # Every gamma and beta line, for the full export
+			record.update(gammas=results["gammas"], betas=results["betas"])
+	except Exception as e:
+		record.update(status="error", error="%s: %s" % (type(e).__name__, e), traceback=traceback.format_exc())
+	return record
+
+def runBatch(samples, processes=None, lines=False):
+	# Generator of result records, yielded as soon as each sample finishes (so not necessarily in manifest order - use "index").
+	# With lines=True, each record also has every gamma and beta line of the product.
+	for profile in set(sample.get("profile") for sample in samples if sample.get("profile")):
+		try:
+			getFluxStore().get(profile) # Collapse each profile once up front, rather than in every worker at the same time
+		except Exception: # Leave it to the samples that use it to report the problem
+			pass
+	pool = multiprocessing.Pool(processes)
+	# Samples irradiated under the same conditions share responses (see responses.py), so hand them out to the workers together
+	tasks = sorted(((idx, sample, lines) for idx, sample in enumerate(samples)), key=lambda task: (str(task[1].get("profile")), task[1].get("power", 0.0), str(task[1].get("time")), str(task[1].get("schedule"))))
+	chunk = max(1, len(tasks) // (4 * (processes or multiprocessing.cpu_count())))
+	try:
+		for record in pool.imap_unordered(runOne, tasks, chunk):
+			yield record
+		pool.close()
+	finally:
+		pool.terminate()
+		pool.join()
+
+def summaryRows(record):
+	# Flatten a record into CSV rows: one for end of bombardment, then one per delay time
+	base = {"index": record["index"], "name": record["name"], "status": record["status"], "error": record.get("error", "")}
+	if record["status"] != "ok":
+		yield base
+		return
+	for delay in [{"delay": "", "seconds": 0, "total": record["total"]}] + record["delays"]:
+		row = dict(base, delay=delay["delay"], seconds=delay["seconds"])
+		key = "After" if delay["delay"] else ""
+		for field in ("activity", "doseG", "doseB"):
+			row[field] = delay["total"][field + key]
+		yield row
+
+def writeTables(records, path, fmt="columnar"):
+	# Stream records into the full tables (see export.py): one columnar file at `path`, or CSV files with `path` as the prefix
+	from starfish import export
+	writer = export.ColumnarWriter(path) if fmt == "columnar" else export.CsvTables(path)
+	try:
+		for record in export.writeRecords(records, writer):
+			pass
+	finally:
+		writer.close()
+
+def writeResults(records, out, fmt="jsonl"):
+	# Stream records to a file object as JSON lines, or as the flattened CSV summary
+	if fmt == "csv":
+		writer = csv.DictWriter(out, SUMMARY_FIELDS)
+		writer.writeheader()
+	for record in records:
+		if fmt == "csv":
+			for row in summaryRows(record):
+				writer.writerow(row)
+		else:
+			record.pop("traceback", None)
+			out.write(json.dumps(record) + "\n")
+		out.flush()
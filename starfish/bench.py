@@ -0,0 +1,192 @@
+# Benchmarks: a fixed set of representative samples, run through each stage of the engine and timed, so that changes
+# to Starfish's speed can be measured (and slowdowns caught) from one commit to the next.
+#
+# Every case runs in a fresh process, so one case's in-memory caches and memory use don't leak into the next. Within
+# that process the case is run `repeat` times: the first run also pays for per-process setup (loading the EAF
+# library, reading cached tables), and before each of the rest the in-memory caches are emptied so the stages are
+# actually re-computed. The disk cache is left alone unless you ask for a fresh one.
+#
+# Cases are run at the engine's tier (see engine.TIERS), or at each of several to see what a faster tier saves:
+# cases at anything but "standard" have the tier on the end of their id.
+#
+# Results are a JSON file; `compare` lines two of them up case by case and stage by stage.
+
+from __future__ import print_function
+
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import itertools
+import subprocess
+import multiprocessing
+
+try:
+	import resource
+except ImportError: # Not on Windows
+	resource = None
+try:
+	import tracemalloc
+except ImportError: # Python 2
+	tracemalloc = None
+
+STAGES = ["material", "flux", "irradiate", "decay", "dose"]
+
+SAMPLES = [
+	{"name": "gold foil", "composition": {"Au": 1.0}, "mass": 0.05},
+	{"name": "natural W", "composition": {"W": 1.0}, "mass": 1.0},
+	{"name": "natural Ta", "composition": {"Ta": 1.0}, "mass": 1.0}, # Goes through the Ta-180m fix-up in constructMaterial
+	{"name": "basalt", "composition": {"O": 0.446, "Si": 0.234, "Al": 0.082, "Fe": 0.084, "Ca": 0.072, "Mg": 0.041, "Na": 0.021,
+		"K": 0.008, "Ti": 0.011, "P": 0.001}, "mass": 0.5},
+	{"name": "polyethylene", "composition": {"C": 0.857, "H": 0.143}, "mass": 1.0},
+]
+PROFILES = ["RabbitFlux.csv", "LazySusanFlux.csv"]
+POWERS = [25.0, 250.0]
+TIMES = ["10m", "2h", "1d"]
+DELAYS = ["1h", "1d", "1w"]
+
+def cases(match=None, tiers=None):
+	# Every combination of sample, profile, power, time and tier (default: just engine.TIER), optionally only those whose id contains `match`
+	from starfish import engine
+	out = []
+	for sample, profile, power, irradiation, tier in itertools.product(SAMPLES, PROFILES, POWERS, TIMES, tiers or [engine.TIER]):
+		case = dict(sample, profile=profile, power=power, time=irradiation, delays=DELAYS, tier=tier)
+		case["id"] = "%s / %s / %g kW / %s" % (sample["name"], profile, power, irradiation) + ("" if tier == "standard" else " / " + tier)
+		if not match or match in case["id"]:
+			out.append(case)
+	return out
+
+def resetCaches():
+	# Forget everything worked out in this process, but keep what a fresh process would load from the disk cache
+	from starfish import engine, responses, decay, fluxstore, dosetable, nucdata, sparse
+	responses._library = None
+	decay._engines.clear()
+	fluxstore._store = None
+	dosetable._table = None
+	nucdata._snapshot = None
+	engine._transmuters.pop("sparse", None) # The chain Transmuter stays: building it is the per-process setup only the first run pays for
+	sparse._library = None # The sparse solver's cross sections, read back from the disk cache
+
+def runOnce(case):
+	from starfish import engine
+	from starfish.fluxstore import getFluxStore
+	engine.TIER = case["tier"]
+	times = {}
+	def timed(stage, compute):
+		start = time.time()
+		value = compute()
+		times[stage] = time.time() - start
+		return value
+	material = timed("material", lambda: engine.constructMaterial(case["composition"], case["mass"]))
+	flux = timed("flux", lambda: getFluxStore().get(case["profile"]))
+	product = timed("irradiate", lambda: engine.irradiate(material, flux, case["power"], engine.parseTime(case["time"])))
+	after = timed("decay", lambda: engine.decayMany(product, [engine.parseTime(delay) for delay in case["delays"]]))
+	results = timed("dose", lambda: [engine.computeResults(product, decayed) for decayed in after])
+	counts = {"nuclides": len(results[0]["products"]), "gammas": len(results[0]["gammas"]), "betas": len(results[0]["betas"])}
+	return times, counts
+
+def runCase(args):
+	# Runs in its own process (see run)
+	case, repeat = args
+	if tracemalloc:
+		tracemalloc.start()
+	runs = []
+	for i in range(repeat):
+		if i:
+			resetCaches()
+		times, counts = runOnce(case)
+		runs.append(times)
+	record = {"id": case["id"], "tier": case["tier"], "counts": counts,
+		"first": runs[0], # Includes per-process setup
+		"best": dict((stage, min(times[stage] for times in runs[1:] or runs)) for stage in STAGES)}
+	record["first"]["total"] = sum(runs[0][stage] for stage in STAGES)
+	record["best"]["total"] = sum(record["best"][stage] for stage in STAGES)
+	if resource:
+		record["peakRSS"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # kB on Linux
+	if tracemalloc:
+		record["peakTraced"] = tracemalloc.get_traced_memory()[1] # Bytes allocated from Python (numpy included, PyNE's C++ not)
+	return record
+
+def environment():
+	import numpy
+	import pyne
+	from starfish import engine
+	info = {"python": platform.python_version(), "machine": platform.machine(), "platform": platform.platform(),
+		"numpy": numpy.__version__, "pyne": str(getattr(pyne, "__version__", "")), "nuclearData": engine.nuclearDataStamp(),
+		"started": time.strftime("%Y-%m-%dT%H:%M:%S")}
+	try:
+		info["commit"] = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=engine.DATA_DIR, stderr=subprocess.STDOUT).decode().strip()
+		info["dirty"] = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], cwd=engine.DATA_DIR).strip())
+	except Exception: # Not a git checkout (the Nix store copy isn't)
+		info["commit"] = None
+	return info
+
+def run(match=None, repeat=3, freshCache=False, progress=None, tiers=None):
+	# Run the benchmarks, returning {"environment": ..., "cases": [one record per case]}
+	from starfish import engine
+	progress = progress or (lambda message: None)
+	if freshCache: # Everything from scratch, including the dose table and collapsed profiles
+		engine.CACHE_DIR = tempfile.mkdtemp(prefix="starfish-bench-")
+	info = environment()
+	info["repeat"] = repeat
+	info["cache"] = engine.CACHE_DIR
+	records = []
+	pool = multiprocessing.Pool(1, maxtasksperchild=1) # A new process for every case
+	try:
+		for case in cases(match, tiers):
+			progress("%s..." % case["id"])
+			record = pool.apply(runCase, ((case, repeat),))
+			records.append(record)
+			progress("    %.3f s (first run %.3f s)" % (record["best"]["total"], record["first"]["total"]))
+	finally:
+		pool.terminate()
+		if freshCache:
+			shutil.rmtree(engine.CACHE_DIR, ignore_errors=True)
+	return {"environment": info, "cases": records}
+
+def tierSpeedups(results, which="best"):
+	# (case id, tier, standard seconds, tier seconds, speedup) for each case run at another tier as well as at "standard"
+	standard = dict((record["id"], record) for record in results["cases"] if record.get("tier", "standard") == "standard")
+	rows = []
+	for record in results["cases"]:
+		tier = record.get("tier", "standard")
+		base = record["id"][:-len(" / " + tier)]
+		if tier != "standard" and base in standard:
+			before, after = standard[base][which]["total"], record[which]["total"]
+			rows.append((base, tier, before, after, before / after if after else float("inf")))
+	return rows
+
+def compare(baseline, current, threshold=0.1, which="best"):
+	# Line up two sets of results. Returns (rows, regressions): rows are (case id, stage, old seconds, new seconds, ratio),
+	# and regressions are the rows that got more than `threshold` (a fraction) slower.
+	old = dict((record["id"], record) for record in baseline["cases"])
+	rows = []
+	for record in current["cases"]:
+		if record["id"] not in old:
+			continue
+		for stage in STAGES + ["total"]:
+			before, after = old[record["id"]][which][stage], record[which][stage]
+			rows.append((record["id"], stage, before, after, after / before if before else float("inf")))
+	regressions = [row for row in rows if row[4] > 1 + threshold and row[3] - row[2] > 0.01] # Ignore jitter on stages that take no time at all
+	return rows, regressions
+
+def benchCommand(args):
+	results = run(args.match, args.repeat, args.fresh_cache, lambda message: print(message, file=sys.stderr), args.tiers)
+	for row in tierSpeedups(results):
+		print("%-50s %-10s %9.3f s -> %9.3f s  %5.2fx speedup" % row, file=sys.stderr)
+	out = open(args.output, "w") if args.output else sys.stdout
+	json.dump(results, out, indent=1, sort_keys=True)
+	out.write("\n")
+	if out is not sys.stdout:
+		out.close()
+	return 0
+
+def compareCommand(args):
+	rows, regressions = compare(json.load(open(args.baseline)), json.load(open(args.current)), args.threshold, args.which)
+	for row in rows:
+		if args.all or row[1] == "total" or row in regressions:
+			print("%-50s %-10s %9.3f s %9.3f s  %5.2fx%s" % (row + (" SLOWER" if row in regressions else "",)))
+	print("%d of %d stage timings more than %d%% slower" % (len(regressions), len(rows), args.threshold * 100))
+	return 1 if regressions else 0
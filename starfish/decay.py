@@ -0,0 +1,176 @@
+# Analytic decay of a fixed set of nuclides, evaluated at any number of times in one go.
+#
+# The decay matrix only depends on which nuclides are present, so we build it (and its eigen-decomposition) once and
+# then every time after bombardment is just a few matrix products - N(t) = V exp(w t) V^-1 N(0) - instead of a whole
+# zero-flux run of Transmuter.transmute per delay time.
+
+from collections import OrderedDict
+
+import numpy as np
+from scipy.linalg import expm
+from scipy.optimize import brentq
+
+from starfish import trace
+
+_engines = OrderedDict() # A few recent DecayEngines, keyed by the nuclides they were built for
+_maxEngines = 8
+
+def decayClosure(nuclides):
+	# Everything the given nuclides can decay into, including themselves.
+	# Daughters with an unknown half-life are left out, same as irradiate() does (see the W-186 comment there).
+	from starfish.nucdata import getNuclearData
+	nucdata = getNuclearData()
+	found = set()
+	todo = list(nuclides)
+	while todo:
+		nuc = todo.pop()
+		if nuc in found or np.isnan(nucdata.decayConst(nuc)):
+			continue
+		found.add(nuc)
+		if nucdata.decayConst(nuc) > 0:
+			todo.extend(child for child, branch in nucdata.decayChildren(nuc))
+	return sorted(found)
+
+class DecayEngine(object):
+	def __init__(self, nuclides, matrix=None):
+		# `matrix` is for trying out made-up chains (see verify.py): the decay matrix of exactly these nuclides, in this order
+		if matrix is not None:
+			self.nuclides = list(nuclides)
+			self.index = dict((nuc, i) for i, nuc in enumerate(self.nuclides))
+			A = np.array(matrix, dtype=float)
+			self.lambdas = -np.diag(A)
+		else:
+			self.nuclides = decayClosure(nuclides)
+			self.index = dict((nuc, i) for i, nuc in enumerate(self.nuclides))
+			from starfish.nucdata import getNuclearData # Not at the top, so made-up chains (verify.py) don't need PyNE
+			nucdata = getNuclearData()
+			self.lambdas = nucdata.decayConsts(self.nuclides)
+			A = np.diag(-self.lambdas)
+			for j, parent in enumerate(self.nuclides):
+				if self.lambdas[j] > 0:
+					for child, branch in nucdata.decayChildren(parent):
+						if child in self.index:
+							A[self.index[child], j] += branch * self.lambdas[j]
+		self.matrix = A
+		# Stable nuclides just accumulate whatever decays into them, so only the radioactive block needs diagonalising.
+		# That also keeps the repeated zero eigenvalues of the stable nuclides out of the eigen-decomposition.
+		self.radioactive = np.nonzero(self.lambdas > 0)[0]
+		self.stable = np.nonzero(self.lambdas == 0)[0]
+		ARR = A[np.ix_(self.radioactive, self.radioactive)]
+		self.ASR = A[np.ix_(self.stable, self.radioactive)]
+		diag = np.diag(ARR).copy()
+		for i in range(len(diag)): # Two nuclides in a chain with exactly the same decay constant make the matrix defective; nudge them apart a hair
+			while np.sum(diag[:i] == diag[i]):
+				diag[i] *= 1 + 1e-9
+		np.fill_diagonal(ARR, diag)
+		self.V = None
+		if len(self.radioactive):
+			w, V = np.linalg.eig(ARR)
+			if np.linalg.cond(V) < 1e12: # Otherwise fall back to a matrix exponential per time - slower, but always right
+				self.w = w.real
+				self.V = V.real
+				self.Vinv = np.linalg.inv(self.V)
+		self.gammaConst = None
+
+	def vector(self, atoms):
+		# {nuclide: atoms} -> array in this engine's nuclide order
+		N = np.zeros(len(self.nuclides))
+		for nuc, value in atoms.items():
+			if nuc in self.index:
+				N[self.index[nuc]] = value
+		return N
+
+	def atoms(self, initial, times):
+		# Number of atoms of every nuclide at each of the given times. `initial` is a vector from vector().
+		# Returns an array of shape (len(times), len(nuclides)).
+		times = np.atleast_1d(np.asarray(times, dtype=float))
+		out = np.empty((len(times), len(self.nuclides)))
+		out[:, self.stable] = initial[self.stable]
+		if not len(self.radioactive):
+			return out
+		NR = initial[self.radioactive]
+		if self.V is None:
+			for k, t in enumerate(times):
+				out[k] = expm(self.matrix * t).dot(initial)
+			return out
+		c = self.Vinv.dot(NR)
+		wt = np.outer(times, self.w) # (times, modes)
+		out[:, self.radioactive] = (np.exp(wt) * c).dot(self.V.T)
+		grown = np.expm1(wt) / self.w # Integral of exp(w t) from 0 to t, for the stable nuclides fed by decays
+		out[:, self.stable] += (grown * c).dot(self.V.T).dot(self.ASR.T)
+		return np.maximum(out, 0) # Round-off can leave tiny negatives for nuclides that have decayed away entirely
+
+	def atomsEach(self, initial, times):
+		# Like atoms(), for many starting vectors at once, each decayed for its own time: `initial` has a row per vector
+		# (from vector()) and `times` one entry per row. Returns an array the same shape as `initial`.
+		initial = np.atleast_2d(np.asarray(initial, dtype=float))
+		times = np.asarray(times, dtype=float).reshape(len(initial))
+		out = initial.copy()
+		if not len(self.radioactive):
+			return out
+		if self.V is None:
+			for k, t in enumerate(times):
+				out[k] = expm(self.matrix * t).dot(initial[k])
+			return np.maximum(out, 0)
+		c = initial[:, self.radioactive].dot(self.Vinv.T) # (vectors, modes)
+		wt = np.outer(times, self.w)
+		out[:, self.radioactive] = (np.exp(wt) * c).dot(self.V.T)
+		out[:, self.stable] += (np.expm1(wt) / self.w * c).dot(self.V.T).dot(self.ASR.T)
+		return np.maximum(out, 0)
+
+	def propagator(self, t):
+		# The matrix that takes a vector from vector() to the atoms t seconds later, for decaying many starting vectors at once:
+		# V exp(w t) V^-1 for the radioactive block, and the same integrated through ASR for the stable nuclides they feed
+		if self.V is None:
+			return np.maximum(expm(self.matrix * float(t)), 0)
+		out = np.identity(len(self.nuclides))
+		if not len(self.radioactive):
+			return out
+		wt = self.w * float(t)
+		rr = np.ix_(self.radioactive, self.radioactive)
+		out[rr] = (self.V * np.exp(wt)).dot(self.Vinv)
+		out[np.ix_(self.stable, self.radioactive)] = self.ASR.dot((self.V * (np.expm1(wt) / self.w)).dot(self.Vinv))
+		return np.maximum(out, 0) # Same round-off as atoms()
+
+	def activities(self, initial, times):
+		# Activity in Bq of every nuclide at each time, shape (len(times), len(nuclides))
+		return self.atoms(initial, times) * self.lambdas
+
+	def doseConstants(self):
+		# mR/h per Bq for gammas and betas, per nuclide, at the standard 30 cm
+		if self.gammaConst is None:
+			from starfish.dosetable import getDoseTable
+			self.gammaConst, self.betaConst = getDoseTable().constants(self.nuclides)
+		return self.gammaConst, self.betaConst
+
+	def curves(self, initial, times):
+		# Total activity (Bq) and gamma/beta dose (mR/h) at each time
+		act = self.activities(initial, times)
+		gammaConst, betaConst = self.doseConstants()
+		return {"times": np.atleast_1d(times), "activity": act.sum(axis=1), "doseG": act.dot(gammaConst), "doseB": act.dot(betaConst)}
+
+	def timeUntilBelow(self, initial, limit, quantity="dose", longest=100 * 365.25 * 86400):
+		# Seconds after bombardment until `quantity` ("dose" - gamma plus beta, mR/h - or "activity", Bq) stays below `limit`.
+		# 0 if it already is, inf if it's still above after `longest` seconds.
+		def value(times):
+			c = self.curves(initial, times)
+			return c["activity"] if quantity == "activity" else c["doseG"] + c["doseB"]
+		times = np.concatenate([[0], np.logspace(0, np.log10(longest), 400)])
+		above = np.nonzero(value(times) >= limit)[0]
+		if not len(above):
+			return 0.0
+		last = above[-1] # Daughters growing in can make the curve go back up, so we want the last crossing, not the first
+		if last == len(times) - 1:
+			return float("inf")
+		return brentq(lambda t: value([t])[0] - limit, times[last], times[last + 1])
+
+def forNuclides(nuclides):
+	# A DecayEngine for this set of nuclides, reusing a recent one if we've already built it
+	key = frozenset(nuclides)
+	if key not in _engines:
+		if len(_engines) >= _maxEngines:
+			_engines.popitem(last=False)
+		with trace.span("decay.build") as span:
+			_engines[key] = DecayEngine(key)
+			span.set(chainNuclides=len(_engines[key].nuclides))
+	return _engines[key]
@@ -0,0 +1,74 @@
+# Gamma and beta dose per Becquerel (mR/h at 30 cm) for each nuclide, kept on disk so it only gets worked out once.
+#
+# Working these out means going through every gamma and beta line of a nuclide in pyne.data and interpolating the air
+# attenuation for each one, which is most of the time spent on products with hundreds of nuclides. With the table,
+# the dose from a whole product is just its activity vector dotted with the constant vectors.
+# The table remembers which nuclear data and air_gamma.csv it was built from, and starts over if either changes.
+
+import os
+import hashlib
+import numpy as np
+
+from starfish import engine
+from starfish import trace
+
+FORMAT = 1 # Bump this if the dose formulas in engine.py change, so old tables get thrown away
+
+_table = None
+
+def dataVersion():
+	# Something that changes whenever the data the constants are built from does
+	h = hashlib.sha1()
+	h.update(str(FORMAT).encode())
+	h.update(engine.nuclearDataStamp().encode())
+	h.update(open(engine.AIR_GAMMA_PATH, "rb").read())
+	return h.hexdigest()
+
+class DoseTable(object):
+	def __init__(self, path=None):
+		self.path = path or os.path.join(engine.cacheDir(), "dose_constants.npz")
+		self.version = dataVersion()
+		self.nuclides = np.zeros(0, dtype=np.int64) # Kept sorted, so lookups are a searchsorted
+		self.gamma = np.zeros(0)
+		self.beta = np.zeros(0)
+		if os.path.exists(self.path):
+			try:
+				saved = np.load(self.path)
+				if str(saved["version"]) == self.version:
+					self.nuclides, self.gamma, self.beta = saved["nuclides"], saved["gamma"], saved["beta"]
+			except Exception: # A half-written or corrupt table is no worse than no table
+				pass
+
+	def add(self, nuclides):
+		# Work out the constants for any of these nuclides we don't have yet, and save the table if there were any
+		missing = sorted(set(int(n) for n in nuclides) - set(self.nuclides.tolist()))
+		if not missing:
+			return
+		gammaf = engine.loadAirGamma()
+		with trace.span("dose.constants", newNuclides=len(missing)): # The pyne.data lookups
+			gamma = [engine.gammaDosePerBq(engine.gammaLines(nuc), gammaf) * 1000 for nuc in missing] # 1 R/hr = 1000 mR/hr
+			beta = [engine.betaDosePerBq(engine.betaLines(nuc)) * 1000 for nuc in missing]
+		nuclides = np.concatenate([self.nuclides, missing]).astype(np.int64)
+		order = np.argsort(nuclides)
+		self.nuclides = nuclides[order]
+		self.gamma = np.concatenate([self.gamma, gamma])[order]
+		self.beta = np.concatenate([self.beta, beta])[order]
+		self.save()
+
+	def save(self):
+		tmp = "%s.%d.tmp.npz" % (self.path[:-4], os.getpid()) # Batch workers may all be saving at once, so write somewhere private and rename
+		np.savez(tmp, version=self.version, nuclides=self.nuclides, gamma=self.gamma, beta=self.beta)
+		os.rename(tmp, self.path)
+
+	def constants(self, nuclides):
+		# (gamma, beta) arrays of mR/h per Bq, lined up with `nuclides`
+		nuclides = np.asarray(nuclides, dtype=np.int64)
+		self.add(nuclides)
+		idx = np.searchsorted(self.nuclides, nuclides)
+		return self.gamma[idx], self.beta[idx]
+
+def getDoseTable():
+	global _table
+	if _table is None:
+		_table = DoseTable()
+	return _table
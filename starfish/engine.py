@@ -0,0 +1,348 @@
+# The physics that used to live inside IRApplication.constructMaterial and IRApplication.bombardMaterial.
+# Nothing in here knows about Tk, so it can be driven by the GUI, the batch runner, or a script.
+# SciPy, PyNE and parsedatetime take seconds to import, so they're imported by the functions that use them rather than
+# up here - the GUI can put its window up first and load them in the background (see startup.py).
+
+import os
+import csv
+import hashlib
+import datetime
+import numpy as np
+
+from starfish import trace
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # air_gamma.csv and FluxProfiles/ live next to ir.py
+AIR_GAMMA_PATH = os.path.join(DATA_DIR, "air_gamma.csv")
+FLUX_PROFILE_DIR = os.path.join(DATA_DIR, "FluxProfiles")
+SOLVER = os.environ.get("STARFISH_SOLVER") or "chain" # "chain" for PyNE's Transmuter, "sparse" for the burnup-matrix solver in sparse.py
+TIER = os.environ.get("STARFISH_TIER") or "standard" # How much of the transmutation chains to follow; one of TIERS
+CACHE_DIR = os.environ.get("STARFISH_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "starfish") # The Nix store is read-only, so anything we work out and keep goes here
+
+AVOGADRO = 6.022e23
+BQ_PER_MCI = 37000000
+FLUX_SCALE = 1.738e16 / 230 # Scales the flux profiles from flux per source neutron to flux at 1 kW
+CURVE_POINTS = 200 # Times in a sample's decay curve (see runSample)
+
+# Accuracy/speed tiers: "screening" for a quick look at whether a sample is feasible at all, "full" for signing off on it.
+#   tol      - a product that could only ever be this fraction of a target's atoms is kept, but its own chain isn't
+#              followed. Every tier gives one: there's one chain Transmuter per process, and PyNE keeps whatever tol it
+#              was last given, so leaving it out would mean whatever the last tier used (standard is PyNE's own 1e-7)
+#   depth    - and nothing more than this many reactions and decays from a target is followed (sparse solver only - PyNE's
+#              Transmuter has no depth limit, and droppedInventory says when it wasn't applied; None for no limit)
+#   activity - then the least active products are dropped, smallest first, as long as together they're under this
+#              fraction of the activity at end of bombardment (0 to keep them all)
+# Screening's tol still keeps the direct products, which are often a tiny fraction of the atoms (Au-198 from a rabbit shot
+# is about 1e-9 of the gold) but all of the activity; it's their daughters and the long tails of chains that go. Whatever
+# gets left out is reported by droppedInventory.
+TIERS = {
+	"screening": {"tol": 1e-4, "depth": 3, "activity": 1e-4},
+	"standard": {"tol": 1e-7, "depth": None, "activity": 0.0},
+	"full": {"tol": 1e-12, "depth": None, "activity": 0.0},
+}
+
+_groupStructure = None # EAFDataSource is slow to build, so we only ever ask it for the group structure once per process
+_transmuters = {}
+_airGamma = None
+
+def parseTime(text):
+	# Turn "2h", "3 d", "1w 2d" etc. into seconds. Plain numbers are taken to already be seconds.
+	if isinstance(text, (int, float)):
+		return float(text)
+	try:
+		return float(text) # "3600" is seconds too
+	except ValueError:
+		pass
+	import parsedatetime as pdt
+	when, parsed = pdt.Calendar().parseDT(text, sourceTime=datetime.datetime.min)
+	if not parsed: # parsedatetime gives back the start time for anything it can't read, which would be 0 s
+		raise ValueError("Can't read %r as a time - write it like \"2h\" or \"1d 4h\"" % text)
+	return (when - datetime.datetime.min).total_seconds()
+
+def formatTime(seconds):
+	# The other way round from parseTime, e.g. 93784 -> "1d 2h 3m 4s"
+	parts = []
+	seconds = int(round(seconds))
+	for unit, size in (("d", 86400), ("h", 3600), ("m", 60), ("s", 1)):
+		if seconds >= size:
+			parts.append("%d%s" % (seconds // size, unit))
+			seconds %= size
+	return " ".join(parts) or "0s"
+
+def nuclearDataStamp():
+	# Something that changes whenever PyNE's nuclear data does, for keying anything we've saved that was built from it
+	import pyne
+	stamp = str(getattr(pyne, "__version__", ""))
+	nucData = getattr(pyne, "nuc_data", None)
+	if nucData and os.path.exists(nucData):
+		stamp += " %s %s %s" % (nucData, os.path.getsize(nucData), os.path.getmtime(nucData))
+	return stamp
+
+def eafGroupStructure():
+	# The EAF group structure. Building an EAFDataSource just to ask for it is slow, so it's also saved in the cache directory.
+	global _groupStructure
+	if _groupStructure is None:
+		path = os.path.join(cacheDir(), "eaf_groups-%s.npy" % hashlib.sha1(nuclearDataStamp().encode()).hexdigest()[:16])
+		if os.path.exists(path):
+			_groupStructure = np.load(path)
+		else:
+			from pyne.xs.data_source import EAFDataSource
+			with trace.span("eaf.load"):
+				_groupStructure = EAFDataSource()._src_group_struct # Get the EAF group structure
+			np.save(path, _groupStructure)
+	return _groupStructure
+
+def cacheDir():
+	if not os.path.isdir(CACHE_DIR):
+		os.makedirs(CACHE_DIR)
+	return CACHE_DIR
+
+def getTransmuter(solver=None):
+	# Transmuter() loads the whole EAF library, so keep one around instead of building it for every sample.
+	# Both solvers have the same transmute(material, time, flux); which one is used is up to SOLVER.
+	solver = solver or SOLVER
+	if solver not in _transmuters:
+		with trace.span("transmuter.load", solver=solver):
+			if solver == "sparse":
+				from starfish.sparse import SparseTransmuter
+				_transmuters[solver] = SparseTransmuter()
+			elif solver == "chain":
+				from pyne.transmute.chainsolve import Transmuter
+				_transmuters[solver] = Transmuter()
+			else:
+				raise ValueError("Unknown solver %r - use chain or sparse" % solver)
+	return _transmuters[solver]
+
+def tierSettings(tier=None):
+	tier = tier or TIER
+	if tier not in TIERS:
+		raise ValueError("Unknown tier %r - use %s" % (tier, ", ".join(sorted(TIERS))))
+	return TIERS[tier]
+
+def screen(atoms, tier=None):
+	# Drop the tier's least active products from a {nuclide: atoms} product (see TIERS). Stable nuclides are always kept.
+	# Returns (the products kept, the activity in Bq of the ones dropped).
+	fraction = tierSettings(tier)["activity"]
+	if not fraction or not atoms:
+		return atoms, 0.0
+	from starfish.nucdata import getNuclearData
+	nuclides = list(atoms.keys())
+	act = np.array([atoms[nuc] for nuc in nuclides]) * np.nan_to_num(getNuclearData().decayConsts(nuclides))
+	order = np.argsort(act, kind="mergesort")
+	cut = (np.cumsum(act[order]) <= fraction * act.sum()) & (act[order] > 0)
+	dropped = set(nuclides[i] for i in order[cut])
+	return dict((nuc, n) for nuc, n in atoms.items() if nuc not in dropped), float(act[order[cut]].sum())
+
+def droppedInventory(material, product, tier=None):
+	# What the tier left out of a product. Atoms come from the atom balance: transmutation and decay don't change the number
+	# of atoms, so anything missing went into chains that weren't followed, nuclides with unknown half-lives, or the activity
+	# cut. The activity is what the cut took out (see screen; atomsToMaterial keeps it with the product).
+	# Returns {"tier", "atoms", "fraction" (of the sample's atoms), "activity" (Bq at end of bombardment),
+	# "activityFraction" (of the total before the cut), "depth" (the depth limit that was applied, None if there wasn't one)
+	# and "depthSkipped" (the tier has a depth limit, but the chain solver can't apply it)}.
+	from starfish.nucdata import getNuclearData
+	before = sum(productAtoms(material).values())
+	atoms = productAtoms(product)
+	lost = max(0.0, before - sum(atoms.values()))
+	metadata = getattr(product, "metadata", None) or {}
+	activity = float(metadata["droppedActivity"]) if "droppedActivity" in metadata else 0.0
+	total = activity + float(np.dot(list(atoms.values()), np.nan_to_num(getNuclearData().decayConsts(list(atoms.keys()))))) if atoms else activity
+	depth = tierSettings(tier)["depth"]
+	applied = depth if SOLVER == "sparse" else None
+	return {"tier": tier or TIER, "atoms": lost, "fraction": lost / before if before else 0.0,
+		"activity": activity, "activityFraction": activity / total if total else 0.0, "depth": applied, "depthSkipped": depth is not None and applied is None}
+
+def loadAirGamma():
+	global _airGamma
+	if _airGamma is None:
+		from scipy.interpolate import interp1d
+		reader = csv.reader(open(AIR_GAMMA_PATH)) # This file is from NIST: http://physics.nist.gov/PhysRefData/XrayMassCoef/ComTab/air.html
+		air_gamma = np.transpose([[float(x) for x in row] for row in reader])
+		_airGamma = interp1d(air_gamma[0], air_gamma[1]) # Interpolate mu/rho data from NIST. This could be upgraded to a cubic interpolation for a slight improvement in accuracy.
+	return _airGamma
+
+def resolveFluxProfile(path):
+	# Manifests may just say "RabbitFlux.csv"; look for that in FluxProfiles/ if it isn't a real path
+	if not os.path.exists(path) and os.path.exists(os.path.join(FLUX_PROFILE_DIR, path)):
+		return os.path.join(FLUX_PROFILE_DIR, path)
+	return path
+
+def loadFluxProfile(path):
+	# Read a flux profile CSV and collapse it onto the EAF group structure, as flux at 1 kW
+	reader = csv.reader(open(resolveFluxProfile(path)))
+	iFlux = [(float(r[0]), float(r[1])) for r in reader]
+	tFlux = np.transpose(iFlux)
+	from pyne.bins import pointwise_collapse
+	groups = eafGroupStructure()
+	with trace.span("flux.collapse", points=len(iFlux)):
+		return pointwise_collapse(groups, np.flipud(tFlux[0]), np.flipud(tFlux[1] * FLUX_SCALE)) # Interpolate to fit EAF group structure
+
+def constructMaterial(isotopes, mass, ratioType='Mass Ratio'):
+	# Take a {element/isotope: ratio} dict and combine it into a PyNE material
+	from pyne.material import Material
+	if ratioType == 'Mass Ratio':
+		material = Material(isotopes, mass=float(mass))
+	else:
+		material = Material(mass=float(mass))
+		material.from_atom_frac(isotopes) # Automatically switches from atom ratios to mass ratios
+	# Manually replace "Natural Tantalum" with correct natural distribution of isotopes. PyNE incorrectly lists natural Tantalum as 0.012% Ta-180 and 99.988% Ta-181, when in actuality it is 0.012% Ta-180M and 99.988% Ta-181.
+	if 730000000 in material:
+		material[731800001] = material[730000000] * 0.00011943600030691943
+		material[731810000] = material[730000000] * 0.999880563999693
+		del material[730000000]
+	return material.expand_elements() # Replaces elements with the natural distribution of isotopes; this will fail if you ask for "Natural Plutonium" or similar. Don't try to irradiate natural Plutonium. It doesn't exist.
+
+def irradiate(material, flux, power, time):
+	# Irradiate the material for `time` seconds at `power` kW. Returns the end-of-bombardment product.
+	# This goes through the response library (see responses.py), so only isotopes it hasn't seen under these conditions cost a transmutation.
+	# How much of the chains are followed is up to TIER.
+	from starfish.responses import getResponseLibrary
+	return getResponseLibrary().irradiate(material, flux, power, time)
+
+def productAtoms(product):
+	# {nuclide: number of atoms} for a PyNE material
+	from starfish.nucdata import getNuclearData
+	masses = product.mult_by_mass()
+	isos = list(masses.keys())
+	atoms = np.array([masses[iso] for iso in isos]) * AVOGADRO / getNuclearData().atomicMasses(isos)
+	return dict(zip(isos, atoms.tolist()))
+
+def atomsToMaterial(nuclides, atoms, droppedActivity=None):
+	# `droppedActivity` (Bq) is what screen left out, kept in the material's metadata for droppedInventory
+	from pyne.material import Material
+	from starfish.nucdata import getNuclearData
+	grams = np.asarray(atoms, dtype=float) * getNuclearData().atomicMasses(nuclides) / AVOGADRO
+	metadata = {"droppedActivity": droppedActivity} if droppedActivity else None
+	return Material(dict((iso, m) for iso, m in zip(nuclides, grams.tolist()) if m > 0), metadata=metadata) # With no mass given, PyNE takes the mass to be the sum of the composition
+
+def decayMany(product, times):
+	# The product after decaying for each of the given times (seconds), as a list of PyNE materials.
+	# This used to be a zero-flux Transmuter.transmute per time (PyNE's decay() function is broken); now the decay matrix is solved once for all of them.
+	from starfish.decay import forNuclides
+	with trace.span("decay", delays=len(times)):
+		atoms = productAtoms(product)
+		decayer = forNuclides(atoms.keys())
+		decayed = decayer.atoms(decayer.vector(atoms), times)
+		return [atomsToMaterial(decayer.nuclides, row) for row in decayed]
+
+def decay(product, time):
+	return decayMany(product, [time])[0]
+
+def gammaLines(iso):
+	# (energy keV, branching ratio) for every gamma with a known energy and branching ratio
+	from starfish.nucdata import getNuclearData
+	return getNuclearData().gammaLines(iso)
+
+def betaLines(iso):
+	# (average energy keV, branching ratio) for every beta with a known branching ratio
+	from starfish.nucdata import getNuclearData
+	return getNuclearData().betaLines(iso)
+
+def pyneGammaLines(iso):
+	# gammaLines, straight from pyne.data rather than the snapshot in nucdata.py
+	from pyne.data import gamma_energy, gamma_photon_intensity
+	energies = gamma_energy(iso)
+	intensities = gamma_photon_intensity(iso)
+	return [(energies[idx][0], intensities[idx][0]) for idx in range(len(intensities)) if not (np.isnan(energies[idx][0]) or np.isnan(intensities[idx][0]))]
+
+def pyneBetaLines(iso):
+	from pyne.data import beta_average_energy, beta_intensity
+	energies = beta_average_energy(iso)
+	intensities = beta_intensity(iso)
+	return [(energies[idx], intensities[idx]) for idx in range(len(intensities)) if not np.isnan(intensities[idx])]
+
+def gammaDosePerBq(lines, gammaf):
+	# R/hr per Becquerel at 30 cm, summed over the given (energy keV, branching ratio) lines
+	if not lines:
+		return 0.0
+	energy, intensity = np.transpose(lines)
+	mev = energy / 1000 # Default energy is specified in keV. Convert.
+	return np.sum(intensity * 5.263e-6 * mev * gammaf(mev)) / 90000 # Interpolated mu/rho for each energy of gammas in air
+
+def betaDosePerBq(lines):
+	# Approximate formula for beta dose per Becquerel from the Handbook of Health Physics and Radiological Health - yes, this does not depend on beta energy. An improvement that could be made here is to find a better formula, or a data table like the one we use for gammas, and take into account the beta energy.
+	return sum(8e-12 * 100 * intensity / (0.3 * 0.3) for energy, intensity in lines)
+
+def computeResults(product, productAfter=None):
+	# Work out activity (Bq) and dose (mR/h) for every radioactive isotope in the product, at end of bombardment and after decay.
+	# Returns {"total": row, "products": [row, ...], "gammas": [...], "betas": [...]}, with products sorted by activity at end of bombardment.
+	# Every known line is kept; it's up to whoever displays them to apply a threshold.
+	with trace.span("dose") as span:
+		results = _computeResults(product, productAfter)
+		span.set(nuclides=len(results["products"]), gammaLines=len(results["gammas"]), betaLines=len(results["betas"]))
+	return results
+
+def _computeResults(product, productAfter):
+	from starfish.dosetable import getDoseTable
+	from starfish.nucdata import getNuclearData
+	from pyne import nucname
+	nucdata = getNuclearData()
+	masses = product.mult_by_mass()
+	massAfter = productAfter.mult_by_mass() if productAfter is not None else {}
+	isos = np.array(list(masses.keys()), dtype=np.int64)
+	lambdas = nucdata.decayConsts(isos)
+	keep = lambdas > 0.0 # If they're stable, don't show them.
+	isos, lambdas = isos[keep], lambdas[keep]
+	perGram = lambdas * AVOGADRO / nucdata.atomicMasses(isos) # Convert from mass to number, then to activity.
+	act = np.array([masses[iso] for iso in isos]) * perGram
+	actAB = np.array([massAfter.get(iso, 0.0) for iso in isos]) * perGram # If there's none left after allowing it to decay, leave it at 0.
+	gammaConst, betaConst = getDoseTable().constants(isos)
+	columns = {"activity": act, "activityAfter": actAB, "doseG": act * gammaConst, "doseB": act * betaConst, "doseGAfter": actAB * gammaConst, "doseBAfter": actAB * betaConst}
+	total = dict((key, float(np.sum(values))) for key, values in columns.items())
+	total["name"] = "TOTAL"
+	rows = []
+	gammas = []
+	betas = []
+	for i in np.argsort(-act, kind="mergesort"): # Sort isotopes by the activity in the initial product.
+		iso = int(isos[i])
+		name = nucname.name(iso)
+		row = dict((key, float(values[i])) for key, values in columns.items())
+		row.update(name=name, nuclide=iso)
+		rows.append(row)
+		gammas.extend({"name": name, "energy": energy, "intensity": intensity} for energy, intensity in nucdata.gammaLines(iso))
+		betas.extend({"name": name, "energy": energy, "intensity": intensity} for energy, intensity in nucdata.betaLines(iso))
+	return {"total": total, "products": rows, "gammas": gammas, "betas": betas}
+
+def irradiateSample(sample, flux=None):
+	# The end-of-bombardment product of a sample (in the form runSample takes), as a PyNE material
+	material = constructMaterial(sample["composition"], sample["mass"], sample.get("ratioType", 'Mass Ratio'))
+	if flux is None:
+		from starfish.fluxstore import getFluxStore
+		flux = getFluxStore().get(sample["profile"])
+	if sample.get("schedule"):
+		from starfish import schedule
+		return schedule.irradiate(material, flux, schedule.parseSchedule(sample["schedule"]))
+	return irradiate(material, flux, sample["power"], parseTime(sample["time"]))
+
+def runSample(sample, flux=None):
+	# Run a single sample from start to finish. `sample` is a dict with keys
+	# composition ({element/isotope: ratio}), mass (g), profile (path), power (kW), time, and optionally ratioType, delays (a list of times)
+	# and doseLimit (mR/h at 30 cm; reports how long after bombardment until the dose is below it), and curve (a time; reports
+	# total activity and dose at CURVE_POINTS times from 1 s after bombardment to then), and spectrum (a list of times after
+	# bombardment; reports the binned gamma spectrum at each, see spectrum.py).
+	# Instead of power and time, a sample can have a schedule (see schedule.py); delays are then from the end of the schedule.
+	# Pass `flux` if you've already loaded the sample's flux profile.
+	product = irradiateSample(sample, flux)
+	results = computeResults(product)
+	results["dropped"] = droppedInventory(constructMaterial(sample["composition"], sample["mass"], sample.get("ratioType", 'Mass Ratio')), product)
+	results["delays"] = []
+	delays = sample.get("delays") or []
+	for delay, after in zip(delays, decayMany(product, [parseTime(delay) for delay in delays])):
+		after = computeResults(product, after)
+		results["delays"].append({"delay": delay, "seconds": parseTime(delay), "total": after["total"], "products": after["products"]})
+	if sample.get("doseLimit"): # How long until it's safe to handle
+		from starfish.decay import forNuclides
+		atoms = productAtoms(product)
+		decayer = forNuclides(atoms.keys())
+		results["timeBelowLimit"] = decayer.timeUntilBelow(decayer.vector(atoms), float(sample["doseLimit"]))
+	if sample.get("curve"): # Decay curve, for plotting
+		from starfish.decay import forNuclides
+		atoms = productAtoms(product)
+		decayer = forNuclides(atoms.keys())
+		curve = decayer.curves(decayer.vector(atoms), np.logspace(0, np.log10(max(parseTime(sample["curve"]), 1.0)), CURVE_POINTS))
+		results["curve"] = dict((key, values.tolist()) for key, values in curve.items())
+	if sample.get("spectrum"):
+		from starfish import spectrum
+		times = [parseTime(t) for t in sample["spectrum"]]
+		edges = spectrum.binEdges()
+		results["spectrum"] = {"edges": edges.tolist(), "times": times, "rates": spectrum.productSpectrum(product, times, edges).tolist()}
+	return results
@@ -0,0 +1,208 @@
+# Exporting complete results - every product nuclide, every gamma and beta line however small, decay curves and spectra
+# - as tables, either as CSV files or in one compact columnar file.
+#
+# The tables (and their columns, in order) are in SCHEMAS. Every row says which sample it belongs to, so the results
+# of a whole batch go into the same tables. Rows are written as each sample finishes, and never all held in memory.
+#
+# CSV: one file per table, <prefix>-products.csv, <prefix>-gammas.csv and so on.
+#
+# Columnar (.sfc): the tables are written a row group at a time (up to ROW_GROUP rows of one table), each column of a
+# row group stored contiguously, so a reader can load just the columns it wants, straight into arrays. The layout is
+#     MAGIC
+#     row groups, each: header length (uint32) | header (JSON: {"table", "rows", "columns": [[name, bytes], ...]}) | columns
+#     footer (JSON: {"format", "tables": {table: [[column, type], ...]}, "rowGroups": [[table, offset, rows], ...]})
+#     footer length (uint64) | MAGIC
+# with all numbers little-endian. Numeric columns are plain arrays of their type ("i8" or "f8"); "str" columns are
+# rows + 1 int64 offsets followed by the UTF-8 text, string i being text[offsets[i]:offsets[i + 1]].
+# read() loads a table back as a dict of NumPy arrays (pandas.DataFrame(read(path, "products")) for a data frame).
+#
+#     starfish-cli batch samples.csv -f columnar -o results.sfc
+#     starfish-cli dump results.sfc products
+
+from __future__ import print_function
+
+import csv
+import json
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+FORMAT = 1
+MAGIC = b"SFCOLS01"
+ROW_GROUP = 65536
+
+SCHEMAS = OrderedDict([
+	("samples", [("sample", "i8"), ("name", "str"), ("status", "str"), ("error", "str"), ("tier", "str"), ("droppedAtoms", "f8"), ("droppedFraction", "f8"),
+		("droppedActivity", "f8"), ("droppedActivityFraction", "f8"), ("depth", "f8")]),
+	("totals", [("sample", "i8"), ("name", "str"), ("delay", "str"), ("seconds", "f8"), ("activity", "f8"), ("doseG", "f8"), ("doseB", "f8")]),
+	("products", [("sample", "i8"), ("name", "str"), ("delay", "str"), ("seconds", "f8"), ("nuclide", "i8"), ("isotope", "str"),
+		("activity", "f8"), ("doseG", "f8"), ("doseB", "f8")]),
+	("gammas", [("sample", "i8"), ("name", "str"), ("isotope", "str"), ("energy", "f8"), ("intensity", "f8")]),
+	("betas", [("sample", "i8"), ("name", "str"), ("isotope", "str"), ("energy", "f8"), ("intensity", "f8")]),
+	("curves", [("sample", "i8"), ("name", "str"), ("seconds", "f8"), ("activity", "f8"), ("doseG", "f8"), ("doseB", "f8")]),
+	("spectra", [("sample", "i8"), ("name", "str"), ("seconds", "f8"), ("low", "f8"), ("high", "f8"), ("rate", "f8")]),
+])
+
+def encode(value):
+	value = u"" if value is None else value
+	return value if isinstance(value, bytes) else u"{0}".format(value).encode("utf-8")
+
+def spectrumRows(index, name, spectrum):
+	# "spectra" rows from {"edges", "times", "rates"} (see spectrum.py): photons/s in each bin at each time
+	edges, rates = np.asarray(spectrum["edges"], dtype=float), np.asarray(spectrum["rates"], dtype=float)
+	return [(index, name, t, low, high, rate) for t, row in zip(spectrum["times"], rates.tolist()) for low, high, rate in zip(edges[:-1].tolist(), edges[1:].tolist(), row)]
+
+def recordTables(record):
+	# {table: [row, ...]} for one result record, in the form batch.runOne makes them (gammas, betas, curve and spectrum are optional)
+	index, name = record["index"], record.get("name")
+	dropped = record.get("dropped") or {}
+	tables = {"samples": [(index, name, record["status"], record.get("error", ""), dropped.get("tier", ""), dropped.get("atoms", np.nan), dropped.get("fraction", np.nan),
+		dropped.get("activity", np.nan), dropped.get("activityFraction", np.nan), np.nan if dropped.get("depth") is None else dropped["depth"])]}
+	if record["status"] != "ok":
+		return tables
+	tables["totals"], tables["products"] = [], []
+	for delay in [{"delay": "", "seconds": 0.0, "total": record["total"], "products": record["products"]}] + record.get("delays", []):
+		key = "After" if delay["delay"] else ""
+		total = delay["total"]
+		tables["totals"].append((index, name, delay["delay"], delay["seconds"], total["activity" + key], total["doseG" + key], total["doseB" + key]))
+		tables["products"].extend((index, name, delay["delay"], delay["seconds"], row["nuclide"], row["name"], row["activity" + key], row["doseG" + key], row["doseB" + key])
+			for row in delay["products"])
+	for kind in ("gammas", "betas"):
+		tables[kind] = [(index, name, line["name"], line["energy"], line["intensity"]) for line in record.get(kind) or []]
+	curve = record.get("curve")
+	if curve:
+		tables["curves"] = [(index, name) + row for row in zip(curve["times"], curve["activity"], curve["doseG"], curve["doseB"])]
+	if record.get("spectrum"):
+		tables["spectra"] = spectrumRows(index, name, record["spectrum"])
+	return tables
+
+class CsvTables(object):
+	# One CSV per table, <prefix>-<table>.csv, each opened the first time a row is written to it
+	def __init__(self, prefix):
+		self.prefix = prefix
+		self.files = {}
+
+	def write(self, table, rows):
+		if not rows:
+			return
+		if table not in self.files:
+			out = open("%s-%s.csv" % (self.prefix, table), "w")
+			writer = csv.writer(out)
+			writer.writerow([column for column, kind in SCHEMAS[table]])
+			self.files[table] = (out, writer)
+		out, writer = self.files[table]
+		writer.writerows(rows)
+		out.flush()
+
+	def close(self):
+		for out, writer in self.files.values():
+			out.close()
+
+class ColumnarWriter(object):
+	def __init__(self, path, rowGroup=ROW_GROUP):
+		self.out = open(path, "wb")
+		self.out.write(MAGIC)
+		self.rowGroup = rowGroup
+		self.pending = dict((table, []) for table in SCHEMAS)
+		self.rowGroups = []
+
+	def write(self, table, rows):
+		self.pending[table].extend(rows)
+		if len(self.pending[table]) >= self.rowGroup:
+			self.flush(table)
+
+	def flush(self, table):
+		rows, self.pending[table] = self.pending[table], []
+		if not rows:
+			return
+		chunks = []
+		for values, (column, kind) in zip(zip(*rows), SCHEMAS[table]):
+			if kind == "str":
+				text = [encode(value) for value in values]
+				offsets = np.concatenate([[0], np.cumsum([len(t) for t in text])]).astype("<i8")
+				chunks.append((column, offsets.tobytes() + b"".join(text)))
+			else:
+				chunks.append((column, np.asarray(values, dtype="<" + kind).tobytes()))
+		header = json.dumps({"table": table, "rows": len(rows), "columns": [[column, len(data)] for column, data in chunks]}).encode("utf-8")
+		self.rowGroups.append([table, self.out.tell(), len(rows)])
+		self.out.write(struct.pack("<I", len(header)) + header)
+		for column, data in chunks:
+			self.out.write(data)
+
+	def close(self):
+		for table in SCHEMAS:
+			self.flush(table)
+		footer = json.dumps({"format": FORMAT, "tables": SCHEMAS, "rowGroups": self.rowGroups}).encode("utf-8")
+		self.out.write(footer + struct.pack("<Q", len(footer)) + MAGIC)
+		self.out.close()
+
+def openWriter(path):
+	# A ColumnarWriter for .sfc paths, otherwise CSV files with `path` as the prefix
+	return ColumnarWriter(path) if path.endswith(".sfc") else CsvTables(path)
+
+def writeRecords(records, writer):
+	# Stream result records into a writer, passing each record on as it goes (so this can sit in the middle of a pipeline)
+	for record in records:
+		for table, rows in recordTables(record).items():
+			writer.write(table, rows)
+		yield record
+
+def footer(f):
+	f.seek(-(8 + len(MAGIC)), 2)
+	length, magic = struct.unpack("<Q", f.read(8))[0], f.read(len(MAGIC))
+	if magic != MAGIC:
+		raise ValueError("Not a Starfish columnar file (or it was never finished)")
+	f.seek(-(8 + len(MAGIC) + length), 2)
+	return json.loads(f.read(length).decode("utf-8"))
+
+def rowGroups(path, table, columns=None):
+	# Generator of {column: array} for each row group of `table`, with just the given columns (default: all of them)
+	f = open(path, "rb")
+	try:
+		about = footer(f)
+		kinds = dict((column, kind) for column, kind in about["tables"][table])
+		for name, offset, rows in about["rowGroups"]:
+			if name != table:
+				continue
+			f.seek(offset)
+			header = json.loads(f.read(struct.unpack("<I", f.read(4))[0]).decode("utf-8"))
+			group = OrderedDict()
+			for column, size in header["columns"]:
+				if columns is not None and column not in columns:
+					f.seek(size, 1)
+					continue
+				data = f.read(size)
+				if kinds[column] == "str":
+					offsets = np.frombuffer(data[:8 * (rows + 1)], dtype="<i8")
+					text = data[8 * (rows + 1):]
+					group[column] = np.array([text[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(rows)], dtype=object)
+				else:
+					group[column] = np.frombuffer(data, dtype="<" + kinds[column])
+			yield group
+	finally:
+		f.close()
+
+def read(path, table, columns=None):
+	# A whole table as {column: array}
+	f = open(path, "rb")
+	try:
+		schema = footer(f)["tables"][table]
+	finally:
+		f.close()
+	names = [column for column, kind in schema if columns is None or column in columns]
+	groups = list(rowGroups(path, table, columns))
+	empty = dict((column, np.zeros(0, dtype=object if kind == "str" else "<" + kind)) for column, kind in schema)
+	return OrderedDict((column, np.concatenate([group[column] for group in groups]) if groups else empty[column]) for column in names)
+
+def dumpCommand(args):
+	# Print a table from a columnar file as CSV
+	import sys
+	writer = csv.writer(sys.stdout)
+	header = False
+	for group in rowGroups(args.path, args.table, args.columns):
+		if not header:
+			writer.writerow(list(group.keys()))
+			header = True
+		writer.writerows(zip(*group.values()))
+	return 0
@@ -0,0 +1,53 @@
+# Collapsed flux profiles, saved in the cache directory so each profile only ever gets collapsed once.
+#
+# Each profile is stored as a plain .npy of its EAF-group flux at 1 kW, named after a hash of the CSV it came from
+# (plus the group structure and scaling it was collapsed with), and memory-mapped back in. Editing a profile CSV
+# just means it gets a new hash and is collapsed again.
+
+import os
+import glob
+import hashlib
+import numpy as np
+
+from starfish import engine
+from starfish import trace
+
+_store = None
+
+class FluxStore(object):
+	def __init__(self, directory=None):
+		self.directory = directory or os.path.join(engine.cacheDir(), "flux")
+		if not os.path.isdir(self.directory):
+			os.makedirs(self.directory)
+		self.profiles = {} # Content hash -> array, for everything already loaded this session
+
+	def key(self, path):
+		h = hashlib.sha1(open(path, "rb").read())
+		h.update(repr(engine.FLUX_SCALE).encode())
+		h.update(engine.nuclearDataStamp().encode()) # The EAF group structure comes with the nuclear data
+		return h.hexdigest()
+
+	def get(self, path):
+		# The collapsed flux at 1 kW for the profile CSV at `path` (or in FluxProfiles/)
+		path = engine.resolveFluxProfile(path)
+		with trace.span("flux"):
+			key = self.key(path)
+			if key not in self.profiles:
+				saved = os.path.join(self.directory, key + ".npy")
+				if not os.path.exists(saved):
+					tmp = "%s.%d.tmp.npy" % (saved[:-4], os.getpid()) # Batch workers may be collapsing the same profile at the same time
+					np.save(tmp, engine.loadFluxProfile(path))
+					os.rename(tmp, saved)
+				self.profiles[key] = np.load(saved, mmap_mode="r")
+			return self.profiles[key]
+
+	def preload(self, directory=None):
+		# Load (collapsing if need be) every profile in FluxProfiles/. Returns {file name: flux}.
+		paths = sorted(glob.glob(os.path.join(directory or engine.FLUX_PROFILE_DIR, "*.csv")))
+		return dict((os.path.basename(path), self.get(path)) for path in paths)
+
+def getFluxStore():
+	global _store
+	if _store is None:
+		_store = FluxStore()
+	return _store
@@ -0,0 +1,181 @@
+# The sample inventory: everything that's been irradiated and is sitting on the shelf, in a local SQLite database.
+#
+# Each sample is stored with what went into it (composition, mass, flux profile, power and time or schedule), when it
+# came out of the reactor, and its end-of-bombardment product as atoms of each radioactive nuclide. Questions about the
+# whole shelf - what's the total activity right now, which samples are below the release limit by Friday - are one
+# decay of every stored sample at once (DecayEngine.atomsEach, each sample with its own time since bombardment) and a
+# product with the dose table, however many samples there are; nothing gets irradiated again.
+#
+# The database is ~/.local/share/starfish/inventory.sqlite unless STARFISH_INVENTORY says otherwise. It's kept out of
+# the cache directory on purpose: this is a record, not something that can be worked out again.
+#
+#     starfish-cli inventory add "Au:1" 0.05 RabbitFlux.csv 250 10m --name "Gold foil 3"
+#     starfish-cli inventory list --at "friday 5pm"
+#     starfish-cli inventory below 0.5 --by friday
+
+from __future__ import print_function
+
+import os
+import json
+import time
+import sqlite3
+
+import numpy as np
+
+from starfish import engine
+from starfish import trace
+
+INVENTORY_PATH = os.environ.get("STARFISH_INVENTORY") or os.path.join(os.path.expanduser("~"), ".local", "share", "starfish", "inventory.sqlite")
+
+SCHEMA = """
+create table if not exists samples (
+	id integer primary key,
+	name text,
+	composition text, -- JSON, {"Au": 1}
+	ratioType text,
+	mass real,
+	profile text,
+	power real,
+	time real,
+	schedule text,
+	endOfBombardment real, -- Unix time
+	removed real -- Unix time it left the shelf, or null if it's still there
+);
+create table if not exists products (
+	sample integer references samples(id),
+	nuclide integer,
+	atoms real -- At end of bombardment
+);
+create index if not exists productsBySample on products(sample);
+"""
+
+def parseDate(text):
+	# "friday", "2026-11-02 17:00", "in 3 days", "now" -> Unix time. Plain numbers are taken to already be Unix times.
+	if text is None or isinstance(text, (int, float)):
+		return time.time() if text is None else float(text)
+	import parsedatetime as pdt
+	when, parsed = pdt.Calendar().parse(text)
+	if not parsed:
+		raise ValueError("Can't read %r as a date" % text)
+	return time.mktime(when)
+
+def formatDate(seconds):
+	return time.strftime("%Y-%m-%d %H:%M", time.localtime(seconds))
+
+class Inventory(object):
+	def __init__(self, path=None):
+		self.path = path or INVENTORY_PATH
+		if not os.path.isdir(os.path.dirname(os.path.abspath(self.path))):
+			os.makedirs(os.path.dirname(os.path.abspath(self.path)))
+		self.db = sqlite3.connect(self.path)
+		self.db.row_factory = sqlite3.Row
+		self.db.executescript(SCHEMA)
+
+	def add(self, product, sample, endOfBombardment=None):
+		# Put a sample on the shelf: its end-of-bombardment product (a PyNE material) and the sample dict it came from
+		# (the same keys engine.runSample takes; any that are missing are stored as null). Returns its id.
+		from starfish.nucdata import getNuclearData
+		atoms = engine.productAtoms(product)
+		nuclides = [nuc for nuc, lam in zip(atoms, getNuclearData().decayConsts(list(atoms))) if lam > 0] # Stable nuclides never matter here
+		schedule = sample.get("schedule")
+		with self.db:
+			cursor = self.db.execute("insert into samples (name, composition, ratioType, mass, profile, power, time, schedule, endOfBombardment) values (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+				(sample.get("name"), json.dumps(sample.get("composition")), sample.get("ratioType", 'Mass Ratio'), sample.get("mass"), sample.get("profile"),
+				sample.get("power"), engine.parseTime(sample["time"]) if sample.get("time") else None,
+				json.dumps(schedule) if isinstance(schedule, (list, tuple)) else schedule, parseDate(endOfBombardment)))
+			self.db.executemany("insert into products (sample, nuclide, atoms) values (?, ?, ?)", [(cursor.lastrowid, nuc, atoms[nuc]) for nuc in nuclides])
+		return cursor.lastrowid
+
+	def remove(self, sample, when=None):
+		# Take a sample off the shelf (released, disposed of...). It stays in the database, but isn't counted any more.
+		with self.db:
+			if not self.db.execute("update samples set removed = ? where id = ? and removed is null", (parseDate(when), sample)).rowcount:
+				raise ValueError("No sample %s on the shelf" % sample)
+
+	def samples(self, removed=False):
+		# Every sample on the shelf (or ever, with removed=True), oldest first, as dicts
+		query = "select * from samples%s order by endOfBombardment, id" % ("" if removed else " where removed is null")
+		samples = []
+		for row in self.db.execute(query):
+			sample = dict((key, row[key]) for key in row.keys())
+			sample["composition"] = json.loads(sample["composition"]) if sample["composition"] else None
+			samples.append(sample)
+		return samples
+
+	def contents(self, samples):
+		# (nuclides, array of end-of-bombardment atoms, one row per sample)
+		ids = dict((sample["id"], k) for k, sample in enumerate(samples))
+		products = [(ids[row[0]], row[1], row[2]) for row in self.db.execute("select sample, nuclide, atoms from products") if row[0] in ids]
+		nuclides = sorted(set(nuc for k, nuc, atoms in products))
+		index = dict((nuc, i) for i, nuc in enumerate(nuclides))
+		atoms = np.zeros((len(samples), len(nuclides)))
+		for k, nuc, n in products:
+			atoms[k, index[nuc]] += n
+		return nuclides, atoms
+
+	def status(self, when=None, removed=False):
+		# Activity (Bq) and dose (mR/h at 30 cm) of every sample at `when` (default now), all decayed together.
+		# Returns (samples, with "activity", "doseG", "doseB" and "dose" added to each; totals over all of them).
+		from starfish.decay import forNuclides
+		when = parseDate(when)
+		samples = self.samples(removed)
+		with trace.span("inventory.decay", samples=len(samples)) as span:
+			nuclides, atoms = self.contents(samples)
+			decayer = forNuclides(nuclides)
+			initial = np.zeros((len(samples), len(decayer.nuclides)))
+			initial[:, [decayer.index[nuc] for nuc in nuclides]] = atoms
+			elapsed = np.maximum(0.0, when - np.array([sample["endOfBombardment"] for sample in samples], dtype=float)) # Nothing decays before it's made
+			act = decayer.atomsEach(initial, elapsed).reshape(len(samples), len(decayer.nuclides)) * decayer.lambdas
+			gammaConst, betaConst = decayer.doseConstants()
+			columns = {"activity": act.sum(axis=1), "doseG": act.dot(gammaConst), "doseB": act.dot(betaConst)}
+			columns["dose"] = columns["doseG"] + columns["doseB"]
+			span.set(nuclides=len(decayer.nuclides))
+		for k, sample in enumerate(samples):
+			sample.update((key, float(values[k])) for key, values in columns.items())
+		return samples, dict((key, float(values.sum())) for key, values in columns.items())
+
+	def below(self, limit, when=None, quantity="dose"):
+		# Which samples are below `limit` ("dose", mR/h at 30 cm, or "activity", Bq) at `when`: (samples that are, samples that aren't)
+		samples, total = self.status(when)
+		return [s for s in samples if s[quantity] < limit], [s for s in samples if s[quantity] >= limit]
+
+	def close(self):
+		self.db.close()
+
+def describe(sample):
+	irradiation = sample["schedule"] or "%g kW for %s" % (sample["power"] or 0, engine.formatTime(sample["time"] or 0))
+	return "%s, %g g, %s in %s" % (" ".join("%s:%g" % item for item in sorted((sample["composition"] or {}).items())), sample["mass"] or 0, irradiation, sample["profile"])
+
+def inventoryCommand(args):
+	inventory = Inventory(args.database)
+	if args.action == "add":
+		from starfish import batch
+		sample = {"name": args.name, "composition": batch.parseComposition(args.composition), "ratioType": args.ratio_type, "mass": args.mass, "profile": args.profile}
+		if args.schedule:
+			sample["schedule"] = args.schedule
+		else:
+			sample.update(power=args.power, time=args.time)
+		print("Added sample %d" % inventory.add(engine.irradiateSample(sample), sample, args.eob))
+	elif args.action == "remove":
+		for sample in args.ids:
+			inventory.remove(sample, args.at)
+	elif args.action == "list":
+		samples, total = inventory.status(args.at, args.all)
+		print("At %s:" % formatDate(parseDate(args.at)))
+		print("%5s %-20s %-16s %12s %12s  %s" % ("Id", "Name", "Bombarded", "Activity (Bq)", "Dose (mR/h)", "Sample"))
+		for s in samples:
+			print("%5d %-20s %-16s %12.4g %12.4g  %s%s" % (s["id"], (s["name"] or "")[:20], formatDate(s["endOfBombardment"]), s["activity"], s["dose"], describe(s),
+				" (removed %s)" % formatDate(s["removed"]) if s["removed"] else ""))
+		print("%5s %-20s %-16s %12.4g %12.4g" % ("", "TOTAL", "", total["activity"], total["dose"]))
+	elif args.action == "below":
+		quantity = "activity" if args.activity else "dose"
+		below, above = inventory.below(args.limit, args.by, quantity)
+		unit = "Bq" if args.activity else "mR/h"
+		print("By %s, %d of %d samples are below %g %s" % (formatDate(parseDate(args.by)), len(below), len(below) + len(above), args.limit, unit))
+		for title, samples in (("Below", below), ("Still above", above)):
+			if samples:
+				print("%s:" % title)
+			for s in samples:
+				print("%5d %-20s %12.4g %s  %s" % (s["id"], (s["name"] or "")[:20], s[quantity], unit, describe(s)))
+	inventory.close()
+	return 0
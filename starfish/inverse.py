@@ -0,0 +1,109 @@
+# The inverse question: how long (or how hard) can we irradiate this sample and still be under a dose or activity limit?
+#
+# The sample's burnup matrix is built once per question (see Operator): the nuclides to follow are worked out for the
+# longest time and highest power that will be tried, with reaction rates per kW, so every trial is just that same
+# matrix scaled to its power and exponentiated for its time - one CRAM solve, no transmutations. This goes through the
+# sparse solver whichever solver is picked for everything else, so answers can differ slightly from the Setup tab's
+# with the chain solver (see `starfish-cli crosscheck`).
+# For time, a coarse look at a log grid of times brackets the limit and a root-finder on the logarithm of the time homes
+# in on it, since dose climbs steeply at first and then levels off towards saturation. For power, dose is close to
+# proportional to power, so a root-finder started from that guess only needs a handful of trials.
+
+import numpy as np
+from scipy.optimize import brentq
+
+from starfish import engine
+from starfish.decay import forNuclides
+
+MAX_POWER = 250.0 # kW; the reactor's licensed power
+GRID = 8 # Trial times, evenly spaced in log time, to bracket the longest irradiation before homing in
+
+class Operator(object):
+	# A sample's burnup matrix in one flux profile, for any power up to `power` kW and any time up to `time` seconds
+	def __init__(self, material, flux, power, time):
+		from starfish.nucdata import getNuclearData
+		settings = engine.tierSettings()
+		atoms = engine.productAtoms(material)
+		targets = sorted(atoms)
+		flux = np.asarray(flux, dtype=float)
+		self.network = engine.getTransmuter("sparse").network(targets, float(time), [flux * float(power)], settings["tol"], settings["depth"]) # Every shorter or gentler trial follows less than this
+		self.rates = self.network.rates(flux) # Per kW; reaction rates are proportional to power
+		self.n0 = np.zeros((len(self.network.nuclides), 1))
+		for nuc in targets:
+			self.n0[self.network.index[nuc], 0] = atoms[nuc]
+		self.keep = ~np.isnan(getNuclearData().decayConsts(self.network.nuclides)) # Unknown half-lives are left out, as in responses.py
+		self.nuclides = [nuc for nuc, k in zip(self.network.nuclides, self.keep) if k]
+
+	def atoms(self, power, time):
+		# {nuclide: atoms} at the end of a `time` second irradiation at `power` kW, with the tier's activity cut.
+		# Always the same nuclides (what's cut or not made is 0), so measure() reuses one decay engine throughout.
+		out = self.network.solve(self.rates * float(power), self.n0, float(time))[0, self.keep, 0]
+		product = dict(zip(self.nuclides, out.tolist()))
+		kept = engine.screen(dict((nuc, n) for nuc, n in product.items() if n > 0))[0]
+		return dict((nuc, kept.get(nuc, 0.0)) for nuc in self.nuclides)
+
+def measure(atoms, quantity="dose", delay=0.0, distance=30.0):
+	# Dose (gamma plus beta, mR/h at `distance` cm) or activity (Bq) of {nuclide: atoms}, `delay` seconds after bombardment
+	decayer = forNuclides(atoms.keys())
+	curves = decayer.curves(decayer.vector(atoms), [delay])
+	if quantity == "activity":
+		return curves["activity"][0]
+	return (curves["doseG"][0] + curves["doseB"][0]) * (30.0 / distance) ** 2 # The dose constants are for 30 cm; both fall off with the square of distance
+
+def maxTime(material, flux, power, limit, quantity="dose", delay=0.0, distance=30.0, resolution=60.0, longest=45 * 86400.0):
+	# Longest irradiation (seconds, a multiple of `resolution`, at most `longest`) at `power` kW that keeps `quantity` at or under `limit`.
+	# Returns {"time", "value" (the quantity at that time), "evaluations"}; time is 0 if even `resolution` seconds is too much.
+	values = {}
+	most = int(longest // resolution)
+	if most < 1:
+		return {"time": 0.0, "value": measure(engine.productAtoms(material), quantity, delay, distance), "evaluations": 0}
+	operator = Operator(material, flux, power, most * resolution)
+	def excess(steps):
+		if steps not in values:
+			values[steps] = measure(operator.atoms(power, steps * resolution), quantity, delay, distance)
+		return values[steps] - limit
+	def result(steps):
+		return {"time": steps * resolution, "value": values[steps] if steps else measure(engine.productAtoms(material), quantity, delay, distance), "evaluations": len(values)}
+	grid = sorted(set(int(round(x)) for x in np.logspace(0, np.log10(most), GRID))) # A coarse look first, so a dose that peaks and falls again (burnout) isn't missed
+	over = [steps for steps in grid if excess(steps) > 0]
+	if not over:
+		return result(most)
+	hi = over[0]
+	if hi == 1:
+		return result(0)
+	lo = grid[grid.index(hi) - 1]
+	logSteps = brentq(lambda x: excess(int(round(np.exp(x)))), np.log(lo), np.log(hi), xtol=0.5 / hi, rtol=1e-6) # Near enough to the nearest step
+	steps = min(max(lo, int(round(np.exp(logSteps)))), hi - 1)
+	while steps > lo and excess(steps) > 0: # Make sure we end up just under, not just over
+		steps -= 1
+	while steps + 1 < hi and excess(steps + 1) <= 0:
+		steps += 1
+	return result(steps)
+
+def maxPower(material, flux, time, limit, quantity="dose", delay=0.0, distance=30.0, highest=MAX_POWER, tolerance=1e-3):
+	# Highest power (kW, at most `highest`) for a `time` second irradiation that keeps `quantity` at or under `limit`.
+	# Returns {"power", "value", "evaluations"}; power is 0 if no power is low enough.
+	operator = Operator(material, flux, highest, time)
+	values = {}
+	def excess(power):
+		if power not in values:
+			values[power] = measure(operator.atoms(power, time), quantity, delay, distance)
+		return values[power] - limit
+	def result(power):
+		return {"power": power, "value": values[power] if power else 0.0, "evaluations": len(values)}
+	if excess(highest) <= 0:
+		return result(highest)
+	if limit <= 0:
+		return result(0.0)
+	lo = highest * limit / values[highest] * (1 - tolerance) # Dose is nearly proportional to power, so this is usually very close already (a hair under, so round-off doesn't put it over)
+	hi = highest
+	while excess(lo) > 0: # Too optimistic - back off until we're under
+		hi, lo = lo, lo * 0.5
+		if lo < highest * 1e-6:
+			return result(0.0)
+	if hi > lo * 1.1 and excess(lo * 1.1) > 0: # Usually the answer is within a few percent of the guess, so try a tight bracket first
+		hi = lo * 1.1
+	power = brentq(excess, lo, hi, xtol=tolerance * lo)
+	if excess(power) > 0: # brentq's answer can be a hair over; we want to be a hair under
+		power = lo
+	return result(power)
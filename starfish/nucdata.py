@@ -0,0 +1,162 @@
+# A snapshot of the nuclear data Starfish uses, as plain arrays, so that looking something up is array indexing
+# instead of a trip through pyne.data every time.
+#
+# The snapshot covers every nuclide that can turn up in an irradiation: everything radioactive or naturally occurring
+# that PyNE has data for, and everything those decay into. For each there's the decay constant, atomic mass, decay
+# children with branching ratios, and gamma and beta lines. Lines and children are ragged, so they're stored flat,
+# with a start offset per nuclide (nuclide i's gammas are gammaEnergy[gammaStart[i]:gammaStart[i + 1]]).
+# Each array is its own .npy in the cache directory, memory-mapped when loaded, so opening the snapshot costs almost
+# nothing and only the pages actually used get read. It's rebuilt whenever the nuclear data changes (about a minute).
+# Anything not in the snapshot falls back to pyne.data, so it's never wrong, just slower.
+
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+
+from pyne import data
+
+from starfish import engine
+from starfish import trace
+
+FORMAT = 1 # Bump this if what goes in the snapshot changes
+ARRAYS = ["nuclides", "lambdas", "masses", "childStart", "children", "branches",
+	"gammaStart", "gammaEnergy", "gammaIntensity", "betaStart", "betaEnergy", "betaIntensity"]
+
+_snapshot = None
+
+def snapshotDir():
+	stamp = hashlib.sha1(("%s %s" % (FORMAT, engine.nuclearDataStamp())).encode()).hexdigest()[:16]
+	return os.path.join(engine.cacheDir(), "nucdata-" + stamp)
+
+def candidates():
+	# Every nuclide id that could plausibly exist, ground state and a couple of isomers (ids are zzaaammmm)
+	for z in range(1, 111):
+		for a in range(z, int(z * 2.6) + 13):
+			for state in range(3):
+				yield z * 10000000 + a * 10000 + state
+
+def build(directory=None):
+	# Pull everything out of pyne.data and save it. Returns the directory it was saved in.
+	directory = directory or snapshotDir()
+	with trace.span("nucdata.build") as span:
+		found = set()
+		todo = [nuc for nuc in candidates() if data.decay_const(nuc) > 0 or data.natural_abund(nuc) > 0]
+		while todo: # Add everything they decay into
+			nuc = todo.pop()
+			if nuc in found:
+				continue
+			found.add(nuc)
+			if data.decay_const(nuc) > 0:
+				todo.extend(data.decay_children(nuc))
+		nuclides = np.array(sorted(found), dtype=np.int64)
+		arrays = {"nuclides": nuclides,
+			"lambdas": np.array([data.decay_const(nuc) for nuc in nuclides.tolist()]),
+			"masses": np.array([data.atomic_mass(nuc) for nuc in nuclides.tolist()])}
+		def ragged(name, entries, fields):
+			# entries is a list per nuclide of tuples; store the i-th element of each tuple in arrays[fields[i]]
+			arrays[name] = np.concatenate([[0], np.cumsum([len(rows) for rows in entries])]).astype(np.int64)
+			for i, field in enumerate(fields):
+				arrays[field] = np.array([row[i] for rows in entries for row in rows], dtype=np.int64 if field == "children" else float)
+		ragged("childStart", [[(child, data.branch_ratio(nuc, child)) for child in sorted(data.decay_children(nuc))] if data.decay_const(nuc) > 0 else []
+			for nuc in nuclides.tolist()], ["children", "branches"])
+		ragged("gammaStart", [engine.pyneGammaLines(nuc) for nuc in nuclides.tolist()], ["gammaEnergy", "gammaIntensity"])
+		ragged("betaStart", [engine.pyneBetaLines(nuc) for nuc in nuclides.tolist()], ["betaEnergy", "betaIntensity"])
+		span.set(snapshotNuclides=len(nuclides))
+	tmp = "%s.%d.tmp" % (directory, os.getpid()) # Batch workers may all be building it at once, so build somewhere private and rename
+	if os.path.isdir(tmp):
+		shutil.rmtree(tmp)
+	os.makedirs(tmp)
+	for name in ARRAYS:
+		np.save(os.path.join(tmp, name + ".npy"), arrays[name])
+	json.dump({"format": FORMAT, "nuclearData": engine.nuclearDataStamp(), "nuclides": len(nuclides)}, open(os.path.join(tmp, "about.json"), "w"))
+	try:
+		os.rename(tmp, directory)
+	except OSError: # Someone else got there first
+		shutil.rmtree(tmp, ignore_errors=True)
+	return directory
+
+class NuclearData(object):
+	def __init__(self, directory=None):
+		directory = directory or snapshotDir()
+		if not os.path.isdir(directory):
+			build(directory)
+		for name in ARRAYS:
+			setattr(self, name, np.load(os.path.join(directory, name + ".npy"), mmap_mode="r"))
+		self.index = dict((nuc, i) for i, nuc in enumerate(self.nuclides.tolist())) # For looking up one nuclide at a time
+
+	def lookup(self, nuclides):
+		# Row of each nuclide in the arrays, and whether it's there at all
+		nuclides = np.asarray(nuclides, dtype=np.int64)
+		idx = np.minimum(np.searchsorted(self.nuclides, nuclides), max(len(self.nuclides) - 1, 0))
+		return idx, self.nuclides[idx] == nuclides
+
+	def column(self, array, nuclides, fallback):
+		nuclides = np.asarray(nuclides, dtype=np.int64)
+		idx, found = self.lookup(nuclides)
+		values = np.array(array[idx], dtype=float)
+		for i in np.nonzero(~found)[0]:
+			values[i] = fallback(int(nuclides[i]))
+		return values
+
+	def decayConsts(self, nuclides):
+		return self.column(self.lambdas, nuclides, data.decay_const)
+
+	def atomicMasses(self, nuclides):
+		return self.column(self.masses, nuclides, data.atomic_mass)
+
+	def decayConst(self, nuc):
+		i = self.index.get(nuc)
+		return float(self.lambdas[i]) if i is not None else data.decay_const(nuc)
+
+	def atomicMass(self, nuc):
+		i = self.index.get(nuc)
+		return float(self.masses[i]) if i is not None else data.atomic_mass(nuc)
+
+	def decayChildren(self, nuc):
+		# [(child, branching ratio)] for a radioactive nuclide
+		i = self.index.get(nuc)
+		if i is None:
+			return [(child, data.branch_ratio(nuc, child)) for child in data.decay_children(nuc)]
+		start, end = self.childStart[i], self.childStart[i + 1]
+		return list(zip(self.children[start:end].tolist(), self.branches[start:end].tolist()))
+
+	def gammaLines(self, nuc):
+		i = self.index.get(nuc)
+		if i is None:
+			return engine.pyneGammaLines(nuc)
+		start, end = self.gammaStart[i], self.gammaStart[i + 1]
+		return list(zip(self.gammaEnergy[start:end].tolist(), self.gammaIntensity[start:end].tolist()))
+
+	def betaLines(self, nuc):
+		i = self.index.get(nuc)
+		if i is None:
+			return engine.pyneBetaLines(nuc)
+		start, end = self.betaStart[i], self.betaStart[i + 1]
+		return list(zip(self.betaEnergy[start:end].tolist(), self.betaIntensity[start:end].tolist()))
+
+	def lineArrays(self, kind, nuclides):
+		# Every "gamma" or "beta" line of all the given nuclides at once: (index into `nuclides` of each line's nuclide, energies keV, intensities)
+		nuclides = np.asarray(nuclides, dtype=np.int64)
+		start, energy, intensity = getattr(self, kind + "Start"), getattr(self, kind + "Energy"), getattr(self, kind + "Intensity")
+		idx, found = self.lookup(nuclides)
+		first = np.where(found, start[idx], 0)
+		counts = np.where(found, start[np.minimum(idx + 1, len(start) - 1)] - first, 0)
+		rows = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(first, counts)
+		owners, energies, intensities = [np.repeat(np.arange(len(nuclides)), counts)], [np.array(energy[rows], dtype=float)], [np.array(intensity[rows], dtype=float)]
+		pyneLines = engine.pyneGammaLines if kind == "gamma" else engine.pyneBetaLines
+		for i in np.nonzero(~found)[0]:
+			lines = pyneLines(int(nuclides[i]))
+			owners.append(np.repeat(i, len(lines)))
+			energies.append(np.array([e for e, f in lines], dtype=float))
+			intensities.append(np.array([f for e, f in lines], dtype=float))
+		return np.concatenate(owners).astype(int), np.concatenate(energies), np.concatenate(intensities)
+
+def getNuclearData():
+	global _snapshot
+	if _snapshot is None:
+		with trace.span("nucdata.load"):
+			_snapshot = NuclearData()
+	return _snapshot
@@ -0,0 +1,94 @@
+# The engine, split into stages that remember their results.
+# Each stage is keyed on its own inputs (for the expensive ones, on the actual contents of the material/flux/product they're given),
+# so asking for the same thing twice - flipping between result tabs, changing only the threshold or units - doesn't re-run anything,
+# and changing only the delay re-runs the decay but not the irradiation.
+
+import os
+from collections import OrderedDict
+
+from starfish import engine
+from starfish.fluxstore import getFluxStore
+
+def materialKey(material):
+	return (tuple(sorted(material.items())), material.mass)
+
+class Pipeline(object):
+	def __init__(self, size=8):
+		self.size = size # How many results to keep per stage
+		self.caches = {}
+		self.runs = {} # How many times each stage has actually been computed, rather than fetched from the cache
+
+	def cached(self, stage, key, compute):
+		cache = self.caches.setdefault(stage, OrderedDict())
+		if key in cache:
+			cache[key] = cache.pop(key) # Most recently used goes to the back of the queue
+			return cache[key]
+		value = compute()
+		self.runs[stage] = self.runs.get(stage, 0) + 1
+		cache[key] = value
+		if len(cache) > self.size:
+			cache.popitem(last=False)
+		return value
+
+	def clear(self):
+		self.caches = {}
+
+	def material(self, isotopes, mass, ratioType='Mass Ratio'):
+		key = (tuple(sorted(isotopes.items())), float(mass), ratioType)
+		return self.cached("material", key, lambda: engine.constructMaterial(isotopes, mass, ratioType))
+
+	def flux(self, path):
+		path = os.path.abspath(engine.resolveFluxProfile(path))
+		key = (path, os.path.getmtime(path)) # Re-read the profile if someone edits it
+		return self.cached("flux", key, lambda: getFluxStore().get(path))
+
+	def product(self, material, flux, power, time):
+		key = (materialKey(material), flux.tobytes(), float(power), float(time), engine.SOLVER, engine.TIER)
+		return self.cached("product", key, lambda: engine.irradiate(material, flux, power, time))
+
+	def scheduled(self, material, flux, segments):
+		from starfish import schedule
+		key = (materialKey(material), flux.tobytes(), tuple(segments), engine.SOLVER, engine.TIER)
+		return self.cached("product", key, lambda: schedule.irradiate(material, flux, segments))
+
+	def decayed(self, product, delay):
+		key = (materialKey(product), float(delay))
+		return self.cached("decayed", key, lambda: engine.decay(product, delay))
+
+	def results(self, product, after=None):
+		key = (materialKey(product), materialKey(after) if after is not None else None)
+		def compute():
+			results = engine.computeResults(product, after)
+			results["key"] = key # So that later stages (and the GUI) can tell whether they've already seen these results
+			return results
+		return self.cached("results", key, compute)
+
+	def lines(self, results, threshold):
+		# The gamma and beta lines with branching ratio at or above the threshold
+		def compute():
+			return {"gammas": [line for line in results["gammas"] if line["intensity"] >= threshold],
+				"betas": [line for line in results["betas"] if line["intensity"] >= threshold]}
+		return self.cached("lines", (results["key"], float(threshold)), compute)
+
+	def calculate(self, isotopes, mass, ratioType, profile, power, time, delay=None, threshold=None, progress=None, schedule=None):
+		# Everything the result tabs need, from the raw Setup tab values. `progress(stage, fraction)` is called before each stage.
+		# If there's a schedule (text, see schedule.py), it's used instead of power and time.
+		progress = progress or (lambda stage, fraction: None)
+		progress("Loading flux profile", 0.0)
+		material = self.material(isotopes, mass, ratioType)
+		flux = self.flux(profile)
+		progress("Irradiating", 0.1)
+		if schedule:
+			from starfish.schedule import parseSchedule
+			product = self.scheduled(material, flux, parseSchedule(schedule))
+		else:
+			product = self.product(material, flux, power, engine.parseTime(time))
+		after = None
+		if delay: # If we don't have a Time After Bombardment, don't calculate dose after decaying
+			progress("Decaying", 0.6)
+			after = self.decayed(product, engine.parseTime(delay))
+		progress("Calculating dose", 0.7)
+		results = self.results(product, after)
+		lines = self.lines(results, threshold) if threshold is not None else {"gammas": [], "betas": []}
+		return {"material": material, "flux": flux, "product": product, "after": after, "results": results, "lines": lines,
+			"dropped": engine.droppedInventory(material, product)}
@@ -0,0 +1,95 @@
+# Comparing irradiation positions: one sample, every flux profile in FluxProfiles/ (or another directory), activity and
+# dose side by side, so picking between the rabbit and the Lazy Susan doesn't mean entering the sample and calculating
+# once per profile.
+#
+# The collapsed profiles are stacked into one (positions x groups) array and irradiated with the sparse solver (see
+# sparse.py), whichever solver is picked for everything else: every reaction rate in every position comes out of one
+# matrix product, the nuclides to follow are worked out once for all the positions together, and all the positions are
+# solved at once as one block-diagonal burnup matrix. (PyNE's Transmuter would be one transmutation per isotope per
+# position.) So with the chain solver, a position's numbers here can differ a little from the Setup tab's - see
+# `starfish-cli crosscheck` for by how much. The dose for all positions is a single product with the dose table.
+#
+#     starfish-cli positions "Au:1" 0.05 250 10m --delay 1h
+
+from __future__ import print_function
+
+import numpy as np
+
+from starfish import engine
+from starfish import trace
+
+def stackProfiles(directory=None):
+	# (profile file names, array of their collapsed fluxes at 1 kW, one row per profile)
+	from starfish.fluxstore import getFluxStore
+	fluxes = getFluxStore().preload(directory)
+	names = sorted(fluxes)
+	if not names:
+		raise ValueError("No flux profiles in %s" % (directory or engine.FLUX_PROFILE_DIR))
+	groups = min(len(fluxes[name]) for name in names)
+	return names, np.array([np.asarray(fluxes[name][:groups], dtype=float) for name in names])
+
+def irradiateAll(material, fluxes, power, time):
+	# The product of the material in each of the fluxes (at 1 kW, one row each).
+	# Returns (nuclides, array of atoms of shape (len(fluxes), len(nuclides))).
+	from starfish.nucdata import getNuclearData
+	nucdata = getNuclearData()
+	atoms = engine.productAtoms(material)
+	targets = sorted(atoms)
+	with trace.span("positions.irradiate", positions=len(fluxes)) as span:
+		settings = engine.tierSettings()
+		nuclides, out = engine.getTransmuter("sparse").transmuteStack(targets, float(time), np.asarray(fluxes) * float(power), settings["tol"], settings["depth"])
+		product = out.dot(np.array([atoms[nuc] for nuc in targets]))
+		keep = ~np.isnan(nucdata.decayConsts(nuclides)) # Unknown half-lives are left out, as in responses.py
+		nuclides, product = [nuc for nuc, k in zip(nuclides, keep) if k], product[:, keep]
+		for row in product: # The tier's activity cut, position by position
+			kept = engine.screen(dict(zip(nuclides, row.tolist())))[0]
+			row[[i for i, nuc in enumerate(nuclides) if nuc not in kept]] = 0.0
+		span.set(products=len(nuclides))
+		return nuclides, product
+
+def comparePositions(material, power, time, delay=None, directory=None):
+	# Activity (Bq) and dose (mR/h at 30 cm) of the material irradiated in every profile, at end of bombardment and
+	# `delay` seconds later. Returns a row per profile, with the same keys as engine.computeResults's totals plus
+	# "profile" and "top" (the nuclide with the most activity at end of bombardment).
+	from starfish.nucdata import getNuclearData
+	from starfish.dosetable import getDoseTable
+	from pyne import nucname
+	names, fluxes = stackProfiles(directory)
+	nuclides, atoms = irradiateAll(material, fluxes, power, time)
+	with trace.span("positions.dose", positions=len(names)):
+		nucdata = getNuclearData()
+		lambdas = nucdata.decayConsts(nuclides)
+		act = atoms * lambdas
+		after = np.zeros_like(act)
+		if delay:
+			from starfish.decay import forNuclides
+			decayer = forNuclides(nuclides)
+			index = [decayer.index[nuc] for nuc in nuclides]
+			for k in range(len(names)):
+				after[k] = decayer.atoms(decayer.vector(dict(zip(nuclides, atoms[k].tolist()))), [delay])[0][index] * lambdas
+		gammaConst, betaConst = getDoseTable().constants(np.array(nuclides, dtype=np.int64))
+		columns = {"activity": act.sum(axis=1), "doseG": act.dot(gammaConst), "doseB": act.dot(betaConst),
+			"activityAfter": after.sum(axis=1), "doseGAfter": after.dot(gammaConst), "doseBAfter": after.dot(betaConst)}
+		top = np.argmax(act, axis=1) if len(nuclides) else np.zeros(len(names), dtype=int)
+		rows = []
+		for k, name in enumerate(names):
+			row = dict((key, float(values[k])) for key, values in columns.items())
+			row.update(profile=name, top=nucname.name(nuclides[top[k]]) if len(nuclides) and act[k, top[k]] > 0 else "")
+			rows.append(row)
+		return rows
+
+def positionsCommand(args):
+	from starfish import batch
+	material = engine.constructMaterial(batch.parseComposition(args.composition), args.mass, args.ratio_type)
+	delay = engine.parseTime(args.delay) if args.delay else None
+	rows = comparePositions(material, args.power, engine.parseTime(args.time), delay, args.directory)
+	headings = ["Activity (Bq)", "Gamma mR/h", "Beta mR/h"]
+	keys = ["activity", "doseG", "doseB"]
+	if delay:
+		headings += ["Bq after " + args.delay, "mR/h after"]
+		keys += ["activityAfter", "doseAfter"]
+	print(("%-24s" + " %14s" * len(headings) + "  %s") % tuple(["Profile"] + headings + ["Most active"]))
+	for row in rows:
+		row["doseAfter"] = row["doseGAfter"] + row["doseBAfter"]
+		print(("%-24s" + " %14.4g" * len(keys) + "  %s") % tuple([row["profile"]] + [row[key] for key in keys] + [row["top"]]))
+	return 0
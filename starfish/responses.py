@@ -0,0 +1,113 @@
+# Transmutation is linear in the starting composition: the product of a mixture is just the sum of what each of its
+# isotopes turns into on its own, weighted by how much of it there is. So instead of running Transmuter.transmute on
+# every material, we keep each target isotope's "response" - atoms of every product nuclide per atom of target - for
+# a given (flux, power, time), and any mixture's product is a sparse matrix-vector product with those responses.
+#
+# Responses are worked out lazily, the first time a mixture containing that isotope is irradiated under those
+# conditions, and the least recently used (flux, power, time) sets are dropped once there are too many. Each accuracy
+# tier (engine.TIERS) has its own response sets, since they follow the chains to different lengths.
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+from scipy.sparse import csc_matrix
+
+from pyne.material import Material
+from pyne import nucname
+
+from starfish import engine
+from starfish import trace
+from starfish.nucdata import getNuclearData
+
+_library = None
+
+class ResponseSet(object):
+	# All the responses for one flux, power and irradiation time
+	def __init__(self, flux, power, time, transmuter=None, tier=None):
+		self.flux = np.asarray(flux) * float(power)
+		self.time = float(time)
+		self.transmuter = transmuter
+		self.settings = engine.tierSettings(tier)
+		self.nuclides = [] # Every product nuclide seen so far; rows of the response matrix
+		self.index = {}
+		self.columns = {} # Target nuclide -> (row numbers, atoms per atom of target)
+
+	def row(self, nuc):
+		if nuc not in self.index:
+			self.index[nuc] = len(self.nuclides)
+			self.nuclides.append(nuc)
+		return self.index[nuc]
+
+	def fill(self, targets):
+		t = self.transmuter or engine.getTransmuter()
+		nucdata = getNuclearData()
+		missing = [nuc for nuc in targets if nuc not in self.columns]
+		if missing and hasattr(t, "transmuteMany"): # The sparse solver can do all of them in one solve
+			products, out = t.transmuteMany(missing, self.time, self.flux, self.settings["tol"], self.settings["depth"])
+			keep = ~np.isnan(nucdata.decayConsts(products)) # Unknown half-lives are left out, same as below
+			rows = np.array([self.row(iso) for iso, k in zip(products, keep) if k], dtype=int)
+			for k, nuc in enumerate(missing):
+				column = out[keep, k]
+				nonzero = column > 0
+				self.columns[nuc] = (rows[nonzero], column[nonzero])
+			return
+		for nuc in missing:
+			with trace.span("transmute", target=nucname.name(nuc)):
+				product = t.transmute(Material({nuc: 1.0}, mass=1.0), self.time, self.flux, self.settings["tol"]) # One gram of just this isotope; Transmuter has no depth limit
+			masses = product.mult_by_mass()
+			isos = [iso for iso in masses if masses[iso] > 0]
+			keep = ~np.isnan(nucdata.decayConsts(isos))	# This fixes a bug involving the irradiation of W-186. PyNE claims it produces a negligible amount of Ta-187,
+			isos = [iso for iso, k in zip(isos, keep) if k]	# and the half-life of Ta-187 is unknown, so we leave out all isotopes with unknown half-lives.
+			values = np.array([masses[iso] for iso in isos]) / nucdata.atomicMasses(isos) * nucdata.atomicMass(nuc) # Grams of product per gram of target -> atoms per atom
+			self.columns[nuc] = (np.array([self.row(iso) for iso in isos], dtype=int), values)
+
+	def matrix(self, targets):
+		# Sparse (product nuclides x targets) response matrix for these targets
+		self.fill(targets)
+		cols = [self.columns[nuc] for nuc in targets]
+		indptr = np.concatenate([[0], np.cumsum([len(rows) for rows, values in cols])])
+		indices = np.concatenate([rows for rows, values in cols] + [np.zeros(0, dtype=int)])
+		data = np.concatenate([values for rows, values in cols] + [np.zeros(0)])
+		return csc_matrix((data, indices, indptr), shape=(len(self.nuclides), len(targets)))
+
+	def applyMany(self, mixtures):
+		# Products of several {nuclide: atoms} mixtures at once. Returns (nuclides, array of shape (len(nuclides), len(mixtures))).
+		targets = sorted(set(nuc for atoms in mixtures for nuc in atoms))
+		R = self.matrix(targets)
+		X = np.array([[atoms.get(nuc, 0.0) for atoms in mixtures] for nuc in targets]).reshape(len(targets), len(mixtures))
+		return list(self.nuclides), R.dot(X)
+
+	def apply(self, atoms):
+		# Product of a single {nuclide: atoms} mixture, as {nuclide: atoms}
+		nuclides, out = self.applyMany([atoms])
+		return dict((nuc, n) for nuc, n in zip(nuclides, out[:, 0]) if n > 0)
+
+class ResponseLibrary(object):
+	def __init__(self, size=32, transmuter=None):
+		self.size = size # How many (flux, power, time) response sets to keep
+		self.transmuter = transmuter
+		self.sets = OrderedDict()
+
+	def responses(self, flux, power, time):
+		key = (hashlib.sha1(np.ascontiguousarray(flux).tobytes()).hexdigest(), float(power), float(time), engine.SOLVER, engine.TIER)
+		if key in self.sets:
+			self.sets[key] = self.sets.pop(key) # Most recently used goes to the back of the queue
+		else:
+			self.sets[key] = ResponseSet(flux, power, time, self.transmuter, engine.TIER)
+			if len(self.sets) > self.size:
+				self.sets.popitem(last=False)
+		return self.sets[key]
+
+	def irradiate(self, material, flux, power, time):
+		# Same as Transmuter.transmute(material, time, flux * power), as a PyNE material
+		with trace.span("irradiate") as span:
+			product, dropped = engine.screen(self.responses(flux, power, time).apply(engine.productAtoms(material)))
+			span.set(products=len(product))
+			return engine.atomsToMaterial(list(product.keys()), list(product.values()), dropped)
+
+def getResponseLibrary():
+	global _library
+	if _library is None:
+		_library = ResponseLibrary()
+	return _library
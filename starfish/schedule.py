@@ -0,0 +1,86 @@
+# Irradiation schedules: a list of (power kW, seconds) segments run one after another, so repeated rabbit shots,
+# a week of 8-hour days, or a run that changes power partway through can be done in one go.
+#
+# Written out, a schedule is segments separated by commas, each a power then a time, with "(...) x N" for repeats:
+#     250 8h, 0 16h                    one day at full power, then the night off
+#     (250 8h, 0 16h) x 5, 0 2d        a working week, then the weekend
+#     (250 30s, 0 10m) x 20            twenty rabbit shots ten minutes apart
+#
+# Nothing here calls Transmuter.transmute per segment. Powered segments go through the response library (see
+# responses.py), where each distinct (power, time) is one response set whose single-isotope responses, once worked
+# out, are reused by every later segment like it - the fifth day costs next to nothing once the first two are done.
+# Zero-power segments are pure decay, solved with the decay engine (see decay.py).
+
+import re
+
+import numpy as np
+
+from starfish import engine
+from starfish import trace
+
+REPEAT = re.compile(r"\(([^()]*)\)\s*[xX*]\s*(\d+)")
+TIME = r"(?:[0-9.]+\s*(?:w|wks?|weeks?|d|days?|h|hrs?|hours?|m|mins?|minutes?|s|secs?|seconds?)\b\s*)+|[0-9.]+" # "1d 4h", "30 s", or plain seconds
+SEGMENT = re.compile(r"^([-+0-9.eE]+)\s*(?:kW)?\s+(" + TIME + r")$")
+
+def parseSchedule(schedule):
+	# Text (see above) or a list of [power, time] pairs -> list of (power kW, seconds)
+	if isinstance(schedule, (list, tuple)):
+		return [(float(power), engine.parseTime(time)) for power, time in schedule]
+	text = schedule
+	while True: # Expand the innermost repeats until there aren't any left
+		text, found = REPEAT.subn(lambda m: ", ".join([m.group(1)] * int(m.group(2))), text)
+		if not found:
+			break
+	if "(" in text or ")" in text:
+		raise ValueError("Unmatched parentheses in schedule, or a group without a repeat count - write repeats like \"(250 8h, 0 16h) x 5\"")
+	segments = []
+	for part in re.split(r"[,;\n]", text):
+		part = part.strip()
+		if not part:
+			continue
+		match = SEGMENT.match(part)
+		if not match:
+			raise ValueError("Can't read schedule segment %r - expected a power (kW) then a time, like \"250 8h\" (repeats go in parentheses: \"(250 8h) x 2\")" % part)
+		power, seconds = float(match.group(1)), engine.parseTime(match.group(2).strip())
+		if power < 0 or seconds < 0:
+			raise ValueError("Schedule segment %r has a negative power or time" % part)
+		segments.append((power, seconds))
+	if not segments:
+		raise ValueError("Empty schedule")
+	return segments
+
+def simplify(segments):
+	# Drop empty segments and run together neighbours at the same power
+	out = []
+	for power, seconds in segments:
+		if seconds <= 0:
+			continue
+		if out and out[-1][0] == power:
+			out[-1] = (power, out[-1][1] + seconds)
+		else:
+			out.append((power, seconds))
+	return out
+
+def totalTime(segments):
+	return sum(seconds for power, seconds in segments)
+
+def evolve(atoms, flux, segments):
+	# {nuclide: atoms} at the end of the schedule, starting from {nuclide: atoms}
+	from starfish.responses import getResponseLibrary
+	from starfish.decay import forNuclides
+	library = getResponseLibrary()
+	for power, seconds in simplify(segments):
+		if power > 0:
+			atoms = library.responses(flux, power, seconds).apply(atoms)
+		else:
+			decayer = forNuclides(atoms.keys())
+			after = decayer.atoms(decayer.vector(atoms), [seconds])[0]
+			atoms = dict((nuc, n) for nuc, n in zip(decayer.nuclides, after.tolist()) if n > 0)
+	return atoms
+
+def irradiate(material, flux, segments):
+	# Like engine.irradiate, for a whole schedule. Returns the product at the end of the last segment, as a PyNE material.
+	with trace.span("schedule", segments=len(segments)) as span:
+		product, dropped = engine.screen(evolve(engine.productAtoms(material), flux, segments)) # The tier's activity cut only at the very end, so nothing's missing from later segments
+		span.set(products=len(product))
+		return engine.atomsToMaterial(list(product.keys()), np.array(list(product.values())), dropped)
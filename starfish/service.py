@@ -0,0 +1,166 @@
+# A long-running calculation service: the engine, nuclear data and flux profiles are loaded once and kept warm, and
+# irradiations are asked for over HTTP with JSON, from any machine or script that can reach it.
+#
+#     starfish-cli serve --port 8642
+#     curl -d '{"composition": {"Au": 1}, "mass": 0.05, "profile": "RabbitFlux.csv", "power": 250, "time": "10m", "delays": ["1h"]}' localhost:8642/irradiate
+#
+# POST /irradiate takes a sample in the same form as a JSON batch manifest entry (see batch.py; composition can also be
+# "Fe:0.7 Cr:0.2"), plus an optional "threshold" that drops gamma and beta lines below that branching ratio, and
+# returns what engine.runSample does. GET /status says how busy it is, GET /profiles lists the flux profiles.
+#
+# Everything is warmed up before the worker processes are forked, so each starts out with it all in memory. At most
+# `queue` requests are waiting or running at once - past that the answer is 503, try again later - and a request
+# identical to one already being worked on just waits for that one's answer instead of being run again.
+
+import os
+import sys
+import json
+import time
+import threading
+import traceback
+import multiprocessing
+try:
+	import BaseHTTPServer
+	import SocketServer
+except ImportError: # Python 3
+	import http.server as BaseHTTPServer
+	import socketserver as SocketServer
+
+from starfish import engine
+from starfish import trace
+
+def runRequest(sample):
+	# Worker entry point. Returns (HTTP status, answer); never raises.
+	try:
+		from starfish import batch
+		sample = dict(sample)
+		if not isinstance(sample.get("composition"), dict):
+			sample["composition"] = batch.parseComposition(str(sample.get("composition", "")))
+		for key in ("composition", "mass", "profile"):
+			if not sample.get(key):
+				raise ValueError("Missing %r" % key)
+		if not sample.get("schedule") and not (sample.get("power") and sample.get("time")):
+			raise ValueError("Need either power and time, or a schedule")
+		sample["mass"] = float(sample["mass"])
+		if "power" in sample:
+			sample["power"] = float(sample["power"])
+		if not os.path.exists(engine.resolveFluxProfile(sample["profile"])):
+			raise ValueError("No flux profile %r" % sample["profile"])
+		with trace.span("service.request"):
+			results = engine.runSample(sample)
+		threshold = sample.get("threshold")
+		if threshold is not None:
+			results["gammas"] = [line for line in results["gammas"] if line["intensity"] >= float(threshold)]
+			results["betas"] = [line for line in results["betas"] if line["intensity"] >= float(threshold)]
+		return 200, results
+	except (ValueError, KeyError, TypeError) as e: # Something wrong with the request itself
+		return 400, {"error": "%s: %s" % (type(e).__name__, e)}
+	except Exception as e:
+		return 500, {"error": "%s: %s" % (type(e).__name__, e), "traceback": traceback.format_exc()}
+
+class Service(object):
+	def __init__(self, workers=None, queue=64, timeout=600):
+		from starfish import startup
+		self.started = time.time()
+		startup.warmUp() # Before forking, so every worker gets it for free
+		self.workers = workers or multiprocessing.cpu_count()
+		self.pool = multiprocessing.Pool(self.workers)
+		self.slots = threading.BoundedSemaphore(queue)
+		self.queue = queue
+		self.timeout = timeout
+		self.lock = threading.Lock()
+		self.inFlight = {} # Canonical JSON of a request -> its AsyncResult, while it's being worked on
+		self.counts = {"served": 0, "deduplicated": 0, "rejected": 0, "timedOut": 0}
+
+	def irradiate(self, sample):
+		# (HTTP status, answer) for a request
+		key = json.dumps(sample, sort_keys=True)
+		def finished(answer): # Called from the pool's result thread as soon as the work is done (runRequest never raises)
+			with self.lock:
+				del self.inFlight[key]
+				self.slots.release()
+		with self.lock:
+			pending = self.inFlight.get(key)
+			if pending is not None:
+				self.counts["deduplicated"] += 1
+			elif not self.slots.acquire(False):
+				self.counts["rejected"] += 1
+				return 503, {"error": "Too many requests waiting (%d); try again shortly" % self.queue}
+			else:
+				pending = self.inFlight[key] = self.pool.apply_async(runRequest, (sample,), callback=finished)
+		try:
+			answer = pending.get(self.timeout)
+		except multiprocessing.TimeoutError:
+			with self.lock:
+				self.counts["timedOut"] += 1
+			return 504, {"error": "Timed out after %d s" % self.timeout}
+		with self.lock:
+			self.counts["served"] += 1
+		return answer
+
+	def status(self):
+		with self.lock:
+			status = dict(self.counts)
+			status.update(inFlight=len(self.inFlight), queue=self.queue, workers=self.workers, uptime=time.time() - self.started, solver=engine.SOLVER, tier=engine.TIER)
+		return 200, status
+
+	def profiles(self):
+		from starfish.fluxstore import getFluxStore
+		return 200, {"profiles": sorted(getFluxStore().preload().keys())}
+
+	def close(self):
+		self.pool.terminate()
+		self.pool.join()
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+	def reply(self, status, answer):
+		body = json.dumps(answer).encode()
+		self.send_response(status)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def do_GET(self):
+		if self.path == "/status":
+			self.reply(*self.server.service.status())
+		elif self.path == "/profiles":
+			self.reply(*self.server.service.profiles())
+		else:
+			self.reply(404, {"error": "No such page; try POST /irradiate, GET /status or GET /profiles"})
+
+	def do_POST(self):
+		if self.path != "/irradiate":
+			self.reply(404, {"error": "No such page; try POST /irradiate, GET /status or GET /profiles"})
+			return
+		try:
+			sample = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode())
+			if not isinstance(sample, dict):
+				raise ValueError("Expected a JSON object")
+		except ValueError as e:
+			self.reply(400, {"error": "Bad JSON: %s" % e})
+			return
+		self.reply(*self.server.service.irradiate(sample))
+
+	def log_message(self, format, *args):
+		sys.stderr.write("%s %s\n" % (self.address_string(), format % args))
+
+class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+	daemon_threads = True # Don't wait for hung connections when shutting down
+
+def serve(host="127.0.0.1", port=8642, workers=None, queue=64, timeout=600):
+	service = Service(workers, queue, timeout)
+	server = Server((host, port), Handler)
+	server.service = service
+	sys.stderr.write("Starfish service on http://%s:%d/ with %d workers\n" % (host, server.server_address[1], service.workers))
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+		service.close()
+
+def serveCommand(args):
+	serve(args.host, args.port, args.jobs, args.queue, args.timeout)
+	return 0
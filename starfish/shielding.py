@@ -0,0 +1,122 @@
+# Dose at any distance and behind shielding, for choosing transfer-cask shielding and handling distances.
+#
+# The dose constants in engine.py are for a bare sample at 30 cm. Here every gamma line of every nuclide in the
+# product is taken through a grid of shields, thicknesses and distances in one go: each line's dose at 30 cm (the same
+# formula as engine.gammaDosePerBq) times exp(-mu x) and a buildup factor for each shield thickness, times the inverse
+# square of each distance. Attenuation coefficients (mu/rho, cm^2/g) are NIST's, in lead_gamma.csv, iron_gamma.csv and
+# water_gamma.csv next to air_gamma.csv (https://physics.nist.gov/PhysRefData/XrayMassCoef/); steel is taken to be
+# iron. Buildup factors are the point isotropic source dose buildup factors of Goldstein and Wilkins, in buildup.csv.
+#
+# Energies past either end of a table use the value at that end: below 10 keV, where the tables start, that
+# underestimates the attenuation (the conservative way), and below the lowest buildup energy the buildup factors are
+# only rough. Betas are taken to be stopped by any thickness of shield at all (bremsstrahlung isn't counted), and air
+# attenuation over the distance is left out, as everywhere else.
+#
+#     starfish-cli shielding "Au:1" 0.05 RabbitFlux.csv 250 10m --delay 1h -d 30 100 -t 0 1 2 5 -s lead steel
+
+from __future__ import print_function
+
+import os
+import csv
+
+import numpy as np
+
+from starfish import engine
+from starfish import trace
+
+SHIELDS = { # Name -> (attenuation table, density g/cm^3, name in buildup.csv)
+	"lead": ("lead_gamma.csv", 11.35, "lead"),
+	"steel": ("iron_gamma.csv", 7.874, "iron"),
+	"water": ("water_gamma.csv", 1.0, "water"),
+}
+BUILDUP_PATH = os.path.join(engine.DATA_DIR, "buildup.csv")
+REFERENCE_DISTANCE = 30.0 # cm, the distance engine.gammaDosePerBq and betaDosePerBq are for
+
+_shields = {}
+
+class Shield(object):
+	def __init__(self, name):
+		if name not in SHIELDS:
+			raise ValueError("Unknown shield %r - use one of %s" % (name, ", ".join(sorted(SHIELDS))))
+		path, self.density, buildupName = SHIELDS[name]
+		self.name = name
+		table = np.array([[float(x) for x in row] for row in csv.reader(open(os.path.join(engine.DATA_DIR, path)))])
+		self.logEnergy, self.logMu = np.log(table[:, 0]), np.log(table[:, 1])
+		reader = csv.reader(open(BUILDUP_PATH))
+		header = next(reader)
+		rows = [[float(x) for x in row[1:]] for row in reader if row[0] == buildupName]
+		self.mfp = np.concatenate([[0.0], [float(x) for x in header[2:]]]) # Mean free paths the buildup factors are given at; B = 1 with no shield
+		self.buildupEnergy = np.log([row[0] for row in rows])
+		self.buildup = np.array([[1.0] + row[1:] for row in rows])
+
+	def attenuation(self, mev):
+		# Linear attenuation coefficient (1/cm) at each energy, interpolated log-log
+		return np.exp(np.interp(np.log(mev), self.logEnergy, self.logMu)) * self.density
+
+	def buildupFactor(self, mev, mfp):
+		# Buildup factor for lines of energies `mev` (shape (lines,)) through `mfp` mean free paths (shape (lines, ...))
+		mfp = np.asarray(mfp, dtype=float)
+		last, slope = self.buildup[:, -1], (self.buildup[:, -1] - self.buildup[:, -2]) / (self.mfp[-1] - self.mfp[-2])
+		B = np.array([np.where(mfp > self.mfp[-1], last[r] + slope[r] * (mfp - self.mfp[-1]), np.interp(mfp, self.mfp, self.buildup[r]))
+			for r in range(len(self.buildup))]) # At each tabulated energy: (energies, lines, ...)
+		x = np.clip(np.log(mev), self.buildupEnergy[0], self.buildupEnergy[-1])
+		j = np.clip(np.searchsorted(self.buildupEnergy, x) - 1, 0, len(self.buildupEnergy) - 2)
+		w = ((x - self.buildupEnergy[j]) / (self.buildupEnergy[j + 1] - self.buildupEnergy[j])).reshape((-1,) + (1,) * (mfp.ndim - 1))
+		lines = np.arange(len(mev))
+		return (1 - w) * B[j, lines] + w * B[j + 1, lines]
+
+def getShield(name):
+	if name not in _shields:
+		_shields[name] = Shield(name)
+	return _shields[name]
+
+def productActivity(product):
+	# (radioactive nuclides, Bq of each) for a PyNE material
+	from starfish.nucdata import getNuclearData
+	atoms = engine.productAtoms(product)
+	nuclides = np.array(list(atoms.keys()), dtype=np.int64)
+	lambdas = getNuclearData().decayConsts(nuclides)
+	keep = lambdas > 0
+	return nuclides[keep], np.array(list(atoms.values()))[keep] * lambdas[keep]
+
+def doseGrid(nuclides, activity, distances, thicknesses=(0.0,), shields=("lead",)):
+	# Gamma and beta dose (mR/h) from `activity` Bq of each of `nuclides`, at each distance (cm from the sample) behind
+	# each thickness (cm) of each shield: {"gamma": array of shape (shields, thicknesses, distances), "beta": the same}
+	from starfish.nucdata import getNuclearData
+	from starfish.dosetable import getDoseTable
+	nuclides = np.asarray(nuclides, dtype=np.int64)
+	activity = np.asarray(activity, dtype=float)
+	distances = np.asarray(distances, dtype=float)
+	thicknesses = np.asarray(thicknesses, dtype=float)
+	with trace.span("shielding", nuclides=len(nuclides), grid=len(shields) * len(thicknesses) * len(distances)) as span:
+		owner, kev, intensity = getNuclearData().lineArrays("gamma", nuclides)
+		mev = np.clip(kev / 1000, 1e-3, 20.0) # The range of air_gamma.csv
+		atReference = activity[owner] * intensity * 5.263e-6 * mev * engine.loadAirGamma()(mev) / 90000 * 1000 # mR/h from each line at 30 cm, as engine.gammaDosePerBq
+		mux = np.array([getShield(name).attenuation(mev) for name in shields]).reshape(len(shields), len(mev))[:, :, None] * thicknesses # (shields, lines, thicknesses)
+		transmitted = np.array([getShield(name).buildupFactor(mev, mux[k]) for k, name in enumerate(shields)]).reshape(mux.shape) * np.exp(-mux)
+		geometry = (REFERENCE_DISTANCE / distances) ** 2
+		gamma = np.einsum("l,slt,d->std", atReference, transmitted, geometry)
+		beta = activity.dot(getDoseTable().constants(nuclides)[1]) * (thicknesses == 0)[None, :, None] * geometry * np.ones(gamma.shape)
+		span.set(gammaLines=len(mev))
+	return {"gamma": gamma, "beta": beta}
+
+def shieldingCommand(args):
+	from starfish import batch
+	sample = {"composition": batch.parseComposition(args.composition), "mass": args.mass, "ratioType": args.ratio_type, "profile": args.profile}
+	if args.schedule:
+		sample["schedule"] = args.schedule
+	else:
+		sample.update(power=args.power, time=args.time)
+	product = engine.irradiateSample(sample)
+	if args.delay:
+		product = engine.decay(product, engine.parseTime(args.delay))
+	nuclides, activity = productActivity(product)
+	grid = doseGrid(nuclides, activity, args.distance, args.thickness, args.shield)
+	dose = grid["gamma"] + grid["beta"]
+	print("Dose (mR/h, gamma + beta)%s" % (" %s after bombardment" % args.delay if args.delay else " at end of bombardment"))
+	for k, name in enumerate(args.shield):
+		print()
+		print(("%-16s" + " %12s" * len(args.distance)) % tuple(["%s (cm)" % name] + ["at %g cm" % d for d in args.distance]))
+		for i, thickness in enumerate(args.thickness):
+			print(("%-16g" + " %12.4g" * len(args.distance)) % tuple([thickness] + dose[k, i].tolist()))
+	return 0
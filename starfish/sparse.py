@@ -0,0 +1,263 @@
+# A transmutation solver that builds the whole burnup matrix and solves it in one go, as an alternative to PyNE's
+# chainsolve.Transmuter (which follows each decay/reaction chain out from every parent nuclide one at a time, and gets
+# slow for heavy targets with deep chains, like W-186).
+#
+# The matrix has one row and column per nuclide that can be reached from the starting material: a nuclide is lost by
+# decay and by every EAF reaction, and made by its parents' decays (with their branching ratios) and reactions. Rates
+# come from the same EAF cross sections Transmuter uses, collapsed with the flux. As with Transmuter's `tol`, a product
+# that could only ever amount to less than `tol` of the atoms that started the chain is kept but its own chain isn't
+# followed, and with a `depth`, nothing more than that many reactions and decays from a target is (see engine.TIERS).
+# The matrix is stiff (half-lives from microseconds to billions of years), so it's solved with the Chebyshev rational
+# approximation (CRAM, order 16, in the incomplete partial fraction form of Pusa 2016), which is eight sparse complex
+# solves however many nuclides there are.
+#
+# SparseTransmuter.transmute takes and returns the same things as Transmuter.transmute, so either can be used anywhere
+# (set STARFISH_SOLVER=sparse, or --solver sparse on the command line) and their answers compared (starfish-cli crosscheck).
+
+import os
+import hashlib
+
+import numpy as np
+from scipy.sparse import csc_matrix, identity
+from scipy.sparse.linalg import splu
+
+from starfish import engine
+from starfish import trace
+
+CRAM_THETA = np.array([3.509103608414918+8.436198985884374j, 5.948152268951177+3.587457362018322j, -5.264971343442647+16.22022147316793j,
+	1.419375897185666+10.92536348449672j, 6.416177699099435+1.194122393370139j, 4.993174737717997+5.996881713603942j,
+	-1.413928462488886+13.49772569889275j, -10.84391707869699+19.27744616718165j])
+CRAM_ALPHA = np.array([5.464930576870210e+3-3.797983575308356e+4j, 9.045112476907548e+1-1.115537522430261e+3j,
+	2.344818070467641e+2-4.228020157070496e+2j, 9.453304067358312e+1-2.951294291446048e+2j, 7.283792954673409e+2-1.205646080220011e+5j,
+	3.648229059594851e+1-1.155509621409682e+2j, 2.547321630156819e+1-2.639500283021502e+1j, 2.394538338734709e+1-5.650522971778156e+0j])
+CRAM_ALPHA0 = 2.124853710495224e-16
+
+# The reactions to follow, if the Transmuter doesn't say (all the neutron-induced, non-fission reactions in EAF)
+REACTIONS = ["gamma", "gamma_1", "gamma_2", "p", "p_1", "p_2", "d", "d_1", "d_2", "t", "t_1", "t_2", "He3", "He3_1", "He3_2",
+	"a", "a_1", "a_2", "z_2a", "z_2p", "z_2p_1", "z_2p_2", "z_2n", "z_2n_1", "z_2n_2", "z_3n", "z_3n_1", "z_3n_2",
+	"na", "na_1", "na_2", "z_2na", "np", "np_1", "np_2", "n2a", "nd", "nd_1", "nd_2", "nt", "nt_1", "nt_2",
+	"nHe3", "nHe3_1", "nHe3_2", "z_4n", "z_4n_1", "n", "n_1", "n_2", "z_3np"]
+
+BARN = 1e-24 # cm^2
+
+_library = None
+
+def cram(A, n0, t):
+	# exp(A t) n0, for a sparse matrix A and a vector (or a matrix, one column per starting vector) n0
+	At = csc_matrix(A * t, dtype=complex)
+	I = identity(At.shape[0], dtype=complex, format="csc")
+	y = np.array(n0, dtype=float)
+	for theta, alpha in zip(CRAM_THETA, CRAM_ALPHA):
+		y = y + 2 * (alpha * splu(csc_matrix(At - theta * I)).solve(y.astype(complex))).real
+	return y * CRAM_ALPHA0
+
+class CrossSections(object):
+	# Group-wise EAF cross sections (barns) for each parent nuclide, summed by daughter, kept in the cache directory -
+	# reading them out of nuc_data.h5 one reaction at a time is most of the cost of building a matrix
+	def __init__(self, reactions, path=None):
+		self.reactions = list(reactions)
+		version = hashlib.sha1((engine.nuclearDataStamp() + " " + " ".join(str(rx) for rx in self.reactions)).encode()).hexdigest()[:16]
+		self.path = path or os.path.join(engine.cacheDir(), "eaf_xs-%s.npz" % version)
+		self.parents = {} # nuclide -> [(daughter, group cross sections)]
+		self.dataSource = None
+		self.unsaved = False
+		if os.path.exists(self.path):
+			try:
+				saved = np.load(self.path)
+				start, children, xs = saved["start"], saved["children"], saved["xs"]
+				for i, nuc in enumerate(saved["parents"].tolist()):
+					self.parents[nuc] = [(int(children[k]), xs[k]) for k in range(start[i], start[i + 1])]
+			except Exception: # A half-written or corrupt file is no worse than none
+				self.parents = {}
+
+	def daughters(self, nuc):
+		if nuc not in self.parents:
+			from pyne import rxname
+			if self.dataSource is None:
+				from pyne.xs.data_source import EAFDataSource
+				with trace.span("eaf.load"):
+					self.dataSource = EAFDataSource()
+			byChild = {}
+			for rx in self.reactions:
+				try:
+					child = rxname.child(nuc, rx)
+				except Exception: # Not a reaction this nuclide can have
+					continue
+				xs = self.dataSource.reaction(nuc, rx)
+				if xs is None or not np.any(xs > 0):
+					continue
+				byChild[child] = byChild.get(child, 0.0) + np.asarray(xs, dtype=float)
+			self.parents[nuc] = sorted(byChild.items())
+			self.unsaved = True
+		return self.parents[nuc]
+
+	def save(self):
+		if not self.unsaved:
+			return
+		parents = sorted(self.parents)
+		entries = [entry for nuc in parents for entry in self.parents[nuc]]
+		start = np.concatenate([[0], np.cumsum([len(self.parents[nuc]) for nuc in parents])]).astype(np.int64)
+		groups = len(engine.eafGroupStructure()) - 1
+		xs = np.array([entry[1] for entry in entries]) if entries else np.zeros((0, groups))
+		tmp = "%s.%d.tmp.npz" % (self.path[:-4], os.getpid()) # Batch workers may all be saving at once
+		np.savez(tmp, parents=np.array(parents, dtype=np.int64), start=start, children=np.array([entry[0] for entry in entries], dtype=np.int64), xs=xs)
+		os.rename(tmp, self.path)
+		self.unsaved = False
+
+class BurnupNetwork(object):
+	# Which nuclides are followed and how they're connected, with the reaction rates left open: the burnup matrix in any
+	# flux (or with any cross sections) has the same entries, and only the reaction rates in it change
+	def __init__(self, nuclides, decays, parents, children, groupXS):
+		self.nuclides = nuclides
+		self.index = dict((nuc, i) for i, nuc in enumerate(nuclides))
+		rows, cols, values = zip(*decays) if decays else ((), (), ())
+		self.decays = (np.array(rows, dtype=int), np.array(cols, dtype=int), np.array(values, dtype=float)) # Matrix entries from decay, diagonal included
+		self.parents = np.array(parents, dtype=int) # Column of each reaction's target
+		self.children = np.array(children, dtype=int) # Row of each reaction's product, or -1 if it isn't followed (it still takes atoms away)
+		self.groupXS = groupXS # Group cross sections (barns) of each reaction, one row per reaction
+
+	def rates(self, phis):
+		# Rate (per atom per second) of every reaction in each flux: shape (reactions, len(phis))
+		phis = np.atleast_2d(np.asarray(phis, dtype=float))
+		groups = min(phis.shape[1], self.groupXS.shape[1])
+		return self.groupXS[:, :groups].dot(phis[:, :groups].T) * BARN
+
+	def entries(self, rates):
+		# (rows, columns, values) of the burnup matrix, with a column of values for each column of rates
+		followed = self.children >= 0
+		rows, cols, values = self.decays
+		rows = np.concatenate([rows, self.parents, self.children[followed]])
+		cols = np.concatenate([cols, self.parents, self.parents[followed]])
+		values = np.concatenate([np.repeat(values[:, None], rates.shape[1], axis=1), -rates, rates[followed]])
+		return rows, cols, values
+
+	def matrices(self, rates):
+		rows, cols, values = self.entries(rates)
+		return [csc_matrix((values[:, k], (rows, cols)), shape=(len(self.nuclides), len(self.nuclides))) for k in range(values.shape[1])]
+
+	def start(self, targets):
+		# One atom of each target, a column each
+		n0 = np.zeros((len(self.nuclides), len(targets)))
+		for k, nuc in enumerate(targets):
+			n0[self.index[nuc], k] = 1.0
+		return n0
+
+	def solve(self, rates, n0, t):
+		# exp(A t) n0 for the burnup matrix A with each column of rates: an array of shape (rates.shape[1], len(nuclides), n0.shape[1]).
+		# All the matrices go into one block-diagonal matrix, so however many there are it's still just the eight CRAM solves.
+		rows, cols, values = self.entries(rates)
+		n, m = len(self.nuclides), values.shape[1]
+		offsets = np.repeat(np.arange(m) * n, len(rows))
+		A = csc_matrix((values.T.ravel(), (np.tile(rows, m) + offsets, np.tile(cols, m) + offsets)), shape=(n * m, n * m))
+		return np.maximum(cram(A, np.tile(n0, (m, 1)), t), 0.0).reshape(m, n, n0.shape[1]) # CRAM's error shows up as tiny negative amounts; there's no such thing
+
+class SparseTransmuter(object):
+	def __init__(self, t=0.0, phi=0.0, temp=300.0, tol=1e-10, rxs=None, log=None):
+		self.t = t
+		self.phi = phi
+		self.tol = tol
+		self.rxs = list(rxs) if rxs is not None else REACTIONS
+		self.xs = None
+
+	def crossSections(self):
+		global _library
+		if self.xs is None:
+			if _library is None or _library.reactions != self.rxs:
+				_library = CrossSections(self.rxs)
+			self.xs = _library
+		return self.xs
+
+	def network(self, targets, t, phis, tol, depth=None):
+		# The BurnupNetwork of everything worth following from `targets` over `t` seconds in any of the fluxes `phis` (one per row)
+		from starfish.nucdata import getNuclearData
+		nucdata = getNuclearData()
+		xs = self.crossSections()
+		phis = np.atleast_2d(np.asarray(phis, dtype=float))
+		weight = dict((nuc, 1.0) for nuc in targets) # An upper bound on the fraction of a target's atoms that could end up as each nuclide
+		steps = dict((nuc, 0) for nuc in targets) # Fewest reactions and decays from a target to each nuclide
+		edges = {}
+		def edgesOf(nuc):
+			if nuc not in edges:
+				lam = nucdata.decayConst(nuc)
+				lam = 0.0 if np.isnan(lam) else lam # Unknown half-lives are treated as stable (and dropped from the product later, as always)
+				decays = [(child, branch * lam) for child, branch in nucdata.decayChildren(nuc)] if lam > 0 else []
+				reactions = xs.daughters(nuc)
+				groups = min([phis.shape[1]] + [len(groupXS) for child, groupXS in reactions])
+				groupXS = np.array([groupXS[:groups] for child, groupXS in reactions]).reshape(len(reactions), groups)
+				rates = groupXS.dot(phis[:, :groups].T) * BARN # (reactions, fluxes)
+				edges[nuc] = (lam, decays, [child for child, x in reactions], groupXS, rates)
+			return edges[nuc]
+		todo = list(targets)
+		while todo:
+			nuc = todo.pop()
+			lam, decays, children, groupXS, rates = edgesOf(nuc)
+			reach = [(child, 1.0) for child, rate in decays] + list(zip(children, np.minimum(1.0, rates.max(axis=1) * t).tolist()))
+			for child, r in reach:
+				w, d = weight[nuc] * r, steps[nuc] + 1
+				if w <= 0 or (depth is not None and d > depth):
+					continue
+				if w > weight.get(child, 0.0) or (depth is not None and d < steps.get(child, d + 1)): # Closer to a target means more of its chain can be followed
+					weight[child] = max(w, weight.get(child, 0.0))
+					steps[child] = min(d, steps.get(child, d))
+					if w >= tol: # Like PyNE's chainsolve, anything reached is kept, but only followed on from if it could be at least tol of a target
+						todo.append(child)
+		nuclides = sorted(weight)
+		index = dict((nuc, i) for i, nuc in enumerate(nuclides))
+		decayEntries, parents, products, groupXS = [], [], [], []
+		for j, nuc in enumerate(nuclides):
+			lam, decays, children, x, rates = edgesOf(nuc) # The ends of the chains still need their own decay and burnup
+			decayEntries.append((j, j, -lam))
+			decayEntries.extend((index[child], j, rate) for child, rate in decays if child in index and rate > 0)
+			parents.extend([j] * len(children))
+			products.extend(index.get(child, -1) for child in children)
+			groupXS.append(x[:, :phis.shape[1]])
+		xs.save()
+		groups = min([phis.shape[1]] + [x.shape[1] for x in groupXS])
+		groupXS = np.concatenate([x[:, :groups] for x in groupXS] + [np.zeros((0, groups))])
+		return BurnupNetwork(nuclides, decayEntries, parents, products, groupXS)
+
+	def matrix(self, targets, t, phi, tol):
+		# (nuclides, burnup matrix) for everything worth following from `targets` over `t` seconds in flux `phi`
+		nuclides, matrices = self.matrices(targets, t, [phi], tol)
+		return nuclides, matrices[0]
+
+	def matrices(self, targets, t, phis, tol):
+		# The same for several fluxes at once (one row of `phis` per irradiation position): (nuclides, [burnup matrix per flux])
+		network = self.network(targets, t, phis, tol)
+		return network.nuclides, network.matrices(network.rates(phis))
+
+	def transmuteMany(self, targets, t=None, phi=None, tol=None, depth=None):
+		# Atoms of every product per atom of each target: (nuclides, array of shape (len(nuclides), len(targets)))
+		t = self.t if t is None else t
+		phi = self.phi if phi is None else phi
+		nuclides, out = self.transmuteStack(targets, t, [phi], tol, depth)
+		return nuclides, out[0]
+
+	def transmuteStack(self, targets, t, phis, tol=None, depth=None):
+		# transmuteMany in several fluxes at once: (nuclides, array of shape (len(phis), len(nuclides), len(targets)))
+		tol = self.tol if tol is None else tol
+		targets = [int(nuc) for nuc in targets]
+		with trace.span("sparse.solve", targets=len(targets), fluxes=len(phis)) as span:
+			network = self.network(targets, t, phis, tol, depth)
+			span.set(matrixNuclides=len(network.nuclides), matrixEntries=len(network.decays[0]) + 2 * len(network.parents))
+			return network.nuclides, network.solve(network.rates(phis), network.start(targets), t)
+
+	def transmute(self, x, t=None, phi=None, tol=None, log=None):
+		# Same as Transmuter.transmute: the material x after t seconds in flux phi
+		from pyne.material import Material
+		masses = x.mult_by_mass()
+		targets = sorted(masses)
+		from starfish.nucdata import getNuclearData
+		nucdata = getNuclearData()
+		nuclides, out = self.transmuteMany(targets, t, phi, tol)
+		atoms = out.dot(np.array([masses[nuc] for nuc in targets]) / nucdata.atomicMasses(targets))
+		grams = atoms * nucdata.atomicMasses(nuclides)
+		return Material(dict((nuc, m) for nuc, m in zip(nuclides, grams.tolist()) if m > 0))
+
+def crossCheck(material, flux, power, time, tol=1e-10):
+	# Irradiate with both solvers. Returns [(nuclide, chain grams, sparse grams)], biggest first, for everything either makes.
+	phi = np.asarray(flux) * float(power)
+	chain = engine.getTransmuter("chain").transmute(material, time, phi, engine.tierSettings("standard")["tol"]).mult_by_mass() # Its tol is whatever it was last given otherwise
+	sparse = SparseTransmuter(tol=tol, rxs=getattr(engine.getTransmuter("chain"), "rxs", None)).transmute(material, time, phi).mult_by_mass()
+	nuclides = set(chain) | set(sparse)
+	return sorted(((nuc, chain.get(nuc, 0.0), sparse.get(nuc, 0.0)) for nuc in nuclides), key=lambda row: -max(row[1], row[2]))
@@ -0,0 +1,103 @@
+# Gamma spectra: photons per second emitted in each energy bin, from every gamma line of every nuclide in the product,
+# at end of bombardment and at any times after, for planning HPGe count times and keeping the dead time down - which
+# takes the whole spectrum, not just the lines above the Gammas tab's threshold.
+#
+# The lines of a set of nuclides are binned once into a sparse (nuclides x bins) matrix of photons per decay; the
+# spectrum at any number of times is then one product of that with the decay engine's activities (times x nuclides).
+# Intensities are percent per decay, as on the Gammas tab. This is what the sample emits: no detector efficiency or
+# resolution, and no self-absorption in the sample.
+#
+#     starfish-cli spectrum "Au:1" 0.05 RabbitFlux.csv 250 10m --at 0 1h 1d --width 1 --high 3000 -o spectrum.csv
+
+from __future__ import print_function
+
+import csv
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from starfish import engine
+from starfish import trace
+
+LOW, HIGH, WIDTH = 0.0, 3000.0, 1.0 # keV; the default bins
+
+_matrices = OrderedDict() # (nuclides, edges) -> line-to-bin matrix, most recently used last
+_maxMatrices = 8
+
+def binEdges(low=LOW, high=HIGH, width=WIDTH):
+	# Edges (keV) of equal bins from low to high, `width` keV wide (or as near as fits)
+	if high <= low or width <= 0:
+		raise ValueError("Bins need high > low and width > 0")
+	return np.round(np.linspace(low, high, max(1, int(round((high - low) / width))) + 1), 9) # Rounded so they print tidily
+
+def lineMatrix(nuclides, edges):
+	# Sparse (nuclides x bins) matrix of photons per decay from each nuclide's lines in each bin. Lines outside the edges are left out.
+	from scipy.sparse import csr_matrix
+	from starfish.nucdata import getNuclearData
+	nuclides = np.asarray(nuclides, dtype=np.int64)
+	edges = np.asarray(edges, dtype=float)
+	key = (hashlib.sha1(nuclides.tobytes()).hexdigest(), hashlib.sha1(edges.tobytes()).hexdigest())
+	if key in _matrices:
+		_matrices[key] = _matrices.pop(key)
+		return _matrices[key]
+	with trace.span("spectrum.bin", nuclides=len(nuclides), bins=len(edges) - 1) as span:
+		owner, kev, intensity = getNuclearData().lineArrays("gamma", nuclides)
+		bins = np.searchsorted(edges, kev, side="right") - 1
+		bins[kev == edges[-1]] = len(edges) - 2 # The last bin includes its top edge
+		inside = (bins >= 0) & (bins < len(edges) - 1)
+		matrix = csr_matrix((intensity[inside] / 100.0, (owner[inside], bins[inside])), shape=(len(nuclides), len(edges) - 1)) # Lines in the same bin add up
+		span.set(lines=int(np.sum(inside)))
+	_matrices[key] = matrix
+	if len(_matrices) > _maxMatrices:
+		_matrices.popitem(last=False)
+	return matrix
+
+def spectrum(nuclides, activity, edges):
+	# Photons/s in each bin from `activity` (Bq, shape (times, nuclides) or (nuclides,)), shape (times, bins)
+	activity = np.atleast_2d(np.asarray(activity, dtype=float))
+	return np.asarray(lineMatrix(nuclides, edges).T.dot(activity.T)).T
+
+def productSpectrum(product, times=(0.0,), edges=None):
+	# Photons/s in each bin (default binEdges()) of a PyNE material's gammas, `times` seconds after bombardment: shape (times, bins)
+	from starfish.decay import forNuclides
+	edges = binEdges() if edges is None else np.asarray(edges, dtype=float)
+	atoms = engine.productAtoms(product)
+	decayer = forNuclides(atoms.keys())
+	with trace.span("spectrum", times=len(times), bins=len(edges) - 1):
+		activity = decayer.activities(decayer.vector(atoms), np.asarray(times, dtype=float))
+		return spectrum(decayer.nuclides, activity, edges)
+
+def writeSpectrum(path, edges, times, rates, name="sample"):
+	# A columnar file's "spectra" table for .sfc paths (see export.py), otherwise a CSV with a column per time
+	if path.endswith(".sfc"):
+		from starfish import export
+		writer = export.ColumnarWriter(path)
+		writer.write("spectra", export.spectrumRows(0, name, {"edges": edges, "times": times, "rates": rates}))
+		writer.close()
+		return
+	out = open(path, "w")
+	writer = csv.writer(out)
+	writer.writerow(["low (keV)", "high (keV)"] + ["photons/s at %s" % engine.formatTime(t) for t in times])
+	writer.writerows(np.column_stack([edges[:-1], edges[1:], np.transpose(rates)]).tolist())
+	out.close()
+
+def spectrumCommand(args):
+	from starfish import batch
+	sample = {"composition": batch.parseComposition(args.composition), "mass": args.mass, "ratioType": args.ratio_type, "profile": args.profile}
+	if args.schedule:
+		sample["schedule"] = args.schedule
+	else:
+		sample.update(power=args.power, time=args.time)
+	times = [engine.parseTime(t) for t in args.at]
+	edges = binEdges(args.low, args.high, args.width)
+	rates = productSpectrum(engine.irradiateSample(sample), times, edges)
+	if args.output:
+		writeSpectrum(args.output, edges, times, rates)
+		return 0
+	for t, row in zip(times, rates):
+		print("%s after bombardment: %.4g photons/s between %g and %g keV" % (engine.formatTime(t), row.sum(), edges[0], edges[-1]))
+		for i in np.argsort(-row, kind="mergesort")[:args.top]:
+			if row[i] > 0:
+				print("  %8g - %-8g keV %12.4g photons/s" % (edges[i], edges[i + 1], row[i]))
+	return 0
@@ -0,0 +1,131 @@
+# Getting the GUI up quickly.
+#
+# The window only needs Tk and NumPy; everything slow (SciPy, PyNE, the EAF library, the nuclear data snapshot, the
+# dose table, the flux profiles) is loaded by warmUp() on the worker thread once the window's showing, so by the time
+# someone's typed in a sample it's usually all ready. report() measures how long each piece takes from a cold start,
+# so startup time can be tracked from one version to the next (starfish-cli startup).
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import subprocess
+
+from starfish import trace
+
+clock = trace.clock
+
+def importLibraries():
+	import scipy.interpolate
+	import scipy.optimize
+	import scipy.sparse
+	import scipy.linalg
+	import parsedatetime
+	import pyne.data
+	import pyne.material
+	import pyne.bins
+	import pyne.xs.data_source
+	import pyne.transmute.chainsolve
+
+def loadNuclearData():
+	from starfish.nucdata import getNuclearData
+	getNuclearData()
+
+def loadTransmuter():
+	from starfish import engine
+	engine.eafGroupStructure()
+	engine.getTransmuter()
+
+def loadAirGamma():
+	from starfish import engine
+	engine.loadAirGamma()
+
+def loadDoseTable():
+	from starfish.dosetable import getDoseTable
+	getDoseTable()
+
+def loadFluxProfiles():
+	from starfish.fluxstore import getFluxStore
+	getFluxStore().preload()
+
+# (status bar message, name in the trace and report, what to do), in order
+WARMUP = [
+	("Loading SciPy and PyNE", "libraries", importLibraries),
+	("Loading nuclear data", "nucdata", loadNuclearData),
+	("Loading EAF library", "transmuter", loadTransmuter),
+	("Loading air attenuation", "airGamma", loadAirGamma),
+	("Loading dose table", "doseTable", loadDoseTable),
+	("Loading flux profiles", "fluxProfiles", loadFluxProfiles),
+]
+
+def warmUp(progress=None):
+	# Load everything a calculation will need. `progress(stage, fraction)` is called before each step (see worker.Job).
+	# Returns {step name: seconds}.
+	progress = progress or (lambda stage, fraction: None)
+	times = {}
+	for i, (message, name, step) in enumerate(WARMUP):
+		progress(message, float(i) / len(WARMUP))
+		start = clock()
+		with trace.span("warmup." + name):
+			step()
+		times[name] = clock() - start
+	return times
+
+def warmUpTask(job):
+	# What the GUI hands its worker (see IRApplication.warmUp): warmUp, reporting progress through the job
+	return warmUp(job.progress)
+
+def warmUpInWorker():
+	# warmUp the way the GUI runs it, as warmUpTask on a worker.Worker thread. Returns its times; raises if it failed.
+	from starfish.worker import Worker
+	worker = Worker()
+	worker.submit(warmUpTask)
+	while True:
+		for kind, value in worker.poll():
+			if kind == "done":
+				return value
+			if kind == "error":
+				raise RuntimeError("Warm-up failed on the worker thread:\n" + value[1])
+		time.sleep(0.01)
+
+def measure():
+	# Runs in a fresh interpreter for report(): time the imports the window needs, then each warm-up step, run just as
+	# the GUI runs it (so a warm-up that breaks in the GUI breaks `starfish-cli startup` too)
+	start = clock()
+	import numpy
+	try:
+		import Tkinter
+		import ttk
+	except ImportError: # Python 3
+		import tkinter
+		import tkinter.ttk
+	from starfish import engine, pipeline, fluxstore, worker
+	times = {"window": clock() - start}
+	times.update(warmUpInWorker())
+	print(json.dumps(times))
+
+def report():
+	# {"interpreter": seconds to start Python at all, "window": imports before the window can show, then each warm-up step},
+	# all measured from a cold start in a new process
+	start = time.time()
+	subprocess.check_call([sys.executable, "-c", "pass"])
+	interpreter = time.time() - start
+	output = subprocess.check_output([sys.executable, "-c", "from starfish import startup; startup.measure()"],
+		cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # Wherever this starfish/ is, so that's the one it imports
+	times = json.loads(output.decode().strip().splitlines()[-1])
+	times["interpreter"] = interpreter
+	return times
+
+def reportCommand(args):
+	times = report()
+	names = ["interpreter", "window"] + [name for message, name, step in WARMUP]
+	if args.json:
+		print(json.dumps(dict((name, times[name]) for name in names), sort_keys=True))
+		return 0
+	for name in names:
+		print("%-14s %8.3f s" % (name, times[name]))
+	print("%-14s %8.3f s" % ("window shown", times["interpreter"] + times["window"]))
+	print("%-14s %8.3f s" % ("ready", sum(times[name] for name in names)))
+	return 0
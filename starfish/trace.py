@@ -0,0 +1,147 @@
+# Timing spans around the slow parts of a calculation, for finding out where the time actually goes.
+#
+#     with trace.span("irradiate", nuclides=12) as s:
+#         ...
+#         s.set(products=len(product))
+#
+# Each span that finishes becomes one record: its name, when it started, how long it took, which thread it ran on,
+# the span it was inside, and any counts given to it. Records go to a JSON-lines file (STARFISH_TRACE=path in the
+# environment, or --trace on the command line) and to anyone collecting them with collect(), which is how the GUI
+# shows timings in its status bar. With neither, span() hands back the same do-nothing object every time, so the
+# spans can stay in the code for good.
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+clock = getattr(time, "perf_counter", time.time) # Python 2 has no perf_counter
+
+_enabled = False
+_path = None
+_out = None
+_pid = None
+_lock = threading.Lock()
+_local = threading.local() # The spans open on each thread, innermost last
+_collectors = []
+
+class NoSpan(object):
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		return False
+
+	def set(self, **fields):
+		pass
+
+NOSPAN = NoSpan()
+
+class Span(object):
+	def __init__(self, name, fields):
+		self.name = name
+		self.fields = fields
+
+	def __enter__(self):
+		stack = getattr(_local, "stack", None)
+		if stack is None:
+			stack = _local.stack = []
+		self.parent = stack[-1].name if stack else None
+		self.depth = len(stack)
+		stack.append(self)
+		self.wall = time.time()
+		self.start = clock()
+		return self
+
+	def set(self, **fields):
+		# Add (or change) counts and other details for this span's record
+		self.fields.update(fields)
+
+	def __exit__(self, excType, exc, tb):
+		seconds = clock() - self.start
+		_local.stack.pop()
+		record = OrderedDict([("span", self.name), ("start", self.wall), ("seconds", seconds), ("thread", threading.current_thread().name),
+			("parent", self.parent), ("depth", self.depth)])
+		record.update(self.fields)
+		if excType is not None:
+			record["error"] = excType.__name__
+		emit(record)
+		return False
+
+def span(name, **fields):
+	if not _enabled:
+		return NOSPAN
+	return Span(name, fields)
+
+def emit(record):
+	global _out, _pid
+	thread = threading.current_thread()
+	with _lock:
+		for collector in _collectors:
+			if collector.thread is thread:
+				collector.records.append(record)
+		if _path:
+			if _pid != os.getpid(): # Batch workers each open the file for themselves (appending keeps their lines whole)
+				_out = open(_path, "a")
+				_pid = os.getpid()
+			_out.write(json.dumps(record) + "\n")
+			_out.flush()
+
+def enable(path):
+	# Write every span to the JSON-lines file at `path` (appending), or stop writing them if `path` is None
+	global _path, _out, _pid, _enabled
+	with _lock:
+		if _out is not None and _pid == os.getpid():
+			_out.close()
+		_path, _out, _pid = path, None, None
+		_enabled = bool(_path or _collectors)
+
+class Collector(object):
+	# The spans that finish on one thread while it's collecting
+	def __init__(self):
+		self.thread = threading.current_thread()
+		self.records = []
+
+	def __enter__(self):
+		global _enabled
+		with _lock:
+			_collectors.append(self)
+			_enabled = True
+		return self
+
+	def __exit__(self, *exc):
+		global _enabled
+		with _lock:
+			_collectors.remove(self)
+			_enabled = bool(_path or _collectors)
+		return False
+
+	def totals(self):
+		# {span name: total seconds}, in the order they first finished
+		out = OrderedDict()
+		for record in self.records:
+			out[record["span"]] = out.get(record["span"], 0.0) + record["seconds"]
+		return out
+
+	def counts(self):
+		# Every number given to set() or span(), summed by name
+		out = OrderedDict()
+		for record in self.records:
+			for key, value in list(record.items())[6:]:
+				if isinstance(value, (int, float)) and not isinstance(value, bool):
+					out[key] = out.get(key, 0) + value
+		return out
+
+	def summary(self):
+		# A line for the status bar, slowest spans first
+		totals = sorted(((seconds, name) for name, seconds in self.totals().items() if seconds >= 0.0005), reverse=True)
+		text = ", ".join("%s %.3g s" % (name, seconds) for seconds, name in totals[:5])
+		counts = ", ".join("%d %s" % (value, key) for key, value in self.counts().items())
+		return "; ".join(part for part in (text, counts) if part)
+
+def collect():
+	return Collector()
+
+if os.environ.get("STARFISH_TRACE"):
+	enable(os.environ["STARFISH_TRACE"])
@@ -0,0 +1,129 @@
+# How sure are we of the activity and dose? Monte Carlo: irradiate the sample many times over, each time with the
+# power, the flux normalization (engine.FLUX_SCALE), the shape of the flux profile, every cross section and the air
+# attenuation nudged by a random amount, and report percentiles of what comes out.
+#
+# None of that needs a transmutation per sample. The burnup network (see sparse.py) is worked out once; every sample's
+# reaction rates come out of one matrix product of the group cross sections with the samples' perturbed fluxes, scaled
+# by their cross-section factors; and the samples are solved a block-diagonal chunk at a time, each chunk eight sparse
+# solves. Decay after bombardment is one matrix for all samples, and so is the dose. About 1000 samples takes seconds.
+#
+# Each uncertainty is a relative standard deviation, applied as a log-normal factor (so nothing ever goes negative).
+# The flux shape is perturbed by energy range - everything below 0.5 eV together, and so on - since errors in a
+# measured or modelled spectrum go together across neighbouring groups rather than group by group.
+#
+#     starfish-cli uncertainty "Au:1" 0.05 RabbitFlux.csv 250 10m --delay 1h
+
+from __future__ import print_function
+
+import numpy as np
+
+from starfish import engine
+from starfish import trace
+
+UNCERTAINTIES = {
+	"power": 0.05, # Reactor power calibration
+	"normalization": 0.10, # engine.FLUX_SCALE, flux per source neutron -> flux at 1 kW
+	"thermal": 0.10, # Shape of the flux profile, in each of ENERGY_RANGES
+	"epithermal": 0.15,
+	"fast": 0.15,
+	"crossSections": 0.10, # Each EAF reaction on its own
+	"airAttenuation": 0.05, # mu/rho of air, which the gamma dose is proportional to
+}
+ENERGY_RANGES = [("thermal", 0.0, 0.5), ("epithermal", 0.5, 1e5), ("fast", 1e5, float("inf"))] # eV
+PERCENTILES = [5, 50, 95]
+CHUNK = 100 # Samples per block-diagonal solve
+XS_SIGMAS = 5 # The network is built for cross sections this many standard deviations high (see uncertainty)
+
+def logNormal(rng, sigma, shape):
+	return np.exp(rng.normal(0.0, sigma, shape)) if sigma else np.ones(shape)
+
+def fluxFactors(rng, u, samples, groups):
+	# (samples, groups) factor on the flux in each group: power, normalization and the shape in each energy range
+	edges = engine.eafGroupStructure()[:groups + 1]
+	middle = np.sqrt(edges[:-1] * edges[1:]) # eV; EAF groups go from high energy to low
+	factors = logNormal(rng, u["power"], (samples, 1)) * logNormal(rng, u["normalization"], (samples, 1)) * np.ones((samples, groups))
+	for name, low, high in ENERGY_RANGES:
+		inRange = (middle >= low) & (middle < high)
+		factors[:, inRange] *= logNormal(rng, u[name], (samples, 1))
+	return factors
+
+def uncertainty(material, flux, power, time, delay=None, samples=1000, uncertainties=None, percentiles=PERCENTILES, seed=None, tol=None, progress=None):
+	# Percentiles of activity (Bq) and dose (mR/h at 30 cm), in total and for each radioactive product, at end of
+	# bombardment or `delay` seconds after. Returns {"samples", "percentiles", "total": row, "products": [row, ...]}, where
+	# each row has the name and nominal values, and "activity", "doseG", "doseB" and "dose" as a list of percentiles.
+	from starfish.nucdata import getNuclearData
+	from starfish.dosetable import getDoseTable
+	from pyne import nucname
+	u = dict(UNCERTAINTIES)
+	u.update(uncertainties or {})
+	progress = progress or (lambda stage, fraction: None)
+	rng = np.random.RandomState(seed)
+	atoms = engine.productAtoms(material)
+	targets = sorted(atoms)
+	phi = np.asarray(flux, dtype=float) * float(power)
+	with trace.span("uncertainty", samples=samples) as span:
+		progress("Building the burnup network", 0.0)
+		transmuter, settings = engine.getTransmuter("sparse"), engine.tierSettings()
+		tol = tol if tol is not None else settings["tol"] if settings["tol"] is not None else transmuter.tol
+		phi = phi[:len(engine.eafGroupStructure()) - 1] # The flux profiles are in the EAF groups; anything past them has no cross sections anyway
+		factors = fluxFactors(rng, u, samples, len(phi))
+		# The chains worth following depend on the flux, so the network is built for the most any sample could see: every group
+		# at its highest over the samples and every cross section XS_SIGMAS high. Otherwise the high samples would be missing
+		# products that only they make enough of to follow.
+		highest = phi * factors.max(axis=0) * np.exp(XS_SIGMAS * u["crossSections"])
+		network = transmuter.network(targets, float(time), [phi, highest], tol, settings["depth"])
+		groups = network.groupXS.shape[1]
+		rates = network.rates(phi[:groups] * factors[:, :groups]) * logNormal(rng, u["crossSections"], (len(network.parents), samples))
+		rates = np.hstack([network.rates(phi), rates]) # The nominal case goes first
+		n0 = np.zeros((len(network.nuclides), 1))
+		for nuc in targets:
+			n0[network.index[nuc], 0] = atoms[nuc]
+		out = np.empty((samples + 1, len(network.nuclides)))
+		for start in range(0, samples + 1, CHUNK):
+			progress("Irradiating samples", 0.05 + 0.85 * start / (samples + 1.0))
+			out[start:start + CHUNK] = network.solve(rates[:, start:start + CHUNK], n0, float(time))[:, :, 0]
+		progress("Working out doses", 0.9)
+		nucdata = getNuclearData()
+		lambdas = nucdata.decayConsts(network.nuclides)
+		keep = ~np.isnan(lambdas) # Unknown half-lives are left out, as in responses.py
+		nuclides, out, lambdas = [nuc for nuc, k in zip(network.nuclides, keep) if k], out[:, keep], lambdas[keep]
+		if delay:
+			from starfish.decay import forNuclides
+			decayer = forNuclides(nuclides)
+			index = [decayer.index[nuc] for nuc in nuclides]
+			initial = np.zeros((len(out), len(decayer.nuclides)))
+			initial[:, index] = out
+			out = initial.dot(decayer.propagator(float(delay)).T)[:, index]
+		radioactive = lambdas > 0
+		nuclides, act = [nuc for nuc, r in zip(nuclides, radioactive) if r], out[:, radioactive] * lambdas[radioactive]
+		gammaConst, betaConst = getDoseTable().constants(np.array(nuclides, dtype=np.int64))
+		columns = {"activity": act, "doseG": act * gammaConst * np.vstack([[1.0], logNormal(rng, u["airAttenuation"], (samples, 1))]), "doseB": act * betaConst}
+		columns["dose"] = columns["doseG"] + columns["doseB"]
+		def row(name, values):
+			# values: {quantity: array over (nominal + samples)}
+			r = {"name": name}
+			for key, v in values.items():
+				r["nominal" + key[0].upper() + key[1:]] = float(v[0])
+				r[key] = np.percentile(v[1:], percentiles).tolist()
+			return r
+		total = row("TOTAL", dict((key, values.sum(axis=1)) for key, values in columns.items()))
+		products = []
+		for i in np.argsort(-act[0], kind="mergesort"): # Same order as engine.computeResults: by nominal activity
+			products.append(row(nucname.name(nuclides[i]), dict((key, values[:, i]) for key, values in columns.items())))
+			products[-1]["nuclide"] = int(nuclides[i])
+		span.set(nuclides=len(nuclides))
+		return {"samples": samples, "percentiles": list(percentiles), "total": total, "products": products}
+
+def uncertaintyCommand(args):
+	from starfish import batch
+	from starfish.fluxstore import getFluxStore
+	material = engine.constructMaterial(batch.parseComposition(args.composition), args.mass, args.ratio_type)
+	flux = getFluxStore().get(args.profile)
+	delay = engine.parseTime(args.delay) if args.delay else None
+	answer = uncertainty(material, flux, args.power, engine.parseTime(args.time), delay, args.samples, seed=args.seed)
+	bands = ["%d%%" % p for p in answer["percentiles"]]
+	print("%d samples%s" % (answer["samples"], ", %s after bombardment" % args.delay if args.delay else ", at end of bombardment"))
+	print(("%-10s %12s" + " %12s" * len(bands) + " %12s" + " %12s" * len(bands)) % tuple(["Isotope", "Bq"] + bands + ["mR/h"] + bands))
+	for row in [answer["total"]] + answer["products"][:args.top]:
+		print(("%-10s %12.4g" + " %12.4g" * len(bands) + " %12.4g" + " %12.4g" * len(bands)) % tuple([row["name"], row["nominalActivity"]] + row["activity"] + [row["nominalDose"]] + row["dose"]))
+	return 0
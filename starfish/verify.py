@@ -0,0 +1,62 @@
+# Self-check of the two home-grown matrix exponentials - the decay engine's eigen-decomposition (decay.py) and CRAM in
+# the sparse solver (sparse.py) - against SciPy's expm, on short made-up chains whose half-lives are the awkward cases:
+# exactly equal (DecayEngine nudges them apart), almost equal (the eigenvectors are nearly parallel, and past cond(V)
+# 1e12 DecayEngine falls back to expm), and plain distinct ones for comparison. Nothing here needs PyNE or nuclear data.
+#
+#     starfish-cli verify
+
+from __future__ import print_function
+
+import numpy as np
+
+HOUR = np.log(2) / 3600.0 # Decay constant of a one-hour half-life
+CASES = [ # (name, decay constants, the path DecayEngine should take)
+	("distinct half-lives", [HOUR, HOUR / 2], "eigen"),
+	("two equal half-lives", [HOUR, HOUR], "eigen"), # Nudged apart, still diagonalised
+	("three equal half-lives", [HOUR, HOUR, HOUR], "expm"), # Nudged apart, too ill-conditioned: expm fallback
+	("half-lives 1e-6 apart", [HOUR, HOUR * (1 + 1e-6)], "eigen"),
+	("half-lives 1e-12 apart", [HOUR, HOUR * (1 + 1e-12)], "expm"), # Not nudged, too ill-conditioned: expm fallback
+]
+TIMES = [1.0, 600.0, 3600.0, 86400.0, 3e7] # s
+TOLERANCE = 1e-5 # Largest error allowed, relative to the largest number of atoms at that time. The nudge costs about 1e-7,
+# and expm itself is only good to about 1e-6 on the chains 1e-12 apart (its atoms don't add up to any better than that).
+
+def chainMatrix(lambdas):
+	# Decay matrix of a straight chain: each nuclide decays into the next, and the last one is stable
+	n = len(lambdas) + 1
+	A = np.zeros((n, n))
+	for i, lam in enumerate(lambdas):
+		A[i, i] = -lam
+		A[i + 1, i] = lam
+	return A
+
+def check(lambdas, times=TIMES):
+	# Largest relative error of each method over `times`, starting from 1e20 atoms of the head of the chain:
+	# {"path" (the one DecayEngine took), "decay", "propagator", "cram"}
+	from scipy.linalg import expm
+	from scipy.sparse import csc_matrix
+	from starfish.decay import DecayEngine
+	from starfish.sparse import cram
+	A = chainMatrix(lambdas)
+	n0 = np.zeros(len(A))
+	n0[0] = 1e20
+	engine = DecayEngine(range(len(A)), A)
+	decayed = engine.atoms(n0, times)
+	errors = {"path": "eigen" if engine.V is not None else "expm", "decay": 0.0, "propagator": 0.0, "cram": 0.0}
+	for k, t in enumerate(times):
+		exact = expm(A * t).dot(n0)
+		scale = np.abs(exact).max()
+		for name, value in (("decay", decayed[k]), ("propagator", engine.propagator(t).dot(n0)), ("cram", cram(csc_matrix(A), n0, t))):
+			errors[name] = max(errors[name], np.abs(value - exact).max() / scale)
+	return errors
+
+def verifyCommand(args):
+	print("%-24s %-6s %12s %12s %12s" % ("Chain", "Path", "decay", "propagator", "cram"))
+	failed = 0
+	for name, lambdas, path in CASES:
+		errors = check(lambdas)
+		bad = [key for key in ("decay", "propagator", "cram") if not errors[key] <= TOLERANCE] + (["path"] if errors["path"] != path else [])
+		failed += bool(bad)
+		print("%-24s %-6s %12.2e %12.2e %12.2e%s" % (name, errors["path"], errors["decay"], errors["propagator"], errors["cram"], "  FAILED" if bad else ""))
+	print("%d of %d chains off by more than %g, or not solved the way they should be" % (failed, len(CASES), TOLERANCE))
+	return 1 if failed else 0
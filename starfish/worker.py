@@ -0,0 +1,89 @@
+# Runs calculations on a background thread, so the window keeps redrawing (and can be moved, or quit) while PyNE works.
+#
+# There's only ever one calculation that matters: the most recent one asked for. Submitting a new one supersedes
+# whatever was running or waiting, and cancelling just means nothing is current any more. A calculation can't be
+# stopped in the middle of a transmutation, so it's stopped the next time it reports progress; either way, anything
+# it sends back after it's been superseded is thrown away.
+# Nothing here touches Tk - the GUI thread calls poll() (from an after() loop) to pick up progress and results.
+
+import sys
+import threading
+import traceback
+try:
+	import Queue
+except ImportError: # Python 3
+	import queue as Queue
+
+class Cancelled(Exception):
+	pass
+
+class Job(object):
+	# Handed to each calculation so it can report how far along it is
+	def __init__(self, worker, generation):
+		self.worker = worker
+		self.generation = generation
+
+	def cancelled(self):
+		return self.generation != self.worker.generation
+
+	def progress(self, stage, fraction):
+		# Report that we've reached `stage` (a description for the status bar), `fraction` of the way through.
+		# This is also where a superseded or cancelled calculation stops.
+		if self.cancelled():
+			raise Cancelled()
+		self.worker.messages.put(("progress", self.generation, (stage, fraction)))
+
+class Worker(object):
+	def __init__(self):
+		self.messages = Queue.Queue() # (kind, generation, value) for the GUI thread: kind is "progress", "done" or "error"
+		self.lock = threading.Condition()
+		self.generation = 0 # Bumped by every submit and cancel; only messages from the current generation count
+		self.pending = None
+		self.thread = threading.Thread(target=self.run)
+		self.thread.daemon = True # Don't keep the program alive after the window's closed
+		self.thread.start()
+
+	def submit(self, task):
+		# Run task(job) in the background, in place of anything already running or waiting. Returns the job's generation.
+		with self.lock:
+			self.generation += 1
+			self.pending = (self.generation, task)
+			self.lock.notify()
+			return self.generation
+
+	def cancel(self):
+		with self.lock:
+			self.generation += 1
+			self.pending = None
+
+	def busy(self, generation):
+		# Is this job still the one we're waiting on?
+		return generation == self.generation
+
+	def run(self):
+		while True:
+			with self.lock:
+				while self.pending is None:
+					self.lock.wait()
+				generation, task = self.pending
+				self.pending = None
+			job = Job(self, generation)
+			try:
+				value = task(job)
+			except Cancelled:
+				continue
+			except Exception:
+				self.messages.put(("error", generation, (sys.exc_info()[1], traceback.format_exc())))
+				continue
+			self.messages.put(("done", generation, value))
+
+	def poll(self):
+		# Everything the current job has sent back since the last poll, as (kind, value) pairs
+		messages = []
+		while True:
+			try:
+				kind, generation, value = self.messages.get_nowait()
+			except Queue.Empty:
+				return messages
+			if self.busy(generation):
+				messages.append((kind, value))